@@ -0,0 +1,175 @@
+"""
+Pipeline de archivos estáticos: minificado, huella de contenido y precompresión.
+
+El paso de build copia cada archivo de static/ a static/dist/ con el hash de
+su contenido en el nombre (css/style.css -> dist/css/style.1a2b3c4d.css),
+minifica CSS y JS y deja al lado las variantes .gz y .br de los archivos de
+texto. El manifiesto dist/manifest.json relaciona el nombre original con el
+de la huella.
+
+En la aplicación, url_for('static', filename='css/style.css') devuelve la URL
+con huella si está en el manifiesto. Esas URLs cambian con cada cambio del
+archivo, así que se sirven con caché de un año e immutable; la vista de
+estáticos entrega la variante .br o .gz según Accept-Encoding sin comprimir
+nada por petición.
+
+Paso de build (tras cambiar cualquier archivo de static/):
+    python activos.py
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from flask import request, send_from_directory
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIRECTORIO_DIST = 'dist'
+# Subidas de usuarios: no forman parte del build y se sirven tal cual
+EXCLUIDAS = (DIRECTORIO_DIST, 'uploads')
+MANIFIESTO = 'manifest.json'
+EXTENSIONES_TEXTO = ('.css', '.js', '.svg', '.json', '.txt')
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+
+# Variantes precomprimidas en orden de preferencia: (codificación, sufijo)
+VARIANTES = (('br', '.br'), ('gzip', '.gz'))
+
+_manifiesto = {}
+_huellas = set()
+
+
+def _minificar(ruta, contenido):
+    """CSS y JS minificados si rcssmin / rjsmin están instalados"""
+    if ruta.endswith('.css') and rcssmin:
+        return rcssmin.cssmin(contenido.decode('utf-8')).encode('utf-8')
+    if ruta.endswith('.js') and rjsmin:
+        return rjsmin.jsmin(contenido.decode('utf-8')).encode('utf-8')
+    return contenido
+
+
+def _precomprimir(destino, contenido):
+    with open(destino + '.gz', 'wb') as f:
+        f.write(gzip.compress(contenido, compresslevel=9, mtime=0))
+    if brotli:
+        with open(destino + '.br', 'wb') as f:
+            f.write(brotli.compress(contenido, quality=11))
+
+
+def construir(static_folder):
+    """
+    Generar static/dist/ y su manifiesto a partir de static/
+
+    Args:
+        static_folder: ruta de la carpeta static de la aplicación
+
+    Returns:
+        dict {archivo original: archivo con huella}, rutas relativas a static/
+    """
+    dist = os.path.join(static_folder, DIRECTORIO_DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    manifiesto = {}
+    for carpeta, subcarpetas, archivos in os.walk(static_folder):
+        if carpeta == static_folder:
+            subcarpetas[:] = [s for s in subcarpetas if s not in EXCLUIDAS]
+        subcarpetas.sort()
+        for archivo in sorted(a for a in archivos if not a.startswith('.')):
+            origen = os.path.join(carpeta, archivo)
+            relativa = os.path.relpath(origen, static_folder).replace(os.sep, '/')
+            with open(origen, 'rb') as f:
+                contenido = _minificar(relativa, f.read())
+
+            base, extension = os.path.splitext(relativa)
+            huella = hashlib.sha256(contenido).hexdigest()[:8]
+            manifiesto[relativa] = f'{DIRECTORIO_DIST}/{base}.{huella}{extension}'
+
+            destino = os.path.join(static_folder, manifiesto[relativa])
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            with open(destino, 'wb') as f:
+                f.write(contenido)
+            if extension in EXTENSIONES_TEXTO:
+                _precomprimir(destino, contenido)
+
+    with open(os.path.join(dist, MANIFIESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, sort_keys=True)
+    return manifiesto
+
+
+def cargar_manifiesto(static_folder):
+    """Leer static/dist/manifest.json (vacío si no se ha ejecutado el build)"""
+    global _manifiesto, _huellas
+    try:
+        with open(os.path.join(static_folder, DIRECTORIO_DIST, MANIFIESTO), encoding='utf-8') as f:
+            _manifiesto = json.load(f)
+    except (OSError, ValueError):
+        _manifiesto = {}
+    _huellas = set(_manifiesto.values())
+    return _manifiesto
+
+
+def version():
+    """Huella del conjunto de estáticos desplegado (cambia con cualquier archivo)"""
+    return hashlib.sha1(json.dumps(_manifiesto, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def servir_estatico(static_folder, filename):
+    """
+    Enviar un archivo de static/, precomprimido si el cliente lo acepta
+
+    Los archivos con huella llevan caché inmutable; el resto, la validación
+    normal por ETag / Last-Modified de Flask.
+    """
+    aceptadas = request.accept_encodings
+    for codificacion, sufijo in VARIANTES:
+        if aceptadas[codificacion] and os.path.isfile(os.path.join(static_folder, filename + sufijo)):
+            respuesta = send_from_directory(static_folder, filename + sufijo,
+                                            mimetype=mimetypes.guess_type(filename)[0])
+            respuesta.headers['Content-Encoding'] = codificacion
+            break
+    else:
+        respuesta = send_from_directory(static_folder, filename)
+
+    if os.path.splitext(filename)[1] in EXTENSIONES_TEXTO:
+        respuesta.vary.add('Accept-Encoding')
+    if filename in _huellas:
+        respuesta.headers['Cache-Control'] = CACHE_INMUTABLE
+        respuesta.expires = None
+    return respuesta
+
+
+def init_activos(app):
+    """Reescribir url_for('static', ...) con el manifiesto y servir las variantes precomprimidas"""
+    cargar_manifiesto(app.static_folder)
+
+    @app.url_defaults
+    def url_con_huella(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in _manifiesto:
+            values['filename'] = _manifiesto[values['filename']]
+
+    app.view_functions['static'] = lambda filename: servir_estatico(app.static_folder, filename)
+
+
+if __name__ == '__main__':
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    if not rcssmin or not rjsmin:
+        print("⚠️ rcssmin / rjsmin no instalados: CSS y JS se copian sin minificar")
+    if not brotli:
+        print("⚠️ brotli no instalado: solo se generan variantes .gz")
+    manifiesto = construir(static_folder)
+    print(f"✅ {len(manifiesto)} archivos en static/{DIRECTORIO_DIST} con huella y precomprimidos")
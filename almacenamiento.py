@@ -0,0 +1,183 @@
+"""
+Almacenamiento de archivos subidos direccionado por contenido.
+
+Cada archivo se guarda una sola vez con el nombre "<sha256>.<extension>",
+de modo que subir dos veces la misma foto o el mismo PDF no ocupa más disco.
+Los nombres se siguen guardando en usuarios.foto_perfil y
+contenido_pdf.ruta_archivo, que actúan como contadores de referencias.
+
+Entre guardar_archivo() y la confirmación de la fila que apunta al archivo,
+este aún no tiene referencias. Por eso guardar_archivo() actualiza la fecha de
+modificación también al reutilizar un archivo existente, y ni
+liberar_archivo() ni el recolector borran archivos modificados hace menos de
+EDAD_MINIMA_ARCHIVO: si de verdad quedaron huérfanos, los borra
+limpiar_archivos.py más tarde.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from database import get_db_connection
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFILES_FOLDER = os.path.join(BASE_DIR, 'static/uploads/perfiles')
+PDF_FOLDER = os.path.join(BASE_DIR, 'static/uploads/pdf')
+MINIATURAS_FOLDER = os.path.join(PERFILES_FOLDER, 'miniaturas')
+
+# Tamaño de bloque para leer la subida mientras se calcula el hash
+CHUNK_SIZE = 64 * 1024
+
+# Los temporales más recientes pueden pertenecer a una subida en curso
+PREFIJO_TEMPORAL = '.subida_'
+EDAD_MINIMA_TEMPORAL = 3600
+
+# Un archivo recién guardado o reutilizado puede no tener todavía su fila
+EDAD_MINIMA_ARCHIVO = 600
+
+
+def guardar_archivo(archivo, carpeta, extension):
+    """
+    Guarda un archivo subido calculando su SHA-256 mientras se escribe.
+
+    Los bytes se copian a un temporal en la misma carpeta y, al terminar,
+    se renombra al nombre definitivo. Si ya existía un archivo con el mismo
+    contenido, el temporal se descarta.
+
+    Args:
+        archivo: FileStorage de Flask (o cualquier objeto con .stream o .read)
+        carpeta (str): Carpeta destino
+        extension (str): Extensión sin punto (png, jpg, pdf...)
+
+    Returns:
+        str: Nombre del archivo guardado ("<sha256>.<extension>")
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    stream = getattr(archivo, 'stream', archivo)
+    sha256 = hashlib.sha256()
+
+    fd, ruta_temporal = tempfile.mkstemp(dir=carpeta, prefix=PREFIJO_TEMPORAL)
+    try:
+        with os.fdopen(fd, 'wb') as destino:
+            while True:
+                bloque = stream.read(CHUNK_SIZE)
+                if not bloque:
+                    break
+                sha256.update(bloque)
+                destino.write(bloque)
+
+        nombre = f"{sha256.hexdigest()}.{extension.lower()}"
+        ruta_final = os.path.join(carpeta, nombre)
+
+        try:
+            # Contenido duplicado: reutilizar el archivo existente, marcándolo como
+            # recién usado para que liberar_archivo no lo borre antes de tener su fila
+            os.utime(ruta_final)
+            os.remove(ruta_temporal)
+        except FileNotFoundError:
+            os.replace(ruta_temporal, ruta_final)
+        return nombre
+    except Exception:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+        raise
+
+
+def contar_referencias(nombre, conn=None):
+    """Cuenta cuántas filas de usuarios y contenido_pdf apuntan a un archivo"""
+    cerrar = conn is None
+    if conn is None:
+        conn = get_db_connection()
+    result = conn.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM usuarios WHERE foto_perfil = ?) +
+            (SELECT COUNT(*) FROM contenido_pdf WHERE ruta_archivo = ?) as total
+    ''', (nombre, nombre)).fetchone()
+    if cerrar:
+        conn.close()
+    return result['total'] if result else 0
+
+
+def liberar_archivo(carpeta, nombre, conn=None):
+    """
+    Elimina un archivo del disco si ya no tiene referencias.
+
+    Debe llamarse después de actualizar (y confirmar) la fila que dejó de
+    apuntar al archivo. Los archivos modificados hace menos de
+    EDAD_MINIMA_ARCHIVO se dejan para limpiar_archivos.py: otra subida con el
+    mismo contenido puede estar a punto de apuntar a ellos.
+
+    Returns:
+        bool: True si el archivo se eliminó
+    """
+    if not nombre:
+        return False
+    if contar_referencias(nombre, conn) > 0:
+        return False
+
+    ruta = os.path.join(carpeta, nombre)
+    try:
+        if time.time() - os.path.getmtime(ruta) < EDAD_MINIMA_ARCHIVO:
+            return False
+        os.remove(ruta)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def obtener_referenciados():
+    """Obtiene el conjunto de nombres de archivo referenciados en la base de datos"""
+    conn = get_db_connection()
+    fotos = conn.execute('SELECT DISTINCT foto_perfil FROM usuarios WHERE foto_perfil IS NOT NULL').fetchall()
+    pdfs = conn.execute('SELECT DISTINCT ruta_archivo FROM contenido_pdf').fetchall()
+    conn.close()
+    return {f['foto_perfil'] for f in fotos} | {p['ruta_archivo'] for p in pdfs}
+
+
+def recolectar_huerfanos(simular=False):
+    """
+    Elimina los archivos de perfiles y PDFs que ninguna fila referencia,
+    junto con las miniaturas de fotos que ya no existen.
+
+    Args:
+        simular (bool): Si es True solo lista los archivos, sin borrarlos
+
+    Returns:
+        tuple (lista de rutas huérfanas, bytes liberados)
+    """
+    referenciados = obtener_referenciados()
+    huerfanos = []
+    bytes_liberados = 0
+
+    for carpeta in (PERFILES_FOLDER, PDF_FOLDER):
+        if not os.path.isdir(carpeta):
+            continue
+        for nombre in os.listdir(carpeta):
+            ruta = os.path.join(carpeta, nombre)
+            if not os.path.isfile(ruta) or nombre.startswith('.git'):
+                continue
+            if nombre in referenciados:
+                continue
+            edad = time.time() - os.path.getmtime(ruta)
+            if edad < EDAD_MINIMA_ARCHIVO:
+                continue
+            if nombre.startswith(PREFIJO_TEMPORAL) and edad < EDAD_MINIMA_TEMPORAL:
+                continue
+            huerfanos.append(ruta)
+            bytes_liberados += os.path.getsize(ruta)
+            if not simular:
+                os.remove(ruta)
+
+    # Las miniaturas ("<base>_<tamaño>.<ext>") siguen a su foto original
+    if os.path.isdir(MINIATURAS_FOLDER):
+        bases = {nombre.rsplit('.', 1)[0] for nombre in referenciados}
+        for nombre in os.listdir(MINIATURAS_FOLDER):
+            ruta = os.path.join(MINIATURAS_FOLDER, nombre)
+            if not os.path.isfile(ruta) or nombre.rsplit('_', 1)[0] in bases:
+                continue
+            huerfanos.append(ruta)
+            bytes_liberados += os.path.getsize(ruta)
+            if not simular:
+                os.remove(ruta)
+
+    return huerfanos, bytes_liberados
@@ -0,0 +1,375 @@
+"""
+Analítica de ejercicios y lecciones.
+
+A partir del historial de respuestas (ver historial.py) calcula, por ejercicio:
+  - p-valor: proporción de estudiantes que lo aciertan al primer intento,
+  - discriminación: correlación punto-biserial entre acertarlo y el resultado
+    del estudiante en el resto de ejercicios (un valor bajo o negativo suele
+    indicar un enunciado confuso o una respuesta correcta mal cargada),
+y, por lección, la tasa de aprobación y el histograma de calificaciones.
+
+El trabajo es incremental: solo se leen del historial las respuestas nuevas,
+que se reducen a la primera respuesta de cada estudiante en cada ejercicio
+(analitica_primera_respuesta, una matriz dispersa estudiantes × ejercicios).
+Para cada ejercicio se guardan sumas suficientes (Σx, Σy, Σxy, ...) y solo se
+recargan en arrays de NumPy las filas de los estudiantes con respuestas
+nuevas: se restan sus sumas anteriores y se añaden las actuales. Todo se
+calcula con bincount, sin bucles de Python, así que incluso un recálculo
+completo de millones de respuestas tarda unos segundos.
+Los resultados se guardan en analitica_ejercicio y analitica_leccion.
+
+Ejecutar (por ejemplo, desde cron):
+    python analitica.py [--completo]
+"""
+
+import json
+import sys
+import time
+from database import get_db_connection
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MIN_ESTUDIANTES = 20        # Respuestas necesarias para señalar un ejercicio
+P_DIFICIL = 0.3             # Por debajo: ejercicio demasiado difícil
+P_FACIL = 0.95              # Por encima: ejercicio que no aporta información
+DISCRIMINACION_MINIMA = 0.1 # Por debajo: ejercicio posiblemente defectuoso
+NOTA_APROBADO = 7.0
+
+
+# Sumas por ejercicio que permiten actualizar las métricas sin recorrer todo:
+# estudiantes, aciertos y, para la correlación, n, Σx, Σy, Σx², Σy², Σxy
+# (x = acierto, y = resultado del estudiante en el resto), más las latencias.
+SUMAS = ('estudiantes', 'aciertos', 'n_pares', 'suma_x', 'suma_y', 'suma_xx', 'suma_yy', 'suma_xy',
+         'n_latencias', 'suma_latencias')
+
+
+def _leer_estado(conn, clave):
+    fila = conn.execute('SELECT valor FROM historial_estado WHERE clave = ?', (clave,)).fetchone()
+    return fila['valor'] if fila else 0
+
+
+def _guardar_estado(conn, clave, valor):
+    conn.execute('''
+        INSERT INTO historial_estado (clave, valor) VALUES (?, ?)
+        ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor
+    ''', (clave, valor))
+
+
+def sumas_ejercicios(usuarios, ejercicios, correctas, latencias, n_ejercicios):
+    """
+    Sumas por ejercicio de un conjunto de estudiantes con todas sus respuestas
+
+    Args:
+        usuarios (ndarray): Índice denso (0..n-1) del estudiante de cada respuesta
+        ejercicios (ndarray): Índice denso del ejercicio de cada respuesta
+        correctas (ndarray): 1 si la primera respuesta fue correcta, 0 si no
+        latencias (ndarray): Milisegundos, o -1 si no se midió
+        n_ejercicios (int): Número de ejercicios (filas del resultado)
+
+    Returns:
+        ndarray de forma (len(SUMAS), n_ejercicios)
+    """
+    c = correctas.astype(np.float64)
+
+    # Resultado de cada estudiante en el resto de ejercicios (sin el propio)
+    respondidos = np.bincount(usuarios).astype(np.float64)
+    aciertos_usuario = np.bincount(usuarios, weights=c)
+    otros = respondidos[usuarios] - 1
+    validos = otros > 0
+    resto = np.zeros_like(c)
+    resto[validos] = (aciertos_usuario[usuarios][validos] - c[validos]) / otros[validos]
+
+    e, x, y = ejercicios[validos], c[validos], resto[validos]
+    medidas = latencias >= 0
+
+    def contar(indices, pesos=None):
+        return np.bincount(indices, weights=pesos, minlength=n_ejercicios).astype(np.float64)
+
+    return np.vstack([
+        contar(ejercicios),
+        contar(ejercicios, c),
+        contar(e),
+        contar(e, x),
+        contar(e, y),
+        contar(e, x * x),
+        contar(e, y * y),
+        contar(e, x * y),
+        contar(ejercicios[medidas]),
+        contar(ejercicios[medidas], latencias[medidas]),
+    ])
+
+
+def metricas_ejercicios(sumas):
+    """
+    p-valor, discriminación (correlación punto-biserial) y latencia media
+
+    Returns:
+        dict de arrays indexados por ejercicio (NaN donde no se puede calcular)
+    """
+    estudiantes, aciertos, n, sx, sy, sxx, syy, sxy, n_lat, suma_lat = sumas
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = n * sxy - sx * sy
+        var = (n * sxx - sx * sx) * (n * syy - sy * sy)
+        # Redondeo: sumas que se restan incrementalmente pueden dejar varianzas de ~1e-12
+        return {
+            'p_valor': np.where(estudiantes > 0, aciertos / estudiantes, np.nan),
+            'discriminacion': np.where(var > 1e-9, cov / np.sqrt(var), np.nan),
+            'latencia_media_ms': np.where(n_lat > 0, suma_lat / n_lat, np.nan),
+        }
+
+
+def calcular_lecciones(lecciones, calificaciones, intentos):
+    """
+    Tasa de aprobación e histograma de la mejor calificación por lección
+
+    Args:
+        lecciones (ndarray): Índice denso de lección de cada fila de progreso
+        calificaciones (ndarray): Mejor calificación (0-10)
+        intentos (ndarray): Intentos de cada estudiante en la lección
+
+    Returns:
+        dict de arrays indexados por lección; 'histograma' tiene forma
+        (lecciones, 10): calificaciones en [0,1), [1,2), ..., [9,10]
+    """
+    n_lecciones = int(lecciones.max()) + 1
+    estudiantes = np.bincount(lecciones, minlength=n_lecciones)
+    aprobados = np.bincount(lecciones, weights=calificaciones >= NOTA_APROBADO, minlength=n_lecciones)
+    suma_notas = np.bincount(lecciones, weights=calificaciones, minlength=n_lecciones)
+    suma_intentos = np.bincount(lecciones, weights=intentos, minlength=n_lecciones)
+
+    intervalo = np.clip(calificaciones.astype(np.int64), 0, 9)
+    histograma = np.bincount(lecciones * 10 + intervalo, minlength=n_lecciones * 10).reshape(n_lecciones, 10)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'estudiantes': estudiantes,
+            'aprobados': aprobados,
+            'tasa_aprobacion': np.where(estudiantes > 0, aprobados / estudiantes, np.nan),
+            'calificacion_media': np.where(estudiantes > 0, suma_notas / estudiantes, np.nan),
+            'intentos_medios': np.where(estudiantes > 0, suma_intentos / estudiantes, np.nan),
+            'histograma': histograma,
+        }
+
+
+def _opcional(valor):
+    return None if np.isnan(valor) else round(float(valor), 4)
+
+
+def _cargar_respuestas(conn, usuario_ids=None):
+    """Primeras respuestas (de todos o de algunos estudiantes) como array estructurado"""
+    cursor = conn.cursor()
+    cursor.row_factory = None  # Tuplas simples: np.fromiter no acepta sqlite3.Row
+    consulta = 'SELECT usuario_id, ejercicio_id, correcta, COALESCE(latencia_ms, -1) FROM analitica_primera_respuesta'
+    if usuario_ids is None:
+        cursor.execute(consulta)
+    else:
+        cursor.execute(consulta + ' WHERE usuario_id IN (SELECT value FROM json_each(?))',
+                       (json.dumps(usuario_ids),))
+    return np.fromiter(cursor, dtype=[('usuario', np.int64), ('ejercicio', np.int64),
+                                      ('correcta', np.int8), ('latencia', np.float64)])
+
+
+def _sumas_de(datos, ids_ejercicio):
+    if not len(datos):
+        return np.zeros((len(SUMAS), len(ids_ejercicio)))
+    _, usuarios = np.unique(datos['usuario'], return_inverse=True)
+    ejercicios = np.searchsorted(ids_ejercicio, datos['ejercicio'])
+    return sumas_ejercicios(usuarios, ejercicios, datos['correcta'], datos['latencia'], len(ids_ejercicio))
+
+
+def _actualizar_ejercicios(conn, completo):
+    """
+    Incorporar las respuestas nuevas y actualizar analitica_ejercicio
+
+    En modo incremental solo se cargan las respuestas de los estudiantes que
+    respondieron algo nuevo: se restan sus sumas de antes y se suman las de
+    ahora. En modo completo se recalcula todo desde la matriz.
+
+    Returns:
+        tuple (respuestas nuevas, ejercicios actualizados)
+    """
+    desde = _leer_estado(conn, 'ultima_respuesta_analitica')
+    hasta = conn.execute('SELECT COALESCE(MAX(id), 0) FROM respuestas_ejercicio').fetchone()[0]
+    if hasta <= desde and not completo:
+        return 0, 0
+
+    afectados = [fila[0] for fila in conn.execute(
+        'SELECT DISTINCT usuario_id FROM respuestas_ejercicio WHERE id > ? AND id <= ?', (desde, hasta))]
+    anteriores = None if completo else _cargar_respuestas(conn, afectados)
+
+    # Con ORDER BY id y OR IGNORE, la primera respuesta de cada par es la que queda
+    nuevas = conn.execute('''
+        INSERT OR IGNORE INTO analitica_primera_respuesta (usuario_id, ejercicio_id, correcta, latencia_ms)
+        SELECT usuario_id, ejercicio_id, correcta, latencia_ms
+        FROM respuestas_ejercicio
+        WHERE id > ? AND id <= ?
+        ORDER BY id
+    ''', (desde, hasta)).rowcount
+    _guardar_estado(conn, 'ultima_respuesta_analitica', hasta)
+
+    guardadas = conn.execute(f'SELECT ejercicio_id, {", ".join(SUMAS)} FROM analitica_ejercicio').fetchall()
+    if completo or not guardadas:
+        actuales = _cargar_respuestas(conn)
+        ids_ejercicio = np.unique(actuales['ejercicio'])
+        sumas = _sumas_de(actuales, ids_ejercicio)
+    else:
+        actuales = _cargar_respuestas(conn, afectados)
+        ids_ejercicio = np.unique(np.concatenate([
+            np.array([fila['ejercicio_id'] for fila in guardadas], dtype=np.int64), actuales['ejercicio']]))
+        sumas = np.zeros((len(SUMAS), len(ids_ejercicio)))
+        posiciones = np.searchsorted(ids_ejercicio, [fila['ejercicio_id'] for fila in guardadas])
+        sumas[:, posiciones] = np.array([tuple(fila)[1:] for fila in guardadas], dtype=np.float64).T
+        sumas += _sumas_de(actuales, ids_ejercicio) - _sumas_de(anteriores, ids_ejercicio)
+
+    metricas = metricas_ejercicios(sumas)
+    conn.execute('DELETE FROM analitica_ejercicio')
+    conn.executemany(f'''
+        INSERT INTO analitica_ejercicio
+        (ejercicio_id, p_valor, discriminacion, latencia_media_ms, actualizado, {", ".join(SUMAS)})
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, {", ".join("?" * len(SUMAS))})
+    ''', [(int(ejercicio_id),
+           _opcional(metricas['p_valor'][i]),
+           _opcional(metricas['discriminacion'][i]),
+           _opcional(metricas['latencia_media_ms'][i]),
+           *(round(float(valor), 6) for valor in sumas[:, i]))
+          for i, ejercicio_id in enumerate(ids_ejercicio)])
+    return nuevas, len(ids_ejercicio)
+
+
+def _actualizar_lecciones(conn, completo):
+    """Recalcular analitica_leccion para las lecciones con intentos nuevos (o todas)"""
+    desde = _leer_estado(conn, 'ultimo_intento_analitica')
+    hasta = conn.execute('SELECT COALESCE(MAX(id), 0) FROM intentos_leccion').fetchone()[0]
+    _guardar_estado(conn, 'ultimo_intento_analitica', hasta)
+
+    # Solo estudiantes que terminaron la lección al menos una vez
+    consulta = '''
+        SELECT leccion_id, calificacion, intentos FROM progreso_usuario
+        WHERE completada = 1 AND intentos > 0
+    '''
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    if completo:
+        conn.execute('DELETE FROM analitica_leccion')
+        cursor.execute(consulta)
+    elif hasta > desde:
+        filtro = 'SELECT DISTINCT leccion_id FROM intentos_leccion WHERE id > ? AND id <= ?'
+        conn.execute(f'DELETE FROM analitica_leccion WHERE leccion_id IN ({filtro})', (desde, hasta))
+        cursor.execute(f'{consulta} AND leccion_id IN ({filtro})', (desde, hasta))
+    else:
+        return 0
+
+    datos = np.fromiter(cursor, dtype=[('leccion', np.int64), ('calificacion', np.float64), ('intentos', np.float64)])
+    if not len(datos):
+        return 0
+    ids_leccion, lecciones = np.unique(datos['leccion'], return_inverse=True)
+    metricas = calcular_lecciones(lecciones, datos['calificacion'], datos['intentos'])
+
+    conn.executemany('''
+        INSERT INTO analitica_leccion
+        (leccion_id, estudiantes, aprobados, tasa_aprobacion, calificacion_media, intentos_medios, histograma, actualizado)
+        VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', [(int(leccion_id),
+           int(metricas['estudiantes'][i]),
+           int(metricas['aprobados'][i]),
+           _opcional(metricas['tasa_aprobacion'][i]),
+           _opcional(metricas['calificacion_media'][i]),
+           _opcional(metricas['intentos_medios'][i]),
+           json.dumps(metricas['histograma'][i].tolist()))
+          for i, leccion_id in enumerate(ids_leccion)])
+    return len(ids_leccion)
+
+
+def actualizar(completo=False):
+    """
+    Incorporar las respuestas e intentos nuevos y actualizar las tablas de resumen
+
+    Args:
+        completo (bool): Recalcular todo desde cero en lugar de incrementalmente
+            (corrige cualquier deriva de redondeo acumulada)
+
+    Returns:
+        dict con 'nuevas', 'ejercicios', 'lecciones' y 'segundos',
+        o None si NumPy no está instalado
+    """
+    if np is None:
+        return None
+
+    inicio = time.perf_counter()
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        nuevas, ejercicios = _actualizar_ejercicios(conn, completo)
+        lecciones = _actualizar_lecciones(conn, completo)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return {
+        'nuevas': nuevas,
+        'ejercicios': ejercicios,
+        'lecciones': lecciones,
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def obtener_resumen():
+    """
+    Resultados guardados para la página de administración
+
+    Returns:
+        tuple (ejercicios, lecciones): listas de dicts; los ejercicios con
+        problemas primero y los demás por p-valor ascendente
+    """
+    conn = get_db_connection()
+    ejercicios = [dict(fila) for fila in conn.execute('''
+        SELECT a.*, e.pregunta, e.tipo, e.leccion_id, l.titulo as leccion_titulo
+        FROM analitica_ejercicio a
+        JOIN ejercicios e ON e.id = a.ejercicio_id
+        JOIN lecciones l ON l.id = e.leccion_id
+        ORDER BY a.p_valor
+    ''')]
+    lecciones = [dict(fila) for fila in conn.execute('''
+        SELECT a.*, l.titulo, u.numero as unidad_numero
+        FROM analitica_leccion a
+        JOIN lecciones l ON l.id = a.leccion_id
+        JOIN unidades u ON u.id = l.unidad_id
+        ORDER BY u.orden, l.orden
+    ''')]
+    conn.close()
+
+    for ejercicio in ejercicios:
+        ejercicio['problemas'] = diagnostico(ejercicio)
+    ejercicios.sort(key=lambda e: not e['problemas'])
+    for leccion in lecciones:
+        leccion['histograma'] = json.loads(leccion['histograma'] or '[]')
+    return ejercicios, lecciones
+
+
+def diagnostico(ejercicio):
+    """Problemas detectados en una fila de analitica_ejercicio (lista de textos)"""
+    if ejercicio['estudiantes'] < MIN_ESTUDIANTES:
+        return []
+    problemas = []
+    if ejercicio['p_valor'] is not None and ejercicio['p_valor'] < P_DIFICIL:
+        problemas.append('Muy difícil')
+    if ejercicio['p_valor'] is not None and ejercicio['p_valor'] > P_FACIL:
+        problemas.append('Muy fácil')
+    if ejercicio['discriminacion'] is not None and ejercicio['discriminacion'] < DISCRIMINACION_MINIMA:
+        problemas.append('Revisar: no discrimina' if ejercicio['discriminacion'] >= 0 else 'Revisar: discriminación negativa')
+    return problemas
+
+
+if __name__ == '__main__':
+    if np is None:
+        print("❌ NumPy no está instalado: pip install numpy")
+    else:
+        resultado = actualizar(completo='--completo' in sys.argv)
+        print(f"✅ {resultado['nuevas']} respuestas nuevas; {resultado['ejercicios']} ejercicios y "
+              f"{resultado['lecciones']} lecciones recalculados en {resultado['segundos']} s")
@@ -1,13 +1,33 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, make_response, stream_template, get_flashed_messages
 from functools import wraps
 from database import init_db, get_db_connection
 from models import Usuario, Unidad, Leccion, Progreso, Ejercicio
-# Email service deshabilitado para Render.com (SMTP no funciona)
-# from email_service import init_mail, enviar_email_bienvenida, debug_email_config
+from almacenamiento import PERFILES_FOLDER, PDF_FOLDER, MINIATURAS_FOLDER, guardar_archivo, liberar_archivo
+from contrasenas import ServidorOcupado
+from limitador import permitir_login, login_correcto, login_fallido
+import filtro_emails
+from sesiones import init_sesiones, revocar_sesiones_usuario, revocar_sesiones_usuarios
+from importacion import iniciar_importacion, estado_importacion
+import historial
+import analitica
+import clasificacion
+import rachas
+import fragmentos
+import sincronizacion
+from plantillas import init_plantillas
+import plantillas
+from activos import init_activos
+import activos
+from compresion import MiddlewareCompresion
+from miniaturas import programar_miniaturas, eliminar_miniaturas, elegir_tamano, buscar_variante
+from email_service import init_mail, iniciar_worker_email, enviar_email_bienvenida, enviar_email_recuperacion, encolar_bienvenida_masiva, debug_email_config
+import hashlib
+import itertools
 import os
 import random
 import time
 from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask import send_from_directory
 from dotenv import load_dotenv
 
@@ -18,31 +38,70 @@ app = Flask(__name__)
 # Usar variable de entorno para SECRET_KEY, con fallback para desarrollo local
 app.secret_key = os.getenv('SECRET_KEY', 'clave_secreta_super_segura_12345')
 
-# Servicio de email deshabilitado para Render.com
-# init_mail(app)
-# debug_email_config()
+# Detrás del proxy de Render.com la IP real llega en X-Forwarded-For
+PROXIES_CONFIABLES = int(os.getenv('PROXIES_CONFIABLES', 0))
+if PROXIES_CONFIABLES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXIES_CONFIABLES, x_proto=PROXIES_CONFIABLES)
+
+# Compresión gzip/brotli de HTML y JSON (las respuestas en streaming y los estáticos precomprimidos no se tocan)
+app.wsgi_app = MiddlewareCompresion(app.wsgi_app)
+
+# Servicio de email: las peticiones solo escriben en la bandeja de salida (email_outbox)
+# y un hilo de fondo hace el envío SMTP. Deshabilitado por defecto (Render.com no permite SMTP).
+EMAIL_HABILITADO = os.getenv('EMAIL_HABILITADO', 'False') == 'True'
 
 # Configuración de subida de archivos
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads/perfiles')
+UPLOAD_FOLDER = PERFILES_FOLDER
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# Asegurar que existe el directorio
+# Asegurar que existen los directorios
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(PDF_FOLDER, exist_ok=True)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 with app.app_context():
     init_db()
+    # Filtro de Bloom de emails registrados para /api/check-email y registro
+    filtro_emails.reconstruir()
+    # Primera ejecución, o unidades añadidas/quitadas: recalcular la clasificación (un solo worker)
+    clasificacion.reconstruir_si_desactualizada()
+
+# Sesiones en el servidor: la cookie solo lleva un identificador opaco
+init_sesiones(app)
+
+# Etiqueta {% cache %} para los fragmentos de plantilla que no dependen del usuario
+fragmentos.init_fragmentos(app)
+
+# Bytecode de plantillas compartido entre workers; se precargan antes de la primera petición
+init_plantillas(app)
+
+# Estáticos minificados y con huella (python activos.py); variantes .br/.gz precomprimidas
+init_activos(app)
+
+if EMAIL_HABILITADO:
+    init_mail(app)
+    debug_email_config()
+    iniciar_worker_email(app)
+
+# Reinicio de rachas rotas a medianoche de cada zona horaria
+rachas.iniciar_reinicio_rachas()
 
 # Contexto procesador para hacer las unidades disponibles en todos los templates
 @app.context_processor
 def inject_unidades():
-    unidades = Unidad.obtener_todas()
+    unidades = fragmentos.memo('unidades', Unidad.obtener_todas)
     return dict(unidades=unidades)
 
 # Decoradores de autenticación
+def usuario_actual():
+    """Usuario de la sesión, leído una sola vez por petición (y cacheado unos segundos por worker)"""
+    if 'usuario' not in g:
+        g.usuario = Usuario.obtener_en_cache(session['usuario_id']) if 'usuario_id' in session else None
+    return g.usuario
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -52,7 +111,7 @@ def admin_required(f):
         # Verificar si es admin en sesión primero para evitar consultas extra
         if not session.get('es_admin'):
             # Doble verificación en BD por seguridad
-            usuario = Usuario.obtener_por_id(session['usuario_id'])
+            usuario = usuario_actual()
             if not usuario or not usuario['es_admin']:
                 flash('Acceso denegado. Se requieren permisos de administrador.', 'error')
                 return redirect(url_for('dashboard'))
@@ -75,6 +134,78 @@ def user_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _etag_progreso():
+    """
+    ETag de las páginas que solo dependen del progreso del usuario y del contenido del curso
+
+    Combina la versión de progreso del usuario, la racha que se mostraría hoy,
+    la versión del contenido, la de las plantillas, la de los estáticos y los datos de la barra
+    superior que salen de la sesión.
+    """
+    usuario = Usuario.obtener_validador(session['usuario_id'])
+    if not usuario:
+        return None
+    partes = (request.path, usuario['id'], usuario['version_progreso'], rachas.racha_vigente(usuario),
+              fragmentos.version(), plantillas.version(app), activos.version(),
+              session.get('nombre'), session.get('foto_perfil'), session.get('puntos'), session.get('racha'))
+    return hashlib.sha1(repr(partes).encode()).hexdigest()[:20]
+
+def respuesta_condicional(f):
+    """Responder 304 a If-None-Match antes de ejecutar la vista si el progreso no ha cambiado"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        # Con mensajes flash pendientes la página cambia aunque el progreso no.
+        # HEAD condicional (comprobación de una página precargada) tampoco ejecuta la vista
+        if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+            return f(*args, **kwargs)
+        
+        etag = _etag_progreso()
+        if etag is None:
+            return f(*args, **kwargs)
+        
+        if request.if_none_match.contains_weak(etag):
+            respuesta = app.response_class(status=304)
+        else:
+            respuesta = make_response(f(*args, **kwargs))
+            if respuesta.status_code != 200:
+                return respuesta
+        respuesta.set_etag(etag, weak=True)
+        # El navegador puede guardarla, pero debe revalidar en cada navegación
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+        return respuesta
+    return decorated_function
+
+def respuesta_en_streaming(plantilla, tamano_trozo=16384, **contexto):
+    """
+    Renderizar una plantilla a medida que se consumen sus datos (pueden ser generadores)
+
+    El HTML se envía en trozos de ~tamano_trozo caracteres: el primer byte sale
+    en cuanto se renderiza la cabecera y la memoria no depende del número de filas.
+    """
+    # Los mensajes flash se sacan de la sesión ahora: durante el streaming ya no se guardaría
+    get_flashed_messages(with_categories=True)
+    
+    def trozos(partes):
+        buffer, acumulado = [], 0
+        for parte in partes:
+            buffer.append(parte)
+            acumulado += len(parte)
+            if acumulado >= tamano_trozo:
+                yield ''.join(buffer)
+                buffer, acumulado = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    
+    return app.response_class(trozos(stream_template(plantilla, **contexto)), mimetype='text/html')
+
+@app.errorhandler(ServidorOcupado)
+def servidor_ocupado(e):
+    """Demasiados hashes de contraseña en cola (ver contrasenas.py)"""
+    mensaje = 'El servidor está ocupado. Intenta de nuevo en unos segundos.'
+    if request.is_json:
+        return jsonify({'success': False, 'message': mensaje}), 503, {'Retry-After': '5'}
+    return mensaje, 503, {'Retry-After': '5'}
+
 @app.route('/')
 def index():
     if 'usuario_id' in session:
@@ -84,8 +215,12 @@ def index():
 @app.before_request
 def check_password_change_required():
     """Middleware para forzar cambio de contraseña si es necesario"""
-    # Lista de endpoints permitidos (estáticos, logout, cambio de pass)
-    allowed_endpoints = ['static', 'logout', 'cambiar_password_obligatorio']
+    # Lista de endpoints permitidos (estáticos, logout, cambio de pass, service worker)
+    allowed_endpoints = ['static', 'logout', 'cambiar_password_obligatorio', 'service_worker']
+    
+    # Los estáticos no necesitan cargar la sesión
+    if request.endpoint == 'static':
+        return
     
     if 'usuario_id' in session and session.get('requiere_cambio'):
         if request.endpoint and request.endpoint not in allowed_endpoints:
@@ -97,13 +232,29 @@ def login():
         email = request.form.get('email')
         password = request.form.get('password')
         
-        usuario = Usuario.verificar_password(email, password)
+        # Limitar intentos fallidos por IP y por cuenta antes de tocar la base de datos o calcular un hash
+        permitido, espera = permitir_login(request.remote_addr, email)
+        if not permitido:
+            minutos = max(1, round(espera / 60))
+            flash(f'Demasiados intentos de inicio de sesión. Intenta de nuevo en {minutos} minuto(s).', 'error')
+            return render_template('login.html'), 429, {'Retry-After': str(int(espera) + 1)}
+        
+        try:
+            usuario = Usuario.verificar_password(email, password)
+        except ServidorOcupado:
+            flash('Hay muchos inicios de sesión en este momento. Intenta de nuevo en unos segundos.', 'error')
+            return render_template('login.html'), 503, {'Retry-After': '5'}
         
         if usuario:
             session['usuario_id'] = usuario['id']
             session['nombre'] = usuario['nombre_completo']
-            session['racha'] = usuario['racha_dias']
             session['es_admin'] = usuario['es_admin']
+            session['puntos'] = usuario['puntos_totales'] or 0
+            session['racha'] = rachas.racha_vigente(usuario)
+            
+            zona = rachas.zona_valida(request.form.get('zona_horaria'))
+            if zona and zona != usuario['zona_horaria']:
+                Usuario.actualizar_zona_horaria(usuario['id'], zona)
             
             # Verificar si requiere cambio de contraseña
             try:
@@ -115,7 +266,8 @@ def login():
                 session.clear()
                 flash('Tu cuenta ha sido desactivada. Contacta al administrador.', 'error')
                 return render_template('login.html')
-                
+            
+            login_correcto(email)
             flash('¡Bienvenido de nuevo!', 'success')
             
             if usuario['es_admin']:
@@ -123,6 +275,7 @@ def login():
                 
             return redirect(url_for('dashboard'))
         else:
+            login_fallido(request.remote_addr, email)
             flash('Email o contraseña incorrectos', 'error')
     
     return render_template('login.html')
@@ -144,13 +297,13 @@ def recuperar_password():
             # Marcar que requiere cambio de contraseña obligatorio
             Usuario.marcar_cambio_password(usuario['id'], True)
             
-            # Email deshabilitado para Render.com
-            # from email_service import enviar_email_recuperacion
-            # if enviar_email_recuperacion(usuario['nombre_completo'], email, password_temporal):
-            #     flash('Se ha enviado una nueva contraseña a tu correo', 'success')
-            #     return redirect(url_for('login'))
-            # else:
-            #     flash('Error al enviar el correo. Intenta nuevamente.', 'error')
+            if EMAIL_HABILITADO:
+                # Solo se encola: el envío no retrasa la respuesta
+                if enviar_email_recuperacion(usuario['nombre_completo'], email, password_temporal):
+                    flash('Se ha enviado una nueva contraseña a tu correo', 'success')
+                    return redirect(url_for('login'))
+                flash('Error al enviar el correo. Intenta nuevamente.', 'error')
+                return render_template('recuperar_password.html')
             
             # Mostrar contraseña temporal directamente (solo para desarrollo/producción sin email)
             flash(f'Tu nueva contraseña temporal es: {password_temporal}. Por favor, cámbiala después de iniciar sesión.', 'info')
@@ -198,31 +351,45 @@ def perfil():
     if 'usuario_id' not in session:
         return redirect(url_for('login'))
         
-    usuario = Usuario.obtener_por_id(session['usuario_id'])
+    usuario = usuario_actual()
     
     if request.method == 'POST':
         email = request.form.get('email')
         file = request.files.get('foto_perfil')
         
-        # Validar email único si cambió
+        # Validar email único si cambió. Consulta exacta: el filtro de Bloom de este worker
+        # no ve los emails registrados en otros hasta que se reconstruye
         if email != usuario['email']:
             if Usuario.obtener_por_email(email):
                 flash('El correo electrónico ya está en uso', 'error')
                 return render_template('perfil.html', usuario=usuario)
         
-        filename = usuario['foto_perfil'] # Mantener el actual si no hay cambios
+        foto_anterior = usuario['foto_perfil']
+        filename = None
         
         if file and file.filename != '' and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # Agregar timestamp para evitar cache
-            import time
-            filename = f"{int(time.time())}_{filename}"
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+            # Nombre por hash de contenido: la misma imagen se guarda una sola vez
+            extension = file.filename.rsplit('.', 1)[1].lower()
+            filename = guardar_archivo(file, app.config['UPLOAD_FOLDER'], extension)
+            
+        if not Usuario.actualizar_datos(usuario['id'], email, filename):
+            # Otra cuenta tomó el email entre la comprobación y la escritura (UNIQUE)
+            if filename and filename != foto_anterior:
+                liberar_archivo(app.config['UPLOAD_FOLDER'], filename)
+            flash('El correo electrónico ya está en uso', 'error')
+            return render_template('perfil.html', usuario=usuario)
+        
+        if filename:
+            # Re-codificar a tamaños de avatar fuera del hilo de la petición
+            programar_miniaturas(filename)
             
             # Actualizar sesión con nueva foto
             session['foto_perfil'] = filename
-            
-        Usuario.actualizar_datos(usuario['id'], email, filename if file else None)
+        
+        # Borrar la foto anterior si ningún otro registro la usa
+        if filename and foto_anterior != filename:
+            if liberar_archivo(app.config['UPLOAD_FOLDER'], foto_anterior):
+                eliminar_miniaturas(foto_anterior)
         
         # Actualizar email en sesión también
         session['email'] = email
@@ -234,12 +401,25 @@ def perfil():
 
 @app.route('/uploads/perfiles/<filename>')
 def uploaded_file(filename):
+    # ?s=<px> sirve la miniatura más pequeña que cubre ese tamaño (WebP si el navegador lo acepta)
+    tamano = request.args.get('s', type=int)
+    if tamano:
+        acepta_webp = 'image/webp' in request.headers.get('Accept', '')
+        variante = buscar_variante(filename, elegir_tamano(tamano), acepta_webp)
+        if variante:
+            response = send_from_directory(MINIATURAS_FOLDER, variante, max_age=31536000)
+            response.vary.add('Accept')
+            return response
+        
+        # Foto anterior a las miniaturas: generarlas para la próxima vez
+        if os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))):
+            programar_miniaturas(secure_filename(filename))
+    
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 @app.route('/api/check-email/<email>')
 def check_email(email):
-    usuario = Usuario.obtener_por_email(email)
-    return jsonify({'exists': bool(usuario)})
+    return jsonify({'exists': Usuario.existe_email(email)})
 
 @app.route('/registro', methods=['GET', 'POST'])
 def registro():
@@ -257,15 +437,20 @@ def registro():
             flash('La contraseña debe tener al menos 6 caracteres', 'error')
             return render_template('registro.html')
         
-        if Usuario.obtener_por_email(email):
+        if Usuario.existe_email(email):
             flash('El email ya está registrado', 'error')
             return render_template('registro.html')
         
         usuario_id = Usuario.crear(nombre, email, password)
         
         if usuario_id:
-            # Email de bienvenida deshabilitado para Render.com
-            # enviar_email_bienvenida(nombre, email)
+            zona = rachas.zona_valida(request.form.get('zona_horaria'))
+            if zona:
+                Usuario.actualizar_zona_horaria(usuario_id, zona)
+            
+            if EMAIL_HABILITADO:
+                # Se encola en email_outbox; el registro no espera al servidor SMTP
+                enviar_email_bienvenida(nombre, email)
             
             session['usuario_id'] = usuario_id
             session['nombre'] = nombre
@@ -283,14 +468,26 @@ def registro():
 def aprender(unidad_id=1):
     
     # Obtener todas las unidades para el menú
-    todas_unidades = Unidad.obtener_todas()
+    todas_unidades = fragmentos.memo('unidades', Unidad.obtener_todas)
     
-    # Obtener información de la unidad seleccionada
-    unidad = Unidad.obtener_por_id(unidad_id)
+    # Unidad, lecciones y PDFs: iguales para todos hasta que se edite el contenido
+    unidad, lecciones, pdfs_list = fragmentos.memo('contenido_unidad', _contenido_unidad, unidad_id)
     if not unidad:
         flash('Unidad no encontrada', 'error')
         return redirect(url_for('dashboard'))
     
+    return render_template('aprender.html', 
+                         unidad=unidad,
+                         lecciones=lecciones,
+                         todas_unidades=todas_unidades,
+                         pdfs=pdfs_list)
+
+def _contenido_unidad(unidad_id):
+    """Información de la unidad, sus lecciones y sus PDFs"""
+    unidad = Unidad.obtener_por_id(unidad_id)
+    if not unidad:
+        return None, [], []
+    
     lecciones = Leccion.obtener_por_unidad(unidad_id)
     
     # Obtener PDFs de la unidad
@@ -301,19 +498,14 @@ def aprender(unidad_id=1):
         ORDER BY fecha_subida DESC
     ''', (unidad_id,)).fetchall()
     conn.close()
-    pdfs_list = [dict(pdf) for pdf in pdfs]
-    
-    return render_template('aprender.html', 
-                         unidad=unidad,
-                         lecciones=lecciones,
-                         todas_unidades=todas_unidades,
-                         pdfs=pdfs_list)
+    return unidad, lecciones, [dict(pdf) for pdf in pdfs]
 
 @app.route('/dashboard')
 @user_required
+@respuesta_condicional
 def dashboard():
     usuario_id = session['usuario_id']
-    usuario = Usuario.obtener_por_id(usuario_id)
+    usuario = usuario_actual()
     
     # Validar que el usuario existe (por si se reinicializó la base de datos)
     if not usuario:
@@ -329,7 +521,7 @@ def dashboard():
     # Calcular promedio final
     promedio_final = Progreso.calcular_promedio_final(usuario_id)
     
-    session['racha'] = usuario['racha_dias']
+    session['racha'] = rachas.racha_vigente(usuario)
     
     # Crear diccionario de progreso por lección_id para acceso rápido
     progreso_dict = {}
@@ -389,10 +581,11 @@ def dashboard():
 
 @app.route('/leccion/<int:leccion_id>')
 @user_required
+@respuesta_condicional
 def leccion(leccion_id):
     
     usuario_id = session['usuario_id']
-    usuario = Usuario.obtener_por_id(usuario_id)
+    usuario = usuario_actual()
     
     # Validar que el usuario existe (por si se reinicializó la base de datos)
     if not usuario:
@@ -412,114 +605,124 @@ def leccion(leccion_id):
         flash(mensaje, 'error')
         return redirect(url_for('dashboard'))
     
-    # Obtener ejercicios de la lección
-    ejercicios_raw = Ejercicio.obtener_por_leccion(leccion_id)
-    total_ejercicios = len(ejercicios_raw)
-    
-    # Mezclar opciones aleatoriamente para cada ejercicio de opción múltiple
-    ejercicios = []
-    letras_base = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', 'u', 'v', 'w', 'x', 'y', 'z']
-    
-    for ejercicio in ejercicios_raw:
-        ejercicio_dict = dict(ejercicio)
-        
-        # Solo mezclar si es opción múltiple
-        if ejercicio_dict['tipo'] == 'opcion_multiple':
-            # Separar las opciones
-            opciones_lista = ejercicio_dict['opciones'].split('|')
-            
-            # Crear lista de tuplas (letra, texto)
-            opciones_con_letras = []
-            for opcion in opciones_lista:
-                partes = opcion.split(')', 1)
-                if len(partes) == 2:
-                    letra_original = partes[0].strip()
-                    texto = partes[1].strip()
-                    opciones_con_letras.append((letra_original, texto))
-            
-            # Encontrar la respuesta correcta original
-            respuesta_correcta_original = ejercicio_dict['respuesta_correcta'].strip().lower()
-            respuesta_correcta_texto = None
-            
-            # Buscar el texto de la respuesta correcta
-            for letra, texto in opciones_con_letras:
-                if letra.lower() == respuesta_correcta_original:
-                    respuesta_correcta_texto = texto
-                    break
-            
-            # Mezclar las opciones aleatoriamente
-            random.shuffle(opciones_con_letras)
-            
-            # Generar letras suficientes para todas las opciones
-            num_opciones = len(opciones_con_letras)
-            # Usar las letras base disponibles, o generar más si es necesario
-            if num_opciones <= len(letras_base):
-                letras_opciones = letras_base[:num_opciones]
-            else:
-                # Si hay más de 26 opciones, usar letras duplicadas con números (a1, a2, etc.)
-                letras_opciones = letras_base.copy()
-                for i in range(len(letras_base), num_opciones):
-                    letra_base = letras_base[i % len(letras_base)]
-                    numero = (i // len(letras_base)) + 1
-                    letras_opciones.append(f"{letra_base}{numero}")
-            
-            # Reconstruir las opciones con nuevas letras
-            opciones_mezcladas = []
-            nueva_respuesta_correcta = None
-            
-            for i, (letra_original, texto) in enumerate(opciones_con_letras):
-                nueva_letra = letras_opciones[i] if i < len(letras_opciones) else letra_original
-                opciones_mezcladas.append(f"{nueva_letra}) {texto}")
-                
-                # Si este texto es la respuesta correcta, guardar la nueva letra
-                if texto == respuesta_correcta_texto:
-                    nueva_respuesta_correcta = nueva_letra.lower() if isinstance(nueva_letra, str) else str(nueva_letra).lower()
-            
-            # Actualizar el ejercicio con opciones mezcladas y nueva respuesta correcta
-            ejercicio_dict['opciones'] = '|'.join(opciones_mezcladas)
-            ejercicio_dict['respuesta_correcta'] = nueva_respuesta_correcta or ejercicio_dict['respuesta_correcta']
-        
-        ejercicios.append(ejercicio_dict)
-    
-    # Obtener unidad
-    unidad = Unidad.obtener_por_id(leccion_data['unidad_id'])
-    
-    # Verificar progreso actual
-    progreso = Progreso.obtener_leccion_usuario(usuario_id, leccion_id)
-    
+    # Los ejercicios los pide el reproductor a /api/v1/lecciones/<id>; la URL lleva
+    # la versión del contenido para que el navegador reutilice el JSON entre intentos
     return render_template('leccion.html',
                          leccion=leccion_data,
-                         unidad=unidad,
-                         ejercicios=ejercicios,
-                         total_ejercicios=total_ejercicios,
-                         usuario=usuario,
-                         progreso=progreso)
+                         version_contenido=fragmentos.version())
 
-@app.route('/verificar_respuesta', methods=['POST'])
+def _siguiente_leccion(usuario_id, leccion_id):
+    """
+    Lección que sigue a leccion_id si el usuario ya la tiene desbloqueada
+
+    El reproductor la precarga (<link rel=prefetch>) al terminar: la página y el
+    JSON de ejercicios, con la misma ?v= que pedirá al abrirla.
+
+    Returns:
+        dict con id, titulo, url y datos, o None
+    """
+    siguiente = fragmentos.memo('leccion_siguiente', Leccion.obtener_siguiente, leccion_id)
+    if not siguiente or not Progreso.verificar_leccion_desbloqueada(usuario_id, siguiente['id'])[0]:
+        return None
+    return {
+        'id': siguiente['id'],
+        'titulo': siguiente['titulo'],
+        'url': url_for('leccion', leccion_id=siguiente['id']),
+        'datos': url_for('api_leccion', leccion_id=siguiente['id'], v=fragmentos.version()),
+    }
+
+def _ejercicio_para_cliente(ejercicio):
+    """
+    Ejercicio ya interpretado para el reproductor de lecciones
+
+    No incluye la respuesta correcta: el cliente envía a /verificar_respuesta la
+    letra original de la opción elegida y el servidor la compara con la base de datos.
+    """
+    datos = {'id': ejercicio['id'], 'tipo': ejercicio['tipo'], 'pregunta': ejercicio['pregunta']}
+
+    if ejercicio['tipo'] == 'opcion_multiple':
+        datos['opciones'] = []
+        for opcion in (ejercicio['opciones'] or '').split('|'):
+            letra, _, texto = opcion.partition(')')
+            datos['opciones'].append({'letra': letra.strip(), 'html': texto.replace('\\n', '<br>')})
+
+    elif ejercicio['tipo'] == 'fill_in_blank':
+        # La pregunta puede traer un ejemplo en <code>...</code> que se usa como código inicial
+        pregunta = ejercicio['pregunta']
+        codigo = ''
+        if '<code>' in pregunta:
+            pregunta, _, resto = pregunta.partition('<code>')
+            codigo = resto.split('</code>')[0].replace('___', '').replace('<br>', '\n').replace('<br />', '\n').strip()
+        for salto in ('<br>', '<br/>', '<br />'):
+            pregunta = pregunta.replace(salto, ' ')
+        datos['pregunta'] = pregunta.strip()
+        datos['codigo'] = codigo
+
+    return datos
+
+def _ejercicios_para_cliente(leccion_id):
+    return [_ejercicio_para_cliente(ejercicio) for ejercicio in Ejercicio.obtener_por_leccion(leccion_id)]
+
+@app.route('/api/v1/lecciones/<int:leccion_id>')
 @user_required
-def verificar_respuesta():
-    if 'usuario_id' not in session:
-        return jsonify({'error': 'No autorizado'}), 401
-    
-    usuario_id = session['usuario_id']
-    usuario = Usuario.obtener_por_id(usuario_id)
-    
-    if not usuario:
-        session.clear()
-        return jsonify({'error': 'Sesión expirada'}), 401
-    
-    data = request.get_json()
-    ejercicio_id = data.get('ejercicio_id')
-    respuesta_usuario = data.get('respuesta')
-    
-    ejercicio = Ejercicio.obtener_por_id(ejercicio_id)
-    
-    if not ejercicio:
-        return jsonify({'error': 'Ejercicio no encontrado'}), 404
-    
-    # Obtener la respuesta correcta mezclada del request (enviada desde el frontend)
-    respuesta_correcta_mezclada = data.get('respuesta_correcta_mezclada')
-    
+def api_leccion(leccion_id):
+    """
+    Ejercicios de una lección en JSON para el reproductor del navegador
+
+    Con ?v=<versión del contenido> vigente la respuesta se cachea como inmutable;
+    sin ella (o con una versión antigua) se revalida por ETag.
+    """
+    leccion_data = fragmentos.memo('leccion', Leccion.obtener_por_id, leccion_id)
+    if not leccion_data:
+        return jsonify({'success': False, 'error': 'Lección no encontrada'}), 404
+
+    desbloqueada, mensaje = Progreso.verificar_leccion_desbloqueada(session['usuario_id'], leccion_id)
+    if not desbloqueada:
+        return jsonify({'success': False, 'error': mensaje}), 403
+
+    version = fragmentos.version()
+    respuesta = jsonify({
+        'success': True,
+        'version': version,
+        'leccion': {'id': leccion_data['id'], 'titulo': leccion_data['titulo'], 'unidad_id': leccion_data['unidad_id']},
+        'ejercicios': fragmentos.memo('ejercicios_leccion', _ejercicios_para_cliente, leccion_id),
+    })
+    respuesta.set_etag(f'leccion-{leccion_id}-v{version}')
+    if request.args.get('v') == str(version):
+        respuesta.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta.make_conditional(request)
+
+def _entero_opcional(valor):
+    """Tiempos medidos en el navegador: enteros no negativos o None"""
+    try:
+        return max(0, int(valor))
+    except (TypeError, ValueError):
+        return None
+
+def _intento_de(data):
+    """Identificador del intento generado por la página de la lección"""
+    intento = data.get('intento')
+    return intento[:40] if isinstance(intento, str) else None
+
+def _registrar_actividad(usuario):
+    """Evento de actividad para la racha de días (solo el primero del día escribe)"""
+    racha = rachas.registrar_actividad(usuario)
+    if racha is not None:
+        session['racha'] = racha
+        Usuario.invalidar_cache(usuario['id'])
+
+def _corregir_respuesta(ejercicio, respuesta_usuario):
+    """
+    Corregir una respuesta contra la base de datos
+
+    La usan /verificar_respuesta (en línea) y /api/v1/resultados (respuestas
+    que quedaron sin corregir mientras no había conexión).
+
+    Returns:
+        (es_correcta, respuesta correcta a mostrar o None si acertó)
+    """
     # Manejar diferentes tipos de ejercicios
     if ejercicio['tipo'] == 'fill_in_blank':
         # Para fill in the blank, el usuario escribe el código completo
@@ -559,13 +762,8 @@ def verificar_respuesta():
         es_correcta = respuesta_usuario_lower == respuesta_correcta_db
         respuesta_correcta_verificar = respuesta_correcta_db
     else:
-        # Para opción múltiple
-        respuesta_correcta_mezclada = data.get('respuesta_correcta_mezclada')
-        if respuesta_correcta_mezclada:
-            respuesta_correcta_verificar = respuesta_correcta_mezclada.strip().lower()
-        else:
-            respuesta_correcta_verificar = ejercicio['respuesta_correcta'].strip().lower()
-        
+        # Para opción múltiple (el cliente envía la letra original, no la mostrada tras mezclar)
+        respuesta_correcta_verificar = ejercicio['respuesta_correcta'].strip().lower()
         es_correcta = respuesta_usuario.strip().lower() == respuesta_correcta_verificar
     
     # Determinar qué respuesta correcta mostrar en el feedback
@@ -577,13 +775,71 @@ def verificar_respuesta():
             else:
                 respuesta_correcta_feedback = ejercicio['respuesta_correcta'].strip()
         elif ejercicio['tipo'] == 'opcion_multiple':
-            respuesta_correcta_mezclada = data.get('respuesta_correcta_mezclada')
-            respuesta_correcta_feedback = respuesta_correcta_mezclada if respuesta_correcta_mezclada else ejercicio['respuesta_correcta'].strip()
+            respuesta_correcta_feedback = ejercicio['respuesta_correcta'].strip()
         elif ejercicio['tipo'] == 'verdadero_falso':
             respuesta_correcta_feedback = ejercicio['respuesta_correcta'].strip().capitalize()
         else:
             respuesta_correcta_feedback = ejercicio['respuesta_correcta'].strip()
     
+    return es_correcta, respuesta_correcta_feedback
+
+def _guardar_resultado(usuario, leccion_id, respuestas_correctas, total_ejercicios, duracion_ms=None, intento=None):
+    """
+    Guardar la calificación de una lección terminada (en línea o sincronizada)
+
+    Returns:
+        (calificación 0-10 de este intento, resultado de Progreso.guardar_calificacion)
+    """
+    if total_ejercicios > 0:
+        calificacion = (respuestas_correctas / total_ejercicios) * 10
+    else:
+        calificacion = 0
+
+    # Guardar calificación (solo si es mejor que la anterior)
+    resultado = Progreso.guardar_calificacion(
+        usuario['id'],
+        leccion_id,
+        calificacion,
+        respuestas_correctas,
+        total_ejercicios
+    )
+
+    if resultado['puntos'] is not None:
+        session['puntos'] = resultado['puntos']
+
+    historial.registrar_intento(usuario['id'], leccion_id, round(calificacion, 2), respuestas_correctas,
+                                total_ejercicios, duracion_ms, intento)
+    _registrar_actividad(usuario)
+    return calificacion, resultado
+
+@app.route('/verificar_respuesta', methods=['POST'])
+@user_required
+def verificar_respuesta():
+    if 'usuario_id' not in session:
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    usuario_id = session['usuario_id']
+    usuario = usuario_actual()
+    
+    if not usuario:
+        session.clear()
+        return jsonify({'error': 'Sesión expirada'}), 401
+    
+    data = request.get_json()
+    ejercicio_id = data.get('ejercicio_id')
+    respuesta_usuario = data.get('respuesta')
+    
+    ejercicio = Ejercicio.obtener_por_id(ejercicio_id)
+    
+    if not ejercicio:
+        return jsonify({'error': 'Ejercicio no encontrado'}), 404
+    
+    es_correcta, respuesta_correcta_feedback = _corregir_respuesta(ejercicio, respuesta_usuario)
+    
+    historial.registrar_respuesta(usuario_id, ejercicio['leccion_id'], ejercicio['id'], respuesta_usuario, es_correcta,
+                                  _entero_opcional(data.get('latencia_ms')), _intento_de(data))
+    _registrar_actividad(usuario)
+    
     return jsonify({
         'correcta': es_correcta,
         'explicacion': ejercicio['explicacion'],
@@ -600,7 +856,7 @@ def completar_leccion():
             return jsonify({'error': 'No autorizado'}), 401
         
         usuario_id = session['usuario_id']
-        usuario = Usuario.obtener_por_id(usuario_id)
+        usuario = usuario_actual()
         
         if not usuario:
             session.clear()
@@ -611,25 +867,18 @@ def completar_leccion():
         respuestas_correctas = data.get('respuestas_correctas', 0)
         total_ejercicios = data.get('total_ejercicios', 0)
         
-        # Calcular calificación (0-10)
-        if total_ejercicios > 0:
-            calificacion = (respuestas_correctas / total_ejercicios) * 10
-        else:
-            calificacion = 0
-        
         # Obtener información de la lección
         leccion_data = Leccion.obtener_por_id(leccion_id)
         unidad_id = leccion_data['unidad_id'] if leccion_data else None
-        
-        # Guardar calificación (solo si es mejor que la anterior)
-        resultado = Progreso.guardar_calificacion(
-            usuario_id, 
-            leccion_id, 
-            calificacion,
-            respuestas_correctas,
-            total_ejercicios
-        )
-        
+
+        # Anotar el intento para que un reenvío desde la cola sin conexión no lo duplique
+        intento = _intento_de(data)
+        if intento and leccion_data:
+            sincronizacion.marcar_intento(usuario_id, intento, leccion_id)
+
+        calificacion, resultado = _guardar_resultado(usuario, leccion_id, respuestas_correctas, total_ejercicios,
+                                                     _entero_opcional(data.get('duracion_ms')), intento)
+
         # Verificar si la unidad está completa
         unidad_completada = False
         todas_unidades_completadas = False
@@ -672,7 +921,9 @@ def completar_leccion():
             'mensaje': mensaje,
             'unidad_completada': unidad_completada,
             'todas_unidades_completadas': todas_unidades_completadas,
-            'promedio_final': promedio_final
+            'promedio_final': promedio_final,
+            'puntos': session.get('puntos', 0),
+            'siguiente_leccion': _siguiente_leccion(usuario_id, leccion_id)
         })
     except Exception as e:
         import traceback
@@ -680,6 +931,130 @@ def completar_leccion():
         print(traceback.format_exc())
         return jsonify({'error': str(e), 'success': False}), 500
 
+# LECCIONES SIN CONEXIÓN (ver sincronizacion.py)
+
+@app.route('/sw.js')
+def service_worker():
+    """Service worker servido desde la raíz: su alcance es la carpeta de su URL"""
+    respuesta = send_from_directory(os.path.join(app.static_folder, 'js'), 'sw.js', max_age=0)
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    return respuesta
+
+@app.route('/api/v1/unidades/<int:unidad_id>/paquete')
+@user_required
+def api_paquete_unidad(unidad_id):
+    """URLs que el service worker guarda para hacer sin conexión las lecciones desbloqueadas de la unidad"""
+    unidad, lecciones, _ = fragmentos.memo('contenido_unidad', _contenido_unidad, unidad_id)
+    if not unidad:
+        return jsonify({'success': False, 'error': 'Unidad no encontrada'}), 404
+
+    usuario_id = session['usuario_id']
+    version = fragmentos.version()
+    urls = sincronizacion.urls_paquete(
+        url_for, unidad_id, lecciones, version,
+        lambda leccion_id: Progreso.verificar_leccion_desbloqueada(usuario_id, leccion_id)[0])
+    # Las URLs llevan la versión del contenido y la huella de los estáticos: su hash cambia con cualquiera
+    # de ellos y al desbloquear lecciones, y el service worker solo vuelve a descargar entonces
+    return jsonify({'success': True, 'version': hashlib.sha1(' '.join(urls).encode()).hexdigest()[:12], 'urls': urls})
+
+def _sincronizar_resultado(usuario, resultado):
+    """
+    Guardar un intento enviado desde la cola sin conexión
+
+    Las respuestas se vuelven a corregir aquí: el cliente solo manda lo que
+    eligió el estudiante. Las que ya se corrigieron en línea (verificada) están
+    en el historial y no se registran otra vez.
+
+    Returns:
+        dict con 'estado': guardado, duplicado, otro_usuario, bloqueada o invalido
+    """
+    intento = _intento_de(resultado)
+    leccion_id = _entero_opcional(resultado.get('leccion_id'))
+    respuestas = resultado.get('respuestas')
+    if not intento or not leccion_id or not isinstance(respuestas, list):
+        return {'intento': intento, 'estado': 'invalido'}
+
+    # En un ordenador compartido la cola puede tener intentos de otro estudiante: se quedan para su sesión
+    if resultado.get('usuario_id') not in (None, usuario['id']):
+        return {'intento': intento, 'estado': 'otro_usuario'}
+
+    if not Leccion.obtener_por_id(leccion_id):
+        return {'intento': intento, 'estado': 'invalido'}
+    desbloqueada, _ = Progreso.verificar_leccion_desbloqueada(usuario['id'], leccion_id)
+    if not desbloqueada:
+        return {'intento': intento, 'estado': 'bloqueada'}
+
+    if not sincronizacion.marcar_intento(usuario['id'], intento, leccion_id):
+        return {'intento': intento, 'estado': 'duplicado'}
+
+    try:
+        ejercicios = {ejercicio['id']: ejercicio for ejercicio in Ejercicio.obtener_por_leccion(leccion_id)}
+        respuestas_correctas = 0
+        corregidos = set()
+        for respuesta in respuestas:
+            if not isinstance(respuesta, dict):
+                continue
+            ejercicio = ejercicios.get(_entero_opcional(respuesta.get('ejercicio_id')))
+            if not ejercicio or ejercicio['id'] in corregidos:
+                continue
+            corregidos.add(ejercicio['id'])
+            respuesta_usuario = str(respuesta.get('respuesta') or '')
+            es_correcta, _ = _corregir_respuesta(ejercicio, respuesta_usuario)
+            respuestas_correctas += es_correcta
+            if not respuesta.get('verificada'):
+                historial.registrar_respuesta(usuario['id'], leccion_id, ejercicio['id'], respuesta_usuario,
+                                              es_correcta, _entero_opcional(respuesta.get('latencia_ms')), intento)
+
+        calificacion, guardado = _guardar_resultado(usuario, leccion_id, respuestas_correctas, len(ejercicios),
+                                                    _entero_opcional(resultado.get('duracion_ms')), intento)
+    except Exception:
+        # Sin marca el cliente lo reintentará en la siguiente sincronización
+        sincronizacion.desmarcar_intento(usuario['id'], intento)
+        raise
+
+    return {
+        'intento': intento,
+        'estado': 'guardado',
+        'leccion_id': leccion_id,
+        'calificacion': guardado['calificacion'],
+        'calificacion_guardada': guardado['calificacion_guardada'],
+        'aprobada': guardado['aprobada'],
+        'es_mejor': guardado['es_mejor'],
+        'respuestas_correctas': respuestas_correctas,
+        'total_ejercicios': len(ejercicios),
+        'siguiente_leccion': _siguiente_leccion(usuario['id'], leccion_id),
+    }
+
+@app.route('/api/v1/resultados', methods=['POST'])
+@user_required
+def api_resultados():
+    """
+    Intentos de lecciones terminados sin conexión, en lote
+
+    Idempotente por intento: reenviar el mismo lote devuelve 'duplicado' para
+    lo ya guardado. Responde con el estado de cada intento para que el service
+    worker saque de su cola lo que no hay que volver a enviar.
+    """
+    usuario = usuario_actual()
+    if not usuario:
+        session.clear()
+        return jsonify({'success': False, 'error': 'Sesión expirada'}), 401
+
+    data = request.get_json(silent=True) or {}
+    resultados = data.get('resultados')
+    if not isinstance(resultados, list):
+        return jsonify({'success': False, 'error': 'Se esperaba una lista de resultados'}), 400
+
+    procesados = []
+    for resultado in resultados[:sincronizacion.MAX_LOTE]:
+        if isinstance(resultado, dict):
+            procesados.append(_sincronizar_resultado(usuario, resultado))
+        else:
+            procesados.append({'intento': None, 'estado': 'invalido'})
+    sincronizacion.purgar()
+
+    return jsonify({'success': True, 'resultados': procesados, 'puntos': session.get('puntos', 0)})
+
 @app.route('/logout')
 def logout():
     session.clear()
@@ -691,9 +1066,10 @@ def logout():
 
 @app.route('/calificaciones')
 @user_required
+@respuesta_condicional
 def calificaciones():
     usuario_id = session['usuario_id']
-    usuario = Usuario.obtener_por_id(usuario_id)
+    usuario = usuario_actual()
     
     # Obtener progreso detallado
     progreso_raw = Progreso.obtener_progreso_usuario(usuario_id)
@@ -737,11 +1113,46 @@ def calificaciones():
                          unidades_progreso=unidades_map,
                          promedio_final=promedio_final)
 
+def _parametros_clasificacion():
+    """Ámbito ('curso' o 'unidad:<id>'), métrica y cursor de la petición"""
+    unidad = request.args.get('unidad', type=int)
+    ambito = f'unidad:{unidad}' if unidad else 'curso'
+    metrica = request.args.get('metrica', 'promedio')
+    if metrica not in clasificacion.METRICAS:
+        metrica = 'promedio'
+    return ambito, metrica, request.args.get('cursor') or None
+
+@app.route('/clasificacion')
+@user_required
+def ver_clasificacion():
+    ambito, metrica, cursor = _parametros_clasificacion()
+    filas, siguiente = clasificacion.pagina(ambito, metrica, cursor)
+    return render_template('clasificacion.html',
+                         filas=filas,
+                         siguiente=siguiente,
+                         mi_posicion=clasificacion.posicion(session['usuario_id'], ambito, metrica),
+                         unidad_actual=request.args.get('unidad', type=int),
+                         metrica=metrica,
+                         es_primera_pagina=cursor is None)
+
+@app.route('/api/clasificacion')
+@user_required
+def api_clasificacion():
+    ambito, metrica, cursor = _parametros_clasificacion()
+    filas, siguiente = clasificacion.pagina(ambito, metrica, cursor, request.args.get('limite', clasificacion.POR_PAGINA, type=int))
+    return jsonify({
+        'success': True,
+        'clasificacion': filas,
+        'siguiente': siguiente,
+        'mi_posicion': clasificacion.posicion(session['usuario_id'], ambito, metrica)
+    })
+
 @app.route('/certificado')
 @user_required
+@respuesta_condicional
 def certificado():
     usuario_id = session['usuario_id']
-    usuario = Usuario.obtener_por_id(usuario_id)
+    usuario = usuario_actual()
     
     # Verificar si completó todas las unidades
     progreso_unidades = Progreso.obtener_progreso_unidades(usuario_id)
@@ -772,7 +1183,7 @@ def certificado():
 @admin_required
 def admin_dashboard():
     stats = {
-        'total_usuarios': len(Usuario.obtener_todos()),
+        'total_usuarios': Usuario.contar(),
         'unidades': len(Unidad.obtener_todas())
     }
     return render_template('admin/dashboard.html', stats=stats)
@@ -780,8 +1191,27 @@ def admin_dashboard():
 @app.route('/admin/usuarios')
 @admin_required
 def admin_usuarios():
-    usuarios = Usuario.obtener_todos()
-    return render_template('admin/usuarios.html', usuarios=usuarios)
+    busqueda = request.args.get('q', '').strip()
+    usuarios, siguiente = Usuario.listar_pagina(request.args.get('cursor'), busqueda)
+    return respuesta_en_streaming('admin/usuarios.html', usuarios=usuarios, siguiente=siguiente,
+                                  busqueda=busqueda, total=Usuario.contar(busqueda))
+
+@app.route('/admin/api/usuarios')
+@admin_required
+def admin_api_usuarios():
+    """Listado paginado de usuarios en JSON (?q=prefijo&cursor=...&limite=50)"""
+    busqueda = request.args.get('q', '').strip()
+    usuarios, siguiente = Usuario.listar_pagina(request.args.get('cursor'), busqueda,
+                                                request.args.get('limite', type=int))
+    respuesta = {
+        'success': True,
+        'usuarios': [dict(usuario) for usuario in usuarios],
+        'siguiente': siguiente
+    }
+    # El total solo hace falta para la primera página
+    if not request.args.get('cursor'):
+        respuesta['total'] = Usuario.contar(busqueda)
+    return jsonify(respuesta)
 
 @app.route('/admin/usuarios/<int:usuario_id>/estado', methods=['POST'])
 @admin_required
@@ -794,6 +1224,9 @@ def admin_cambiar_estado(usuario_id):
         return jsonify({'success': False, 'message': 'No puedes desactivar tu propia cuenta'}), 400
         
     Usuario.actualizar_estado(usuario_id, activo)
+    if not activo:
+        # Cerrar las sesiones abiertas del usuario desactivado
+        revocar_sesiones_usuario(usuario_id)
     return jsonify({'success': True})
 
 @app.route('/admin/usuarios/<int:usuario_id>/password', methods=['POST'])
@@ -806,35 +1239,119 @@ def admin_cambiar_password(usuario_id):
         return jsonify({'success': False, 'message': 'La contraseña debe tener al menos 6 caracteres'}), 400
         
     Usuario.admin_cambiar_password(usuario_id, new_password)
+    revocar_sesiones_usuario(usuario_id)
     return jsonify({'success': True})
 
+@app.route('/admin/usuarios/importar', methods=['POST'])
+@admin_required
+def admin_importar_usuarios():
+    """Crear usuarios en bloque desde un CSV (nombre_completo, email, password opcional)"""
+    archivo = request.files.get('archivo')
+    if not archivo or not archivo.filename:
+        return jsonify({'success': False, 'message': 'No se seleccionó ningún archivo'}), 400
+    if not archivo.filename.lower().endswith(('.csv', '.txt')):
+        return jsonify({'success': False, 'message': 'El archivo debe ser un CSV'}), 400
+
+    al_crear = None
+    if EMAIL_HABILITADO:
+        def al_crear(creados):
+            # Se llama desde el hilo de la importación: obtener_plantilla necesita el contexto de la app
+            with app.app_context():
+                encolar_bienvenida_masiva([(u['nombre'], u['email']) for u in creados], procesos=1)
+
+    # Se valida aquí y se crea en segundo plano: el panel consulta el progreso
+    importacion = iniciar_importacion(archivo.stream, al_crear)
+    return jsonify({
+        'success': True,
+        'importacion_id': importacion['id'],
+        'total': importacion['total'],
+        'url_estado': url_for('admin_estado_importacion', importacion_id=importacion['id'])
+    }), 202
+
+@app.route('/admin/usuarios/importar/<int:importacion_id>')
+@admin_required
+def admin_estado_importacion(importacion_id):
+    estado = estado_importacion(importacion_id)
+    if not estado:
+        return jsonify({'success': False, 'message': 'Importación no encontrada'}), 404
+    # Las credenciales (contraseñas generadas) solo llegan en la primera consulta tras terminar
+    return jsonify({'success': True, **estado})
+
+def _ids_de_peticion(data):
+    try:
+        return sorted({int(usuario_id) for usuario_id in data.get('ids') or []})
+    except (TypeError, ValueError):
+        return None
+
+@app.route('/admin/usuarios/estado', methods=['POST'])
+@admin_required
+def admin_cambiar_estado_varios():
+    data = request.get_json() or {}
+    ids = _ids_de_peticion(data)
+    if not ids:
+        return jsonify({'success': False, 'message': 'No se seleccionó ningún usuario'}), 400
+
+    activo = bool(data.get('activo'))
+    # El propio administrador nunca se desactiva a sí mismo
+    modificados = Usuario.actualizar_estado_varios(ids, activo, excluir=session['usuario_id'])
+    if not activo:
+        revocar_sesiones_usuarios(modificados)
+    return jsonify({'success': True, 'modificados': len(modificados)})
+
+@app.route('/admin/usuarios/password', methods=['POST'])
+@admin_required
+def admin_cambiar_password_varios():
+    data = request.get_json() or {}
+    ids = _ids_de_peticion(data)
+    new_password = data.get('password') or ''
+    if not ids:
+        return jsonify({'success': False, 'message': 'No se seleccionó ningún usuario'}), 400
+    if len(new_password) < 6:
+        return jsonify({'success': False, 'message': 'La contraseña debe tener al menos 6 caracteres'}), 400
+
+    modificados = Usuario.restablecer_password_varios(ids, new_password)
+    revocar_sesiones_usuarios(modificados)
+    return jsonify({'success': True, 'modificados': len(modificados)})
+
+@app.route('/admin/api/cache')
+@admin_required
+def admin_api_cache():
+    """Tasa de aciertos de la caché de fragmentos (de este worker)"""
+    return jsonify({'success': True, **fragmentos.estadisticas()})
+
+@app.route('/admin/analitica')
+@admin_required
+def admin_analitica():
+    """Dificultad y discriminación de los ejercicios, y resultados por lección"""
+    ejercicios, lecciones = analitica.obtener_resumen()
+    return render_template('admin/analitica.html', ejercicios=ejercicios, lecciones=lecciones,
+                           numpy_disponible=analitica.np is not None,
+                           min_estudiantes=analitica.MIN_ESTUDIANTES)
+
+@app.route('/admin/analitica/actualizar', methods=['POST'])
+@admin_required
+def admin_analitica_actualizar():
+    # Incluir también las respuestas que este worker aún tiene en memoria
+    historial.volcar()
+    resultado = analitica.actualizar()
+    if resultado is None:
+        return jsonify({'success': False, 'message': 'NumPy no está instalado en el servidor'}), 500
+    return jsonify({'success': True, **resultado})
+
 @app.route('/admin/progreso')
 @admin_required
 def admin_progreso():
     """Página para ver el progreso detallado de todos los usuarios"""
-    usuarios = Usuario.obtener_todos()
     unidades = Unidad.obtener_todas()
     
-    # Obtener progreso detallado de cada usuario
-    usuarios_progreso = []
-    for usuario in usuarios:
-        if not usuario['es_admin']:  # Solo mostrar estudiantes
-            progreso_usuario = Progreso.obtener_progreso_usuario(usuario['id'])
-            progreso_unidades = Progreso.obtener_progreso_unidades(usuario['id'])
-            promedio_final = Progreso.calcular_promedio_final(usuario['id'])
-            stats = Progreso.obtener_estadisticas(usuario['id'])
-            
-            usuarios_progreso.append({
-                'usuario': usuario,
-                'progreso': progreso_usuario,
-                'progreso_unidades': progreso_unidades,
-                'promedio_final': promedio_final,
-                'stats': stats
-            })
-    
-    return render_template('admin/progreso.html', 
-                         usuarios_progreso=usuarios_progreso,
-                         unidades=unidades)
+    # Progreso de los estudiantes por lotes, a medida que se envía la página
+    estudiantes = Progreso.iterar_progreso_estudiantes()
+    primero = next(estudiantes, None)
+    usuarios_progreso = itertools.chain([primero], estudiantes) if primero else []
+    
+    return respuesta_en_streaming('admin/progreso.html', 
+                                  usuarios_progreso=usuarios_progreso,
+                                  unidades=unidades)
 
 @app.route('/admin/contenido')
 @admin_required
@@ -905,6 +1422,7 @@ def admin_agregar_ejercicio():
         conn.commit()
         ejercicio_id = cursor.lastrowid
         conn.close()
+        fragmentos.invalidar()
         return jsonify({'success': True, 'ejercicio_id': ejercicio_id})
     except Exception as e:
         conn.close()
@@ -921,6 +1439,7 @@ def admin_gestionar_ejercicio(ejercicio_id):
             conn.execute('DELETE FROM ejercicios WHERE id = ?', (ejercicio_id,))
             conn.commit()
             conn.close()
+            fragmentos.invalidar()
             return jsonify({'success': True})
         except Exception as e:
             conn.close()
@@ -944,6 +1463,7 @@ def admin_gestionar_ejercicio(ejercicio_id):
             ))
             conn.commit()
             conn.close()
+            fragmentos.invalidar()
             return jsonify({'success': True})
         except Exception as e:
             conn.close()
@@ -970,6 +1490,7 @@ def admin_actualizar_unidad(unidad_id):
             conn.execute('UPDATE unidades SET descripcion = ? WHERE id = ?', (descripcion, unidad_id))
         conn.commit()
         conn.close()
+        fragmentos.invalidar()
         return jsonify({'success': True})
     except Exception as e:
         conn.close()
@@ -996,6 +1517,7 @@ def admin_actualizar_leccion(leccion_id):
             conn.execute('UPDATE lecciones SET descripcion = ? WHERE id = ?', (descripcion, leccion_id))
         conn.commit()
         conn.close()
+        fragmentos.invalidar()
         return jsonify({'success': True})
     except Exception as e:
         conn.close()
@@ -1027,16 +1549,14 @@ def admin_eliminar_pdf(pdf_id):
             conn.close()
             return jsonify({'success': False, 'message': 'PDF no encontrado'}), 404
         
-        # Eliminar archivo físico
-        upload_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads/pdf')
-        filepath = os.path.join(upload_folder, pdf['ruta_archivo'])
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        
         # Eliminar registro de la base de datos
         conn.execute('DELETE FROM contenido_pdf WHERE id = ?', (pdf_id,))
         conn.commit()
+        
+        # Eliminar archivo físico solo si otra unidad no comparte el mismo PDF
+        liberar_archivo(PDF_FOLDER, pdf['ruta_archivo'], conn)
         conn.close()
+        fragmentos.invalidar()
         return jsonify({'success': True})
     except Exception as e:
         conn.close()
@@ -1062,44 +1582,48 @@ def admin_subir_pdf():
     if not archivo.filename.lower().endswith('.pdf'):
         return jsonify({'success': False, 'message': 'El archivo debe ser un PDF'}), 400
     
-    # Eliminar PDFs anteriores de esta unidad si existen
+    # Guardar el nuevo archivo (nombre por hash de contenido)
+    filename = guardar_archivo(archivo, PDF_FOLDER, 'pdf')
+    filepath = os.path.join(PDF_FOLDER, filename)
+    
     conn = get_db_connection()
-    pdfs_anteriores = conn.execute('SELECT * FROM contenido_pdf WHERE unidad_id = ?', (unidad_id,)).fetchall()
-    upload_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads/pdf')
-    os.makedirs(upload_folder, exist_ok=True)
-    
-    for pdf_ant in pdfs_anteriores:
-        filepath_ant = os.path.join(upload_folder, pdf_ant['ruta_archivo'])
-        if os.path.exists(filepath_ant):
-            os.remove(filepath_ant)
-        conn.execute('DELETE FROM contenido_pdf WHERE id = ?', (pdf_ant['id'],))
-    
-    # Guardar el nuevo archivo
-    filename = secure_filename(f"unidad_{unidad_id}_{int(time.time())}.pdf")
-    filepath = os.path.join(upload_folder, filename)
-    archivo.save(filepath)
-    
-    # Procesamiento básico del PDF (extracción de texto)
-    texto_extraido = ""
-    try:
-        import PyPDF2
-        with open(filepath, 'rb') as pdf_file:
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            for page in pdf_reader.pages:
-                texto_extraido += page.extract_text() + "\n"
-    except ImportError:
-        texto_extraido = None
-    except Exception as e:
-        texto_extraido = f"Error al extraer texto: {str(e)}"
     
-    # Guardar información del PDF procesado
+    # Si el mismo PDF ya fue procesado, reutilizar el texto extraído
+    pdf_existente = conn.execute(
+        'SELECT texto_extraido FROM contenido_pdf WHERE ruta_archivo = ? LIMIT 1', (filename,)
+    ).fetchone()
+    
+    if pdf_existente:
+        texto_extraido = pdf_existente['texto_extraido']
+    else:
+        # Procesamiento básico del PDF (extracción de texto)
+        texto_extraido = ""
+        try:
+            import PyPDF2
+            with open(filepath, 'rb') as pdf_file:
+                pdf_reader = PyPDF2.PdfReader(pdf_file)
+                for page in pdf_reader.pages:
+                    texto_extraido += page.extract_text() + "\n"
+        except ImportError:
+            texto_extraido = None
+        except Exception as e:
+            texto_extraido = f"Error al extraer texto: {str(e)}"
+    
+    # Reemplazar PDFs anteriores de esta unidad y guardar información del PDF procesado
     try:
+        pdfs_anteriores = conn.execute('SELECT * FROM contenido_pdf WHERE unidad_id = ?', (unidad_id,)).fetchall()
+        conn.execute('DELETE FROM contenido_pdf WHERE unidad_id = ?', (unidad_id,))
         conn.execute('''
             INSERT INTO contenido_pdf (unidad_id, nombre_archivo, ruta_archivo, texto_extraido, fecha_subida)
             VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
         ''', (unidad_id, archivo.filename, filename, texto_extraido))
         conn.commit()
+        
+        # Borrar del disco los PDFs anteriores que ya no usa ninguna unidad
+        for pdf_ant in pdfs_anteriores:
+            liberar_archivo(PDF_FOLDER, pdf_ant['ruta_archivo'], conn)
         conn.close()
+        fragmentos.invalidar()
         
         if texto_extraido:
             preview = texto_extraido[:500] + '...' if len(texto_extraido) > 500 else texto_extraido
@@ -1119,8 +1643,7 @@ def admin_subir_pdf():
 @app.route('/uploads/pdf/<filename>')
 def uploaded_pdf(filename):
     """Servir archivos PDF"""
-    upload_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads/pdf')
-    return send_from_directory(upload_folder, filename)
+    return send_from_directory(PDF_FOLDER, filename)
 
 if __name__ == '__main__':
     # Usar puerto dinámico para Render.com, con fallback para desarrollo local
@@ -0,0 +1,88 @@
+"""
+Benchmark del cálculo de analítica de ejercicios con millones de respuestas.
+
+Genera respuestas sintéticas (habilidad del estudiante frente a dificultad del
+ejercicio, con un ejercicio "roto" cuya respuesta correcta está mal cargada),
+mide una primera ejecución, otra incremental con pocas respuestas nuevas y un
+recálculo completo, compara los dos resultados y comprueba que el ejercicio roto aparece con discriminación negativa.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_analitica.py [estudiantes] [ejercicios]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Base de datos temporal para no tocar instance/aprendizaje.db
+os.chdir(tempfile.mkdtemp(prefix='bench_analitica_'))
+
+import numpy as np
+from database import init_db, get_db_connection
+import analitica
+
+
+def respuestas_sinteticas(estudiantes, ejercicios, rng, desde_usuario=1):
+    habilidad = rng.normal(0, 1, estudiantes)
+    dificultad = rng.normal(0, 1, ejercicios)
+    prob = 1 / (1 + np.exp(-(habilidad[:, None] - dificultad[None, :])))
+    correctas = rng.random((estudiantes, ejercicios)) < prob
+    # El ejercicio 0 está mal cargado: lo "aciertan" quienes se equivocan
+    correctas[:, 0] = ~correctas[:, 0] & (rng.random(estudiantes) < 0.9)
+    latencias = rng.integers(2000, 60000, (estudiantes, ejercicios))
+    usuarios = np.repeat(np.arange(desde_usuario, desde_usuario + estudiantes), ejercicios)
+    ids_ejercicio = np.tile(np.arange(1, ejercicios + 1), estudiantes)
+    return zip(usuarios.tolist(), ids_ejercicio.tolist(), correctas.ravel().astype(int).tolist(),
+               latencias.ravel().tolist())
+
+
+def insertar(filas):
+    conn = get_db_connection()
+    conn.executemany('''
+        INSERT INTO respuestas_ejercicio (usuario_id, leccion_id, ejercicio_id, correcta, latencia_ms, fecha)
+        VALUES (?, 1, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', filas)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    estudiantes = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    ejercicios = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = np.random.default_rng(7)
+
+    init_db()
+    inicio = time.perf_counter()
+    insertar(respuestas_sinteticas(estudiantes, ejercicios, rng))
+    print(f"{estudiantes * ejercicios:,} respuestas generadas en {time.perf_counter() - inicio:.1f} s")
+
+    resultado = analitica.actualizar()
+    print(f"Completo:     {resultado['nuevas']:,} nuevas, {resultado['ejercicios']} ejercicios en {resultado['segundos']} s")
+
+    insertar(respuestas_sinteticas(200, ejercicios, rng, desde_usuario=estudiantes + 1))
+    resultado = analitica.actualizar()
+    print(f"Incremental:  {resultado['nuevas']:,} nuevas, {resultado['ejercicios']} ejercicios en {resultado['segundos']} s")
+
+    resultado = analitica.actualizar()
+    print(f"Sin cambios:  {resultado['nuevas']} nuevas en {resultado['segundos']} s")
+
+    conn = get_db_connection()
+    incremental = conn.execute('SELECT p_valor, discriminacion FROM analitica_ejercicio ORDER BY ejercicio_id').fetchall()
+    resultado = analitica.actualizar(completo=True)
+    print(f"Recálculo completo: {resultado['ejercicios']} ejercicios en {resultado['segundos']} s")
+    completo = conn.execute('SELECT p_valor, discriminacion FROM analitica_ejercicio ORDER BY ejercicio_id').fetchall()
+    diferencia = max(abs(a['discriminacion'] - b['discriminacion']) for a, b in zip(incremental, completo))
+    print(f"Diferencia máxima incremental/completo en la discriminación: {diferencia:.1e}")
+
+    filas = conn.execute('SELECT ejercicio_id, p_valor, discriminacion FROM analitica_ejercicio ORDER BY discriminacion LIMIT 3').fetchall()
+    conn.close()
+    for fila in filas:
+        print(f"  ejercicio {fila['ejercicio_id']:>3}: p={fila['p_valor']:.2f} discriminación={fila['discriminacion']:+.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark de /api/check-email bajo una ráfaga de peticiones concurrentes.
+
+Compara la ruta con el filtro de Bloom contra consultar siempre la base de
+datos, con la mayoría de emails sin registrar (como al ir escribiendo en el
+formulario de registro).
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_check_email.py [usuarios] [peticiones] [hilos]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Base de datos temporal para no tocar instance/aprendizaje.db
+os.chdir(tempfile.mkdtemp(prefix='bench_check_email_'))
+
+from database import init_db, get_db_connection
+
+
+def poblar(cantidad):
+    init_db()
+    conn = get_db_connection()
+    conn.executemany(
+        'INSERT INTO usuarios (nombre_completo, email, password) VALUES (?, ?, ?)',
+        ((f"Estudiante {i}", f"estudiante{i}@ejemplo.com", 'x') for i in range(cantidad))
+    )
+    conn.commit()
+    conn.close()
+
+
+def rafaga(app, emails, hilos):
+    def consultar(trozo):
+        cliente = app.test_client()
+        for email in trozo:
+            cliente.get(f'/api/check-email/{email}')
+
+    trozos = [emails[i::hilos] for i in range(hilos)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(consultar, trozos))
+    return time.perf_counter() - inicio
+
+
+def main():
+    usuarios = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    peticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    hilos = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+
+    poblar(usuarios)
+    from app import app
+    from models import Usuario
+    import filtro_emails
+
+    # 90% de emails nuevos (tecleando), 10% ya registrados
+    emails = [f"estudiante{i}@ejemplo.com" if i % 10 == 0 else f"nuevo{i}@ejemplo.com"
+              for i in range(peticiones)]
+
+    consultas = [0]
+    obtener_original = Usuario.obtener_por_email
+
+    def obtener_contando(email):
+        consultas[0] += 1
+        return obtener_original(email)
+
+    Usuario.obtener_por_email = staticmethod(obtener_contando)
+
+    print(f"{usuarios} usuarios, {peticiones} peticiones, {hilos} hilos\n")
+
+    puede_existir = filtro_emails.puede_existir
+    filtro_emails.puede_existir = lambda email: True
+    duracion = rafaga(app, emails, hilos)
+    print(f"{'Sin filtro':<14} {peticiones / duracion:>8,.0f} req/s  consultas a BD: {consultas[0]}")
+
+    filtro_emails.puede_existir = puede_existir
+    consultas[0] = 0
+    duracion = rafaga(app, emails, hilos)
+    print(f"{'Con filtro':<14} {peticiones / duracion:>8,.0f} req/s  consultas a BD: {consultas[0]}")
+
+    filtro = filtro_emails._filtro
+    print(f"\nFiltro: {filtro.m / 8 / 1024:.0f} KB, k={filtro.k}, "
+          f"falsos positivos: {consultas[0] - peticiones // 10}")
+
+
+if __name__ == '__main__':
+    main()
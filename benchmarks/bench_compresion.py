@@ -0,0 +1,90 @@
+"""
+Benchmark de la compresión de respuestas: CPU gastada frente a bytes ahorrados.
+
+Obtiene sin comprimir páginas y respuestas JSON representativas y, para cada
+una, mide gzip y brotli a varios niveles: tamaño resultante y milisegundos de
+CPU por compresión. Los niveles por defecto del middleware son los marcados
+con *.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_compresion.py [repeticiones]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Base de datos temporal para no tocar instance/aprendizaje.db
+os.chdir(tempfile.mkdtemp(prefix='bench_compresion_'))
+
+PAGINAS = [
+    ('estudiante', '/dashboard'),
+    ('estudiante', '/aprender/1'),
+    ('estudiante', '/leccion/1'),
+    ('estudiante', '/calificaciones'),
+    ('admin', '/admin'),
+    ('admin', '/admin/contenido/ejercicios'),
+    ('admin', '/admin/contenido/ejercicios/1'),
+    ('admin', '/admin/contenido/pdf/1'),
+]
+
+
+def medir(datos, codificacion, nivel, repeticiones):
+    import compresion
+    inicio = time.process_time()
+    for _ in range(repeticiones):
+        comprimido = compresion.comprimir(datos, codificacion, nivel)
+    return len(comprimido), (time.process_time() - inicio) / repeticiones * 1000
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    from app import app
+    import compresion
+
+    clientes = {'estudiante': app.test_client(), 'admin': app.test_client()}
+    clientes['estudiante'].post('/registro', data={'nombre': 'Estudiante Prueba', 'email': 'bench@ejemplo.com',
+                                                   'password': 'secreto1', 'confirmar_password': 'secreto1'})
+    clientes['admin'].post('/login', data={'email': 'admin@gmail.com', 'password': 'admin123456'})
+
+    niveles = [('gzip', 1), ('gzip', compresion.NIVEL_GZIP), ('gzip', 9)]
+    if compresion.brotli:
+        niveles += [('br', 1), ('br', compresion.NIVEL_BROTLI), ('br', 11)]
+    else:
+        print("⚠️ brotli no instalado: solo se mide gzip\n")
+
+    defecto = {('gzip', compresion.NIVEL_GZIP), ('br', compresion.NIVEL_BROTLI)}
+    columnas = [f"{c}-{n}{'*' if (c, n) in defecto else ''}" for c, n in niveles]
+    print(f"{'Respuesta':<32} {'original':>9} " + ' '.join(f'{c:>17}' for c in columnas))
+    print(f"{'':<32} {'bytes':>9} " + ' '.join(f"{'bytes   ms CPU':>17}" for _ in columnas))
+
+    totales = [[0, 0.0] for _ in niveles]
+    total_original = 0
+    for rol, ruta in PAGINAS:
+        # Sin Accept-Encoding el middleware devuelve el cuerpo original
+        respuesta = clientes[rol].get(ruta, headers={'Accept-Encoding': 'identity'})
+        datos = respuesta.get_data()
+        total_original += len(datos)
+        celdas = []
+        for i, (codificacion, nivel) in enumerate(niveles):
+            tamano, ms = medir(datos, codificacion, nivel, repeticiones)
+            totales[i][0] += tamano
+            totales[i][1] += ms
+            celdas.append(f'{tamano:>8} {ms:>8.3f}')
+        print(f"{ruta:<32} {len(datos):>9} " + ' '.join(celdas))
+
+    print(f"{'Total':<32} {total_original:>9} " + ' '.join(f'{t:>8} {ms:>8.3f}' for t, ms in totales))
+    print()
+    for (codificacion, nivel), (tamano, ms) in zip(niveles, totales):
+        ahorro = total_original - tamano
+        print(f"{f'{codificacion}-{nivel}':<8} ahorra {ahorro / total_original:>6.1%} "
+              f"({ahorro / 1024:.0f} KB) con {ms:.2f} ms de CPU: {ahorro / 1024 / ms:.0f} KB ahorrados por ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark de composición y envío masivo de correos.
+
+Compara, en mensajes por segundo:
+  1. Jinja + MIME de Flask-Mail por cada destinatario (comportamiento anterior)
+  2. Plantilla y esqueleto MIME precompilados, en el mismo hilo
+  3. Plantilla y esqueleto MIME precompilados, en pool de procesos
+  4. Encolar la cohorte y vaciar la bandeja contra el SMTP stub local
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_emails.py [cantidad]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Base de datos temporal para no tocar instance/aprendizaje.db
+os.chdir(tempfile.mkdtemp(prefix='bench_emails_'))
+
+from flask import Flask, render_template
+from flask_mail import Message
+from smtp_stub import SMTPStubServer, SMTPStubHandler
+from database import init_db, get_db_connection
+import email_service
+
+
+def medir(nombre, cantidad, funcion):
+    inicio = time.perf_counter()
+    funcion()
+    duracion = time.perf_counter() - inicio
+    print(f"{nombre:<45} {cantidad / duracion:>12,.0f} msg/s  ({duracion:.2f} s)")
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    usuarios = [(f"Estudiante {i}", f"estudiante{i}@ejemplo.com") for i in range(cantidad)]
+
+    servidor = SMTPStubServer(('localhost', 0), SMTPStubHandler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    os.environ.update(MAIL_SERVER='localhost', MAIL_PORT=str(servidor.server_address[1]),
+                      MAIL_USE_TLS='False', MAIL_USERNAME='bench@codebase.local')
+
+    app = Flask(__name__, template_folder=os.path.join(RAIZ, 'templates'))
+    email_service.init_mail(app)
+
+    with app.app_context():
+        init_db()
+        print(f"Componiendo {cantidad} correos de bienvenida\n")
+
+        remitente = email_service.obtener_remitente()
+
+        def composicion_anterior():
+            for nombre, email in usuarios:
+                msg = Message(subject='¡Bienvenido a CodeBase! 🎉', sender=remitente, recipients=[email],
+                              body=email_service.TEXTO_BIENVENIDA.format(nombre=nombre),
+                              html=render_template('emails/bienvenida.html', nombre=nombre))
+                msg.as_bytes()
+
+        medir("Jinja + Flask-Mail por destinatario", cantidad, composicion_anterior)
+
+        mime = email_service.compilar_mime(email_service.obtener_plantilla('bienvenida'), remitente)
+        destinatarios = [(email, {'nombre': nombre}) for nombre, email in usuarios]
+        medir("Precompilada (mismo hilo)", cantidad,
+              lambda: email_service.componer_lote(mime, destinatarios, procesos=1))
+        procesos = max(2, os.cpu_count() or 1)
+        medir(f"Precompilada (pool de {procesos} procesos)", cantidad,
+              lambda: email_service.componer_lote(mime, destinatarios, procesos=procesos))
+
+        # Las líneas del stub ensuciarían la salida
+        sys.stdout = open(os.devnull, 'w')
+        inicio = time.perf_counter()
+        email_service.encolar_bienvenida_masiva(usuarios)
+        enviados = 0
+        while True:
+            lote_enviados, lote_errores = email_service.procesar_outbox()
+            enviados += lote_enviados
+            if lote_enviados + lote_errores == 0:
+                break
+        duracion = time.perf_counter() - inicio
+        sys.stdout = sys.__stdout__
+
+        pendientes = get_db_connection().execute(
+            "SELECT COUNT(*) FROM email_outbox WHERE estado != 'enviado'"
+        ).fetchone()[0]
+        print(f"{'Encolar + enviar al SMTP stub':<45} {enviados / duracion:>12,.0f} msg/s  ({duracion:.2f} s)")
+        print(f"\nRecibidos por el stub: {servidor.recibidos}, sin enviar: {pendientes}")
+
+    servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
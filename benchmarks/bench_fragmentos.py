@@ -0,0 +1,58 @@
+"""
+Benchmark de /aprender/<unidad_id> con y sin la caché de fragmentos.
+
+Mide el tiempo por petición de un estudiante que recorre las cinco unidades,
+primero con la caché desactivada (cada fragmento se renderiza siempre) y luego
+con ella, e informa la tasa de aciertos.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_fragmentos.py [peticiones]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Base de datos temporal para no tocar instance/aprendizaje.db
+os.chdir(tempfile.mkdtemp(prefix='bench_fragmentos_'))
+
+
+def recorrer(cliente, unidades, peticiones):
+    inicio = time.perf_counter()
+    for i in range(peticiones):
+        respuesta = cliente.get(f'/aprender/{unidades[i % len(unidades)]}')
+        assert respuesta.status_code == 200
+    return (time.perf_counter() - inicio) / peticiones * 1000
+
+
+def main():
+    peticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    from app import app
+    from models import Unidad
+    import fragmentos
+
+    cliente = app.test_client()
+    cliente.post('/registro', data={'nombre': 'Estudiante Prueba', 'email': 'bench@ejemplo.com',
+                                    'password': 'secreto1', 'confirmar_password': 'secreto1'})
+    unidades = [unidad['id'] for unidad in Unidad.obtener_todas()]
+    print(f"{peticiones} peticiones a /aprender ({len(unidades)} unidades)\n")
+
+    obtener = fragmentos._obtener
+    fragmentos._obtener = lambda nombre, clave, calcular: calcular()
+    print(f"{'Sin caché':<12} {recorrer(cliente, unidades, peticiones):>7.2f} ms/petición")
+
+    fragmentos._obtener = obtener
+    recorrer(cliente, unidades, len(unidades))
+    print(f"{'Con caché':<12} {recorrer(cliente, unidades, peticiones):>7.2f} ms/petición\n")
+
+    for nombre, datos in fragmentos.estadisticas()['fragmentos'].items():
+        print(f"{nombre:<36} aciertos: {datos['tasa_aciertos']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark del arranque en frío de un worker: latencia de la primera petición
+de cada página, con y sin caché de bytecode de plantillas.
+
+Cada escenario se ejecuta en un proceso nuevo, como un worker de gunicorn
+recién creado:
+  - sin caché:     las plantillas se compilan en la primera petición,
+  - con bytecode:  se cargan desde instance/jinja_cache (tras python plantillas.py)
+                   y se precargan al arrancar.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_plantillas.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGINAS = [
+    ('estudiante', '/dashboard'),
+    ('estudiante', '/aprender/1'),
+    ('estudiante', '/leccion/1'),
+    ('estudiante', '/calificaciones'),
+    ('admin', '/admin'),
+    ('admin', '/admin/usuarios'),
+    ('admin', '/admin/contenido'),
+]
+
+
+def worker(con_cache):
+    """Proceso hijo: arrancar la aplicación y pedir cada página una vez"""
+    os.environ['PRECARGAR_PLANTILLAS'] = 'True' if con_cache else 'False'
+    sys.path.insert(0, RAIZ)
+
+    inicio = time.perf_counter()
+    from app import app
+    if not con_cache:
+        app.jinja_env.bytecode_cache = None
+    arranque = (time.perf_counter() - inicio) * 1000
+
+    clientes = {'estudiante': app.test_client(), 'admin': app.test_client()}
+    clientes['estudiante'].post('/login', data={'email': 'bench@ejemplo.com', 'password': 'secreto1'})
+    clientes['admin'].post('/login', data={'email': 'admin@gmail.com', 'password': 'admin123456'})
+
+    tiempos = {}
+    for rol, ruta in PAGINAS:
+        inicio = time.perf_counter()
+        respuesta = clientes[rol].get(ruta)
+        tiempos[ruta] = ((time.perf_counter() - inicio) * 1000, respuesta.status_code)
+    print(json.dumps({'arranque': arranque, 'paginas': tiempos}))
+
+
+def ejecutar(*argumentos):
+    salida = subprocess.run([sys.executable, os.path.abspath(__file__), *argumentos],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main():
+    # Base de datos y caché temporales para no tocar instance/
+    os.chdir(tempfile.mkdtemp(prefix='bench_plantillas_'))
+    subprocess.run([sys.executable, '-c', (
+        f"import sys; sys.path.insert(0, {RAIZ!r}); from app import app; "
+        "app.test_client().post('/registro', data={'nombre': 'Estudiante Prueba', 'email': 'bench@ejemplo.com', "
+        "'password': 'secreto1', 'confirmar_password': 'secreto1'})"
+    )], capture_output=True, check=True)
+
+    sin_cache = ejecutar('--worker', 'sin')
+    subprocess.run([sys.executable, os.path.join(RAIZ, 'plantillas.py')], capture_output=True, check=True)
+    con_cache = ejecutar('--worker', 'con')
+
+    print(f"{'Primera petición':<22} {'sin caché':>12} {'con bytecode':>14}")
+    for _, ruta in PAGINAS:
+        antes, estado = sin_cache['paginas'][ruta]
+        despues, _ = con_cache['paginas'][ruta]
+        print(f"{ruta:<22} {antes:>9.1f} ms {despues:>11.1f} ms   (HTTP {estado})")
+    print(f"{'Importar la app':<22} {sin_cache['arranque']:>9.1f} ms {con_cache['arranque']:>11.1f} ms")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--worker':
+        worker(sys.argv[2] == 'con')
+    else:
+        main()
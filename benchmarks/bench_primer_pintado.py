@@ -0,0 +1,133 @@
+"""
+Benchmark de primer pintado (First Contentful Paint) en un navegador headless.
+
+Levanta la aplicación en un puerto local y abre cada página en Chromium con
+una red emulada (latencia y ancho de banda de un móvil 4G normal):
+  - visita en frío: caché del navegador vacía,
+  - visita repetida: misma pestaña, con los estáticos en caché (inmutables).
+
+Por página informa el FCP, el número de peticiones y cuántas salen del propio
+servidor (CDNs, Google Fonts): con los recursos de terceros en static/ deben
+ser 0, y la página debe pintarse igual con el acceso externo bloqueado.
+
+Requiere playwright con Chromium:
+    pip install playwright && playwright install chromium
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_primer_pintado.py [latencia_ms]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Base de datos temporal para no tocar instance/aprendizaje.db
+os.chdir(tempfile.mkdtemp(prefix='bench_primer_pintado_'))
+
+PUERTO = 5077
+ORIGEN = f'http://127.0.0.1:{PUERTO}'
+
+PAGINAS = [
+    (None, '/login'),
+    ('estudiante', '/dashboard'),
+    ('estudiante', '/aprender/1'),
+    ('estudiante', '/certificado'),
+    ('admin', '/admin'),
+]
+
+CUENTAS = {
+    'estudiante': ('bench@ejemplo.com', 'secreto1'),
+    'admin': ('admin@gmail.com', 'admin123456'),
+}
+
+FCP = "performance.getEntriesByName('first-contentful-paint').map(e => e.startTime)[0] || null"
+
+
+def arrancar_servidor():
+    from werkzeug.serving import make_server
+    from app import app
+
+    app.test_client().post('/registro', data={'nombre': 'Estudiante Prueba', 'email': CUENTAS['estudiante'][0],
+                                              'password': CUENTAS['estudiante'][1],
+                                              'confirmar_password': CUENTAS['estudiante'][1]})
+    servidor = make_server('127.0.0.1', PUERTO, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def medir(navegador, rol, ruta, latencia):
+    contexto = navegador.new_context()
+    pagina = contexto.new_page()
+    cdp = contexto.new_cdp_session(pagina)
+    cdp.send('Network.enable')
+    cdp.send('Network.emulateNetworkConditions', {
+        'offline': False,
+        'latency': latencia,
+        'downloadThroughput': 9 * 1024 * 1024 / 8,
+        'uploadThroughput': 1.5 * 1024 * 1024 / 8,
+    })
+
+    externas = []
+
+    def solo_local(ruta_red):
+        # Sin acceso fuera del servidor local: la página no puede depender de un CDN
+        if ruta_red.request.url.startswith(ORIGEN):
+            ruta_red.continue_()
+        else:
+            externas.append(ruta_red.request.url)
+            ruta_red.abort()
+
+    contexto.route('**/*', solo_local)
+
+    if rol:
+        email, password = CUENTAS[rol]
+        pagina.goto(f'{ORIGEN}/login')
+        pagina.fill('input[name=email]', email)
+        pagina.fill('input[name=password]', password)
+        with pagina.expect_navigation():
+            pagina.click('button[type=submit]')
+        # Login deja los estáticos comunes en caché; empezar la visita en frío de verdad
+        cdp.send('Network.clearBrowserCache')
+
+    peticiones = []
+    pagina.on('request', lambda p: peticiones.append(p.url))
+    pagina.goto(f'{ORIGEN}{ruta}', wait_until='load')
+    frio = pagina.evaluate(FCP)
+    total_frio = len(peticiones)
+
+    peticiones.clear()
+    pagina.goto(f'{ORIGEN}{ruta}', wait_until='load')
+    repetida = pagina.evaluate(FCP)
+    contexto.close()
+    return frio, repetida, total_frio, len(externas)
+
+
+def main():
+    latencia = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        print("❌ playwright no instalado: pip install playwright && playwright install chromium")
+        return
+
+    # Estáticos con huella, como en el despliegue
+    subprocess.run([sys.executable, os.path.join(RAIZ, 'activos.py')], capture_output=True, check=True)
+    arrancar_servidor()
+
+    print(f"Red emulada: {latencia} ms de latencia, 9 Mbit/s\n")
+    print(f"{'Página':<16} {'FCP frío':>10} {'FCP repetida':>14} {'peticiones':>11} {'externas':>9}")
+    with sync_playwright() as p:
+        navegador = p.chromium.launch()
+        for rol, ruta in PAGINAS:
+            frio, repetida, peticiones, externas = medir(navegador, rol, ruta, latencia)
+            print(f"{ruta:<16} {frio or 0:>7.0f} ms {repetida or 0:>11.0f} ms {peticiones:>11} {externas:>9}")
+        navegador.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+"""
+Clasificación de estudiantes del curso completo y de cada unidad.
+
+Dos métricas por ámbito ('curso' o 'unidad:<id>'):
+  - promedio: el promedio final del curso o el de la unidad, guardado en
+    centésimas (0-1000) para poder usarlo como índice,
+  - puntos: 10 por cada punto de la mejor calificación de cada lección.
+
+Estructuras:
+  - clasificacion: una fila por (ámbito, usuario). Sus índices ordenados por
+    métrica sirven las páginas del top-N por clave, sin recorrer
+    progreso_usuario.
+  - clasificacion_fenwick: un árbol de Fenwick por (ámbito, métrica) guardado
+    como filas dispersas (posición, cantidad). "¿En qué puesto estoy?" suma
+    O(log TAMANO) filas por clave primaria: cuántos tienen más que yo.
+
+Se actualiza de forma incremental desde Progreso.guardar_calificacion cuando
+mejora una calificación, en la misma transacción que guarda la nota: solo se
+recalcula a ese estudiante.
+
+El promedio del curso divide entre el número de unidades, así que al añadir o
+quitar una unidad todos los promedios guardados quedan viejos.
+clasificacion_estado recuerda con cuántas unidades se calcularon: si no
+coincide, la próxima actualización (o el arranque de la app) reconstruye
+todo.
+
+Reconstrucción completa (por ejemplo, tras importar datos):
+    python clasificacion.py
+"""
+
+import json
+import sqlite3
+from database import get_db_connection
+
+METRICAS = ('promedio', 'puntos')
+TAMANO = 1 << 20        # Valores posibles por métrica (0 .. TAMANO - 1)
+POR_PAGINA = 20
+
+
+def _indices_actualizar(valor):
+    i = valor + 1
+    while i <= TAMANO:
+        yield i
+        i += i & -i
+
+
+def _indices_prefijo(valor):
+    i = min(valor + 1, TAMANO)
+    while i > 0:
+        yield i
+        i -= i & -i
+
+
+def _sumar_fenwick(conn, cambios):
+    """
+    Aplicar cambios al árbol de Fenwick
+
+    Args:
+        cambios (dict): {(ámbito, métrica, valor): +n / -n}
+    """
+    acumulado = {}
+    for (ambito, metrica, valor), delta in cambios.items():
+        if delta:
+            for i in _indices_actualizar(valor):
+                clave = (ambito, metrica, i)
+                acumulado[clave] = acumulado.get(clave, 0) + delta
+    conn.executemany('''
+        INSERT INTO clasificacion_fenwick (ambito, metrica, posicion, cantidad) VALUES (?, ?, ?, ?)
+        ON CONFLICT(ambito, metrica, posicion) DO UPDATE SET cantidad = cantidad + excluded.cantidad
+    ''', [(*clave, delta) for clave, delta in acumulado.items() if delta])
+
+
+def _contar_hasta(conn, ambito, metrica, valor):
+    """Estudiantes con un valor menor o igual que 'valor' (O(log TAMANO))"""
+    indices = list(_indices_prefijo(valor))
+    fila = conn.execute(f'''
+        SELECT COALESCE(SUM(cantidad), 0) FROM clasificacion_fenwick
+        WHERE ambito = ? AND metrica = ? AND posicion IN ({",".join("?" * len(indices))})
+    ''', (ambito, metrica, *indices)).fetchone()
+    return fila[0]
+
+
+def _puesto(conn, ambito, metrica, valor):
+    """Puesto de un valor (1 + cuántos lo superan) y total de estudiantes en el ámbito"""
+    total = _contar_hasta(conn, ambito, metrica, TAMANO - 1)
+    return 1 + total - _contar_hasta(conn, ambito, metrica, valor), total
+
+
+def _calcular(filas, numero_unidades):
+    """
+    Valores de clasificación de un estudiante
+
+    Args:
+        filas: (unidad_id, calificacion) de sus lecciones con calificación > 0
+        numero_unidades (int): Unidades del curso (las que no tienen notas cuentan como 0)
+
+    Returns:
+        dict {ámbito: (promedio en centésimas, puntos)}
+    """
+    por_unidad = {}
+    for unidad_id, calificacion in filas:
+        por_unidad.setdefault(unidad_id, []).append(calificacion)
+
+    valores = {}
+    suma_promedios = 0
+    puntos_curso = 0
+    for unidad_id, notas in por_unidad.items():
+        promedio = sum(notas) / len(notas)
+        puntos = sum(round(nota * 10) for nota in notas)
+        valores[f'unidad:{unidad_id}'] = (round(promedio * 100), puntos)
+        suma_promedios += promedio
+        puntos_curso += puntos
+    # Igual que Progreso.calcular_promedio_final: suma de promedios de unidad / unidades
+    promedio_curso = suma_promedios / numero_unidades if numero_unidades else 0
+    valores['curso'] = (round(round(promedio_curso, 2) * 100), puntos_curso)
+    return valores
+
+
+def _aplicar(conn, usuario_id, nuevos):
+    """Sustituir las filas de un estudiante y ajustar los árboles con la diferencia"""
+    anteriores = {fila['ambito']: (fila['promedio'], fila['puntos']) for fila in conn.execute(
+        'SELECT ambito, promedio, puntos FROM clasificacion WHERE usuario_id = ?', (usuario_id,))}
+
+    cambios = {}
+    for ambito in set(anteriores) | set(nuevos):
+        antes, despues = anteriores.get(ambito), nuevos.get(ambito)
+        if antes == despues:
+            continue
+        for posicion, metrica in enumerate(METRICAS):
+            if antes is not None:
+                clave = (ambito, metrica, antes[posicion])
+                cambios[clave] = cambios.get(clave, 0) - 1
+            if despues is not None:
+                clave = (ambito, metrica, despues[posicion])
+                cambios[clave] = cambios.get(clave, 0) + 1
+        if despues is None:
+            conn.execute('DELETE FROM clasificacion WHERE ambito = ? AND usuario_id = ?', (ambito, usuario_id))
+        else:
+            conn.execute('''
+                INSERT INTO clasificacion (ambito, usuario_id, promedio, puntos) VALUES (?, ?, ?, ?)
+                ON CONFLICT(ambito, usuario_id) DO UPDATE SET promedio = excluded.promedio, puntos = excluded.puntos
+            ''', (ambito, usuario_id, *despues))
+    _sumar_fenwick(conn, cambios)
+
+
+def actualizar_usuario(usuario_id, conn=None):
+    """
+    Recalcular la posición de un estudiante tras mejorar una calificación
+
+    Los administradores y las cuentas desactivadas no aparecen en la clasificación.
+
+    Args:
+        conn: Conexión con una transacción abierta de quien llama (se confirma
+            junto con su cambio); sin ella se usa una transacción propia
+
+    Returns:
+        int: Puntos del curso del estudiante (también se guardan en usuarios.puntos_totales)
+    """
+    if conn is not None:
+        return _actualizar(conn, usuario_id)
+
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        puntos = _actualizar(conn, usuario_id)
+        conn.commit()
+        return puntos
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _unidades_calculadas(conn):
+    fila = conn.execute('SELECT numero_unidades FROM clasificacion_estado WHERE id = 1').fetchone()
+    return fila[0] if fila else None
+
+
+def _actualizar(conn, usuario_id):
+    usuario = conn.execute('SELECT es_admin, activo FROM usuarios WHERE id = ?', (usuario_id,)).fetchone()
+    if not usuario:
+        return 0
+    numero_unidades = conn.execute('SELECT COUNT(*) FROM unidades').fetchone()[0]
+    if numero_unidades != _unidades_calculadas(conn):
+        # Cambiaron las unidades: los promedios del curso de todos están viejos
+        _reconstruir(conn)
+    filas = conn.execute('''
+        SELECT l.unidad_id, p.calificacion FROM progreso_usuario p
+        JOIN lecciones l ON l.id = p.leccion_id
+        WHERE p.usuario_id = ? AND p.calificacion > 0
+    ''', (usuario_id,)).fetchall()
+    nuevos = _calcular([tuple(fila) for fila in filas], numero_unidades)
+    puntos = nuevos['curso'][1]
+
+    if usuario['es_admin'] or not usuario['activo']:
+        nuevos = {}
+    _aplicar(conn, usuario_id, nuevos)
+    conn.execute('UPDATE usuarios SET puntos_totales = ? WHERE id = ?', (puntos, usuario_id))
+    return puntos
+
+
+def retirar_usuarios(usuario_ids):
+    """Quitar de la clasificación a varios usuarios (por ejemplo, al desactivarlos)"""
+    if not usuario_ids:
+        return
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        for usuario_id in usuario_ids:
+            _aplicar(conn, usuario_id, {})
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def reconstruir():
+    """
+    Rehacer la clasificación completa desde progreso_usuario
+
+    Returns:
+        int: Estudiantes clasificados
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        clasificados = _reconstruir(conn)
+        conn.commit()
+        return clasificados
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def reconstruir_si_desactualizada():
+    """
+    Calcular la clasificación si nunca se calculó o cambió el número de unidades
+
+    La comprobación y la reconstrucción van en la misma transacción
+    BEGIN IMMEDIATE: si arrancan varios workers a la vez, solo el primero la
+    calcula; los demás la ven al día o, si sigue ocupada, la dejan a él.
+
+    Returns:
+        int: Estudiantes clasificados (0 si no hacía falta)
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+    except sqlite3.OperationalError:
+        # Otro worker tiene el bloqueo de escritura (probablemente reconstruyendo)
+        conn.close()
+        return 0
+    try:
+        numero_unidades = conn.execute('SELECT COUNT(*) FROM unidades').fetchone()[0]
+        if numero_unidades == _unidades_calculadas(conn):
+            conn.rollback()
+            return 0
+        clasificados = _reconstruir(conn)
+        conn.commit()
+        return clasificados
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _reconstruir(conn):
+    numero_unidades = conn.execute('SELECT COUNT(*) FROM unidades').fetchone()[0]
+    por_usuario = {}
+    for fila in conn.execute('''
+        SELECT p.usuario_id, l.unidad_id, p.calificacion FROM progreso_usuario p
+        JOIN lecciones l ON l.id = p.leccion_id
+        JOIN usuarios u ON u.id = p.usuario_id
+        WHERE p.calificacion > 0 AND u.es_admin = 0 AND u.activo = 1
+    '''):
+        por_usuario.setdefault(fila['usuario_id'], []).append((fila['unidad_id'], fila['calificacion']))
+
+    filas, cambios = [], {}
+    for usuario_id, notas in por_usuario.items():
+        for ambito, valores in _calcular(notas, numero_unidades).items():
+            filas.append((ambito, usuario_id, *valores))
+            for posicion, metrica in enumerate(METRICAS):
+                clave = (ambito, metrica, valores[posicion])
+                cambios[clave] = cambios.get(clave, 0) + 1
+
+    conn.execute('DELETE FROM clasificacion')
+    conn.execute('DELETE FROM clasificacion_fenwick')
+    conn.executemany('INSERT INTO clasificacion (ambito, usuario_id, promedio, puntos) VALUES (?, ?, ?, ?)', filas)
+    _sumar_fenwick(conn, cambios)
+    conn.execute('UPDATE usuarios SET puntos_totales = 0')
+    conn.executemany('UPDATE usuarios SET puntos_totales = ? WHERE id = ?',
+                     [(puntos, usuario_id) for ambito, usuario_id, _, puntos in filas if ambito == 'curso'])
+    conn.execute('INSERT OR REPLACE INTO clasificacion_estado (id, numero_unidades) VALUES (1, ?)',
+                 (numero_unidades,))
+    return len(por_usuario)
+
+
+def posicion(usuario_id, ambito='curso', metrica='promedio'):
+    """
+    Puesto de un estudiante en un ámbito
+
+    Returns:
+        dict (puesto, total, promedio, puntos) o None si no está clasificado
+    """
+    conn = get_db_connection()
+    fila = conn.execute('SELECT promedio, puntos FROM clasificacion WHERE ambito = ? AND usuario_id = ?',
+                        (ambito, usuario_id)).fetchone()
+    if not fila:
+        conn.close()
+        return None
+    puesto, total = _puesto(conn, ambito, metrica, fila[metrica])
+    conn.close()
+    return {'puesto': puesto, 'total': total, 'promedio': fila['promedio'] / 100, 'puntos': fila['puntos']}
+
+
+def pagina(ambito='curso', metrica='promedio', cursor=None, limite=POR_PAGINA):
+    """
+    Página del top-N ordenada por la métrica (y por la otra en caso de empate)
+
+    Args:
+        cursor (str): Valor 'siguiente' devuelto por la página anterior
+
+    Returns:
+        tuple (lista de dicts con puesto, nombre, foto y valores; cursor siguiente o None)
+    """
+    if metrica not in METRICAS:
+        raise ValueError(f"Métrica desconocida: {metrica}")
+    otra = 'puntos' if metrica == 'promedio' else 'promedio'
+    limite = max(1, min(limite, 100))
+
+    condicion, parametros = '', [ambito]
+    if cursor:
+        try:
+            clave = [int(parte) for parte in json.loads(cursor)]
+            if len(clave) == 3:
+                condicion = f'AND (c.{metrica}, c.{otra}, c.usuario_id) < (?, ?, ?)'
+                parametros.extend(clave)
+        except (ValueError, TypeError):
+            pass
+
+    conn = get_db_connection()
+    filas = conn.execute(f'''
+        SELECT c.usuario_id, c.promedio, c.puntos, u.nombre_completo, u.foto_perfil
+        FROM clasificacion c
+        JOIN usuarios u ON u.id = c.usuario_id
+        WHERE c.ambito = ? {condicion}
+        ORDER BY c.{metrica} DESC, c.{otra} DESC, c.usuario_id DESC
+        LIMIT ?
+    ''', parametros + [limite + 1]).fetchall()
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = json.dumps([ultima[metrica], ultima[otra], ultima['usuario_id']])
+
+    puestos = {}
+    resultado = []
+    for fila in filas:
+        valor = fila[metrica]
+        if valor not in puestos:
+            puestos[valor] = _puesto(conn, ambito, metrica, valor)[0]
+        resultado.append({
+            'puesto': puestos[valor],
+            'usuario_id': fila['usuario_id'],
+            'nombre': fila['nombre_completo'],
+            'foto_perfil': fila['foto_perfil'],
+            'promedio': fila['promedio'] / 100,
+            'puntos': fila['puntos'],
+        })
+    conn.close()
+    return resultado, siguiente
+
+
+if __name__ == '__main__':
+    print(f"✅ Clasificación reconstruida: {reconstruir()} estudiantes")
@@ -0,0 +1,139 @@
+"""
+Compresión gzip / brotli de las respuestas HTML y JSON.
+
+Middleware WSGI que comprime el cuerpo de las respuestas de la aplicación
+cuando el cliente lo acepta (Accept-Encoding) y merece la pena:
+  - el tipo de contenido está en TIPOS_COMPRIMIBLES,
+  - el cuerpo tiene al menos MINIMO_BYTES (por debajo la cabecera gzip y el
+    coste de CPU no compensan),
+  - la respuesta no viene ya codificada (estáticos precomprimidos de
+    activos.py) ni pide no-transform,
+  - la respuesta tiene Content-Length: las respuestas en streaming
+    (respuesta_en_streaming) no lo llevan y se envían tal cual, para no
+    perder el envío progresivo.
+
+Brotli se usa si está instalado y el cliente lo prefiere; si no, gzip.
+Los niveles se eligen para respuestas dinámicas (rápidos), no los máximos que
+usa el build de estáticos. Ver benchmarks/bench_compresion.py.
+"""
+
+import gzip
+import os
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MINIMO_BYTES = int(os.getenv('COMPRESION_MINIMO_BYTES', 1024))
+NIVEL_GZIP = int(os.getenv('COMPRESION_NIVEL_GZIP', 6))
+NIVEL_BROTLI = int(os.getenv('COMPRESION_NIVEL_BROTLI', 4))
+TIPOS_COMPRIMIBLES = (
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+)
+
+
+def elegir_codificacion(accept_encoding):
+    """
+    Codificación a usar según la cabecera Accept-Encoding del cliente
+
+    Returns:
+        'br', 'gzip' o None
+    """
+    if not accept_encoding:
+        return None
+    aceptadas = parse_accept_header(accept_encoding)
+    if brotli and aceptadas['br'] and aceptadas['br'] >= aceptadas['gzip']:
+        return 'br'
+    if aceptadas['gzip']:
+        return 'gzip'
+    return None
+
+
+def comprimir(datos, codificacion, nivel=None):
+    """Comprimir un cuerpo completo con la codificación indicada"""
+    if codificacion == 'br':
+        return brotli.compress(datos, quality=NIVEL_BROTLI if nivel is None else nivel)
+    return gzip.compress(datos, compresslevel=NIVEL_GZIP if nivel is None else nivel, mtime=0)
+
+
+def _cabecera(cabeceras, nombre):
+    nombre = nombre.lower()
+    for clave, valor in cabeceras:
+        if clave.lower() == nombre:
+            return valor
+    return None
+
+
+def es_comprimible(cabeceras):
+    """Tipo de contenido comprimible y sin codificación previa (independiente del tamaño)"""
+    tipo = (_cabecera(cabeceras, 'Content-Type') or '').split(';')[0].strip().lower()
+    if tipo not in TIPOS_COMPRIMIBLES:
+        return False
+    if _cabecera(cabeceras, 'Content-Encoding'):
+        return False
+    return 'no-transform' not in (_cabecera(cabeceras, 'Cache-Control') or '')
+
+
+class MiddlewareCompresion:
+    """Envoltorio WSGI: app.wsgi_app = MiddlewareCompresion(app.wsgi_app)"""
+
+    def __init__(self, app, minimo_bytes=MINIMO_BYTES):
+        self.app = app
+        self.minimo_bytes = minimo_bytes
+
+    def __call__(self, environ, start_response):
+        respuesta = []
+
+        def capturar(status, headers, exc_info=None):
+            respuesta[:] = [status, headers, exc_info]
+
+        cuerpo = self.app(environ, capturar)
+        status, headers, exc_info = respuesta
+
+        if not es_comprimible(headers):
+            start_response(status, headers, exc_info)
+            return cuerpo
+
+        # La representación depende de Accept-Encoding aunque esta vez no se comprima
+        headers = self._anadir_vary(headers)
+        codificacion = elegir_codificacion(environ.get('HTTP_ACCEPT_ENCODING'))
+        longitud = _cabecera(headers, 'Content-Length')
+        if (codificacion is None or longitud is None or int(longitud) < self.minimo_bytes
+                or environ.get('REQUEST_METHOD') == 'HEAD' or not status.startswith('200')):
+            start_response(status, headers, exc_info)
+            return cuerpo
+
+        try:
+            datos = comprimir(b''.join(cuerpo), codificacion)
+        finally:
+            if hasattr(cuerpo, 'close'):
+                cuerpo.close()
+
+        headers = [(clave, valor) for clave, valor in headers if clave.lower() not in ('content-length', 'etag')]
+        headers.append(('Content-Encoding', codificacion))
+        headers.append(('Content-Length', str(len(datos))))
+        etag = _cabecera(respuesta[1], 'ETag')
+        if etag:
+            # El cuerpo comprimido no es idéntico byte a byte: el validador pasa a ser débil
+            headers.append(('ETag', etag if etag.startswith('W/') else 'W/' + etag))
+        start_response(status, headers, exc_info)
+        return [datos]
+
+    @staticmethod
+    def _anadir_vary(headers):
+        vary = _cabecera(headers, 'Vary')
+        if vary is None:
+            return headers + [('Vary', 'Accept-Encoding')]
+        if 'accept-encoding' in vary.lower() or vary.strip() == '*':
+            return headers
+        return [(clave, f'{valor}, Accept-Encoding' if clave.lower() == 'vary' else valor)
+                for clave, valor in headers]
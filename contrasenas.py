@@ -0,0 +1,157 @@
+"""
+Hashing de contraseñas con coste calibrado y concurrencia limitada.
+
+Envuelve generate_password_hash/check_password_hash de werkzeug para:
+  - usar los parámetros de scrypt elegidos con la calibración
+    (variable de entorno PASSWORD_HASH_METODO),
+  - re-hashear al iniciar sesión las contraseñas guardadas con parámetros
+    antiguos,
+  - limitar cuántos hashes se calculan a la vez en toda la máquina, para que
+    una ráfaga de logins haga cola en lugar de acaparar la CPU (y la memoria:
+    scrypt con n=32768 usa 32 MB por hash).
+
+El límite (PASSWORD_HASH_CONCURRENCIA, por defecto uno por CPU) se comparte
+entre todos los workers de gunicorn: cada turno es un archivo en
+DIRECTORIO_TURNOS bloqueado con flock mientras dura el hash. El sistema
+operativo suelta el bloqueo si el worker muere, así que un turno nunca queda
+perdido. El despliegue es una sola máquina (render.yaml), por lo que es el
+límite de toda la aplicación. Sin fcntl (Windows, en desarrollo) se limita
+por proceso.
+
+Calibración:
+    python contrasenas.py --objetivo 250
+"""
+
+import os
+import secrets
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from werkzeug.security import generate_password_hash, check_password_hash
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 'scrypt:32768:8:1' es el valor por defecto de werkzeug. Se normaliza al prefijo que
+# werkzeug escribe en el hash ('scrypt' -> 'scrypt:32768:8:1', 'pbkdf2:sha256' ->
+# 'pbkdf2:sha256:600000') para que necesita_rehash lo compare con lo guardado
+HASH_METODO = generate_password_hash('', os.getenv('PASSWORD_HASH_METODO', 'scrypt:32768:8:1')).split('$', 1)[0]
+HASH_CONCURRENCIA = int(os.getenv('PASSWORD_HASH_CONCURRENCIA', os.cpu_count() or 1))
+HASH_ESPERA_MAX = float(os.getenv('PASSWORD_HASH_ESPERA_MAX', 10))
+DIRECTORIO_TURNOS = os.getenv('PASSWORD_HASH_TURNOS_DIR', os.path.join('instance', 'hash_turnos'))
+
+# Contraseñas temporales generadas al azar (~96 bits): un coste bajo basta porque
+# no se pueden adivinar, y se re-hashean con HASH_METODO en el primer login
+HASH_METODO_TEMPORAL = 'scrypt:1024:8:1'
+
+_limitador = threading.BoundedSemaphore(HASH_CONCURRENCIA)
+
+
+class ServidorOcupado(Exception):
+    """No se consiguió turno para calcular un hash dentro de HASH_ESPERA_MAX"""
+
+
+def _tomar_turno():
+    """Bloquear uno de los HASH_CONCURRENCIA archivos de turno; devuelve su descriptor o None"""
+    os.makedirs(DIRECTORIO_TURNOS, exist_ok=True)
+    limite = time.monotonic() + HASH_ESPERA_MAX
+    espera = 0.005
+    while True:
+        for turno in range(HASH_CONCURRENCIA):
+            # Un open() por intento: dos hilos del mismo proceso también se excluyen
+            fd = os.open(os.path.join(DIRECTORIO_TURNOS, f'turno-{turno}'), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        if time.monotonic() + espera > limite:
+            return None
+        time.sleep(espera)
+        espera = min(espera * 2, 0.05)
+
+
+def _con_turno(funcion, *args):
+    if fcntl is None:
+        if not _limitador.acquire(timeout=HASH_ESPERA_MAX):
+            raise ServidorOcupado()
+        try:
+            return funcion(*args)
+        finally:
+            _limitador.release()
+
+    fd = _tomar_turno()
+    if fd is None:
+        raise ServidorOcupado()
+    try:
+        return funcion(*args)
+    finally:
+        os.close(fd)  # Cerrar el descriptor suelta el flock
+
+
+def generar_hash(password, metodo=None):
+    """Hashear una contraseña con los parámetros configurados (o con `metodo`)"""
+    return _con_turno(generate_password_hash, password, metodo or HASH_METODO)
+
+
+def verificar_hash(password_hash, password):
+    """Comprobar una contraseña contra su hash guardado"""
+    return _con_turno(check_password_hash, password_hash, password)
+
+
+def generar_password_temporal():
+    """Contraseña aleatoria para cuentas creadas por un administrador"""
+    return secrets.token_urlsafe(12)
+
+
+def necesita_rehash(password_hash):
+    """True si el hash se generó con un método o parámetros distintos a los actuales"""
+    return password_hash.split('$', 1)[0] != HASH_METODO
+
+
+def _medir(metodo, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        generate_password_hash('calibracion-codebase', metodo)
+        tiempos.append(time.perf_counter() - inicio)
+    return sorted(tiempos)[len(tiempos) // 2] * 1000
+
+
+def calibrar(objetivo_ms=250, repeticiones=5):
+    """
+    Elegir el mayor coste de scrypt cuyo tiempo mediano no supera el objetivo
+
+    Se varía n (potencias de 2) con r=8 y p=1, como el valor por defecto de werkzeug.
+
+    Returns:
+        tuple (método elegido, lista de (método, ms medidos))
+    """
+    elegido = None
+    mediciones = []
+    for exponente in range(12, 19):
+        metodo = f"scrypt:{2 ** exponente}:8:1"
+        ms = _medir(metodo, repeticiones)
+        mediciones.append((metodo, ms))
+        if ms > objetivo_ms:
+            break
+        elegido = metodo
+    return elegido or mediciones[0][0], mediciones
+
+
+if __name__ == '__main__':
+    objetivo = 250
+    if '--objetivo' in sys.argv:
+        objetivo = float(sys.argv[sys.argv.index('--objetivo') + 1])
+
+    print(f"⏱️  Calibrando scrypt para un objetivo de {objetivo:.0f} ms por hash...")
+    elegido, mediciones = calibrar(objetivo)
+    for metodo, ms in mediciones:
+        print(f"   {metodo:<22} {ms:8.1f} ms{'  ✅' if metodo == elegido else ''}")
+    print(f"\nConfigura en .env:\nPASSWORD_HASH_METODO={elegido}")
+    print(f"(actual: {HASH_METODO}; las contraseñas existentes se actualizan al iniciar sesión)")
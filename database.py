@@ -1,7 +1,7 @@
 import sqlite3
 from datetime import datetime
 import os
-from werkzeug.security import generate_password_hash
+from contrasenas import generar_hash, verificar_hash, necesita_rehash
 
 # Usar SQLite siempre
 DATABASE_PATH = os.path.join('instance', 'aprendizaje.db')
@@ -35,7 +35,10 @@ def init_db():
             es_admin INTEGER DEFAULT 0,
             activo INTEGER DEFAULT 1,
             requiere_cambio_password INTEGER DEFAULT 0,
-            foto_perfil TEXT
+            foto_perfil TEXT,
+            zona_horaria TEXT,
+            ultimo_dia_actividad TEXT,
+            version_progreso INTEGER DEFAULT 0
         )
     ''')
     
@@ -89,6 +92,9 @@ def init_db():
             aprobada INTEGER DEFAULT 0,
             intentos INTEGER DEFAULT 0,
             fecha_completado TIMESTAMP,
+            respuestas_totales INTEGER DEFAULT 0,
+            respuestas_acertadas INTEGER DEFAULT 0,
+            tiempo_respuesta_ms INTEGER DEFAULT 0,
             FOREIGN KEY (usuario_id) REFERENCES usuarios (id),
             FOREIGN KEY (leccion_id) REFERENCES lecciones (id),
             UNIQUE(usuario_id, leccion_id)
@@ -108,6 +114,185 @@ def init_db():
         )
     ''')
     
+    # Bandeja de salida de correos (la vacía el worker de email_service.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            destinatario TEXT NOT NULL,
+            asunto TEXT NOT NULL,
+            cuerpo_html TEXT,
+            cuerpo_texto TEXT,
+            mensaje_mime BLOB,
+            estado TEXT DEFAULT 'pendiente',
+            intentos INTEGER DEFAULT 0,
+            ultimo_error TEXT,
+            proximo_intento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            reclamado_por TEXT,
+            reclamado_hasta TIMESTAMP,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_envio TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_pendientes ON email_outbox (estado, proximo_intento)')
+    
+    # Índices para contar referencias a archivos subidos (ver almacenamiento.py)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_foto_perfil ON usuarios (foto_perfil)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_contenido_pdf_ruta ON contenido_pdf (ruta_archivo)')
+
+    # Historial de solo inserción (lo escribe historial.py en lotes)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS respuestas_ejercicio (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            leccion_id INTEGER NOT NULL,
+            ejercicio_id INTEGER NOT NULL,
+            intento TEXT,
+            respuesta TEXT,
+            correcta INTEGER NOT NULL,
+            latencia_ms INTEGER,
+            fecha TIMESTAMP NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS intentos_leccion (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            leccion_id INTEGER NOT NULL,
+            intento TEXT,
+            calificacion REAL NOT NULL,
+            respuestas_correctas INTEGER,
+            total_ejercicios INTEGER,
+            duracion_ms INTEGER,
+            fecha TIMESTAMP NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS historial_estado (
+            clave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_respuestas_ejercicio ON respuestas_ejercicio (ejercicio_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_intentos_leccion ON intentos_leccion (leccion_id)')
+
+    # Analítica (ver analitica.py): primera respuesta de cada estudiante y tablas de resumen
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analitica_primera_respuesta (
+            usuario_id INTEGER NOT NULL,
+            ejercicio_id INTEGER NOT NULL,
+            correcta INTEGER NOT NULL,
+            latencia_ms INTEGER,
+            PRIMARY KEY (usuario_id, ejercicio_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analitica_ejercicio (
+            ejercicio_id INTEGER PRIMARY KEY,
+            estudiantes INTEGER NOT NULL,
+            aciertos INTEGER NOT NULL,
+            p_valor REAL,
+            discriminacion REAL,
+            latencia_media_ms REAL,
+            actualizado TIMESTAMP,
+            n_pares INTEGER,
+            suma_x REAL,
+            suma_y REAL,
+            suma_xx REAL,
+            suma_yy REAL,
+            suma_xy REAL,
+            n_latencias INTEGER,
+            suma_latencias REAL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analitica_leccion (
+            leccion_id INTEGER PRIMARY KEY,
+            estudiantes INTEGER NOT NULL,
+            aprobados INTEGER NOT NULL,
+            tasa_aprobacion REAL,
+            calificacion_media REAL,
+            intentos_medios REAL,
+            histograma TEXT,
+            actualizado TIMESTAMP
+        )
+    ''')
+
+    # Versión del contenido del curso para la caché de fragmentos (ver fragmentos.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS contenido_version (
+            clave TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+
+    # Clasificación por curso y unidad (ver clasificacion.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS clasificacion (
+            ambito TEXT NOT NULL,
+            usuario_id INTEGER NOT NULL,
+            promedio INTEGER NOT NULL,
+            puntos INTEGER NOT NULL,
+            PRIMARY KEY (ambito, usuario_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_clasificacion_usuario ON clasificacion (usuario_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_clasificacion_promedio ON clasificacion (ambito, promedio, puntos, usuario_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_clasificacion_puntos ON clasificacion (ambito, puntos, promedio, usuario_id)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS clasificacion_fenwick (
+            ambito TEXT NOT NULL,
+            metrica TEXT NOT NULL,
+            posicion INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            PRIMARY KEY (ambito, metrica, posicion)
+        ) WITHOUT ROWID
+    ''')
+    # Número de unidades con el que se calcularon los promedios del curso
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS clasificacion_estado (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            numero_unidades INTEGER NOT NULL
+        )
+    ''')
+
+    # Importaciones masivas de usuarios en segundo plano (ver importacion.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS importaciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            estado TEXT NOT NULL DEFAULT 'procesando',
+            total INTEGER NOT NULL,
+            procesados INTEGER NOT NULL DEFAULT 0,
+            creados INTEGER NOT NULL DEFAULT 0,
+            errores TEXT,
+            credenciales TEXT,
+            creada TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            actualizada TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Intentos ya guardados, para que reenviar un lote sin conexión no los duplique (ver sincronizacion.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS intentos_recibidos (
+            usuario_id INTEGER NOT NULL,
+            intento TEXT NOT NULL,
+            leccion_id INTEGER NOT NULL,
+            recibido_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (usuario_id, intento)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_intentos_recibidos_fecha ON intentos_recibidos (recibido_en)')
+
+    # Listado paginado de usuarios y búsqueda por prefijo en el panel de administración
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_registro ON usuarios (fecha_registro, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_nombre_nocase ON usuarios (nombre_completo COLLATE NOCASE)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_email_nocase ON usuarios (email COLLATE NOCASE)')
+
+    # Reinicio de rachas rotas (ver rachas.py): solo recorre a quien tiene una racha activa
+    try:
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_racha ON usuarios (ultimo_dia_actividad) WHERE racha_dias > 0')
+    except sqlite3.OperationalError:
+        print("⚠️ Falta la columna ultimo_dia_actividad: ejecuta python migrate_rachas.py")
+    
     # Insertar unidades del curso de Python
     unidades_data = [
         (1, 'Introducción con Python', 'En esta unidad conocerás qué es Python y prepararás tu entorno para escribir tus primeras instrucciones. Aprenderás cómo el ordenador interpreta el código y cómo mostrar resultados en pantalla', 1),
@@ -1119,10 +1304,12 @@ def asegurar_admin():
         cursor.execute('SELECT * FROM usuarios WHERE email = ?', (ADMIN_EMAIL,))
         admin = cursor.fetchone()
         
-        password_hash = generate_password_hash(ADMIN_PASSWORD)
-        
         if admin:
-            # Si existe, actualizar la contraseña y asegurar que sea admin
+            # Si existe, asegurar que sea admin y re-hashear solo si la contraseña
+            # no coincide o se guardó con parámetros antiguos
+            password_hash = admin['password']
+            if necesita_rehash(password_hash) or not verificar_hash(password_hash, ADMIN_PASSWORD):
+                password_hash = generar_hash(ADMIN_PASSWORD)
             cursor.execute('''
                 UPDATE usuarios 
                 SET password = ?, es_admin = 1, activo = 1, nombre_completo = ?
@@ -1131,6 +1318,7 @@ def asegurar_admin():
             print(f"✅ Usuario admin actualizado: {ADMIN_EMAIL}")
         else:
             # Si no existe, crearlo
+            password_hash = generar_hash(ADMIN_PASSWORD)
             cursor.execute('''
                 INSERT INTO usuarios (nombre_completo, email, password, es_admin, activo, requiere_cambio_password)
                 VALUES (?, ?, ?, ?, ?, ?)
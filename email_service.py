@@ -1,11 +1,28 @@
 """
 Módulo de servicio de correo electrónico para CodeBase
 Maneja el envío de correos usando Flask-Mail y SMTP
+
+Las peticiones no envían correo directamente: escriben el mensaje en la
+tabla email_outbox y un hilo de fondo lo entrega en lotes, reutilizando una
+sola conexión SMTP, con reintentos y backoff exponencial. Los mensajes que
+agotan los reintentos quedan en estado 'fallido' (dead letter). Con el envío
+desactivado (MAIL_SUPPRESS_SEND, o TESTING) quedan en 'suprimido', con su
+cuerpo, para poder volver a encolarlos.
 """
 
 from flask_mail import Mail, Message
 from flask import render_template
+from markupsafe import Markup, escape
+from concurrent.futures import ProcessPoolExecutor
+from email.header import Header
+from email.utils import formatdate, make_msgid
+import base64
+from database import get_db_connection
 import os
+import smtplib
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
@@ -13,6 +30,19 @@ load_dotenv()
 
 mail = None
 
+# Configuración del worker de envío
+LOTE_ENVIO = 50               # Mensajes reclamados por ciclo
+INTERVALO_WORKER = 5          # Segundos entre ciclos cuando la cola está vacía
+MAX_INTENTOS = 5              # Después pasa a 'fallido'
+BACKOFF_BASE = 30             # Segundos; se duplica en cada intento
+TIEMPO_RECLAMO = 300          # Segundos que un worker retiene un lote reclamado
+RETENCION_DIAS = 30           # Días que se conservan los mensajes enviados o fallidos
+PURGAR_CADA = 3600            # Segundos entre purgas de la bandeja
+UMBRAL_POOL = 2000            # Mensajes a partir de los cuales se compone en paralelo
+
+_worker = None
+_hay_trabajo = threading.Event()  # Despierta al worker de este proceso al encolar
+
 def init_mail(app):
     """
     Inicializar Flask-Mail con la aplicación Flask
@@ -37,34 +67,13 @@ def init_mail(app):
     mail = Mail(app)
     return mail
 
-def enviar_email_bienvenida(nombre, email):
-    """
-    Enviar correo de bienvenida a un nuevo usuario
-    
-    Args:
-        nombre (str): Nombre del usuario
-        email (str): Dirección de correo electrónico del usuario
-    
-    Returns:
-        bool: True si el correo se envió exitosamente, False en caso contrario
-    """
-    try:
-        # Obtener email de envío para asegurar formato "CodeBase <email>"
-        sender_email = os.getenv('MAIL_USERNAME')
-        sender = f"CodeBase <{sender_email}>" if sender_email else None
-
-        # Crear el mensaje
-        msg = Message(
-            subject='¡Bienvenido a CodeBase! 🎉',
-            sender=sender,
-            recipients=[email]
-        )
-        
-        # Renderizar el template HTML
-        msg.html = render_template('emails/bienvenida.html', nombre=nombre)
-        
-        # Versión de texto plano como fallback
-        msg.body = f"""
+def obtener_remitente():
+    """Obtener el remitente con formato "CodeBase <email>" """
+    sender_email = os.getenv('MAIL_USERNAME')
+    return f"CodeBase <{sender_email}>" if sender_email else None
+
+# Versiones de texto plano (fallback); {campo} se sustituye por destinatario
+TEXTO_BIENVENIDA = """
 ¡Hola {nombre}!
 
 Bienvenido a CodeBase, tu plataforma de aprendizaje de programación.
@@ -83,18 +92,241 @@ progreso que te mantendrá motivado.
 Saludos,
 El equipo de CodeBase
         """
-        
-        # Enviar el correo
-        mail.send(msg)
+
+TEXTO_RECUPERACION = """
+¡Hola {nombre}!
+
+Hemos recibido una solicitud para restablecer tu contraseña en CodeBase.
+
+Tu nueva contraseña temporal es: {password_temporal}
+
+Por favor, inicia sesión con esta contraseña y cámbiala inmediatamente desde tu perfil 
+o contactando al administrador.
+
+Si no solicitaste este cambio, por favor contacta al soporte inmediatamente.
+
+Saludos,
+El equipo de CodeBase
+        """
+
+PLANTILLAS_EMAIL = {
+    'bienvenida': {
+        'asunto': '¡Bienvenido a CodeBase! 🎉',
+        'html': 'emails/bienvenida.html',
+        'texto': TEXTO_BIENVENIDA,
+        'campos': ('nombre',)
+    },
+    'recuperacion': {
+        'asunto': 'Recuperación de Contraseña - CodeBase',
+        'html': 'emails/recuperacion.html',
+        'texto': TEXTO_RECUPERACION,
+        'campos': ('nombre', 'password_temporal')
+    }
+}
+
+# Plantillas ya renderizadas por Jinja, una vez por proceso
+_plantillas_compiladas = {}
+
+def obtener_plantilla(clave):
+    """
+    Renderizar una plantilla de email una sola vez con marcadores en lugar de
+    los datos del destinatario y guardarla partida en trozos.
+    
+    Requiere un app_context la primera vez (usa render_template).
+    
+    Returns:
+        dict con asunto, partes_html (texto literal y nombres de campo alternados) y texto
+    """
+    if clave in _plantillas_compiladas:
+        return _plantillas_compiladas[clave]
+    
+    config = PLANTILLAS_EMAIL[clave]
+    marcadores = {campo: Markup(f'\x00{campo}\x00') for campo in config['campos']}
+    html = render_template(config['html'], **marcadores)
+    
+    plantilla = {
+        'asunto': config['asunto'],
+        # Posiciones pares: HTML literal; impares: nombre del campo a sustituir
+        'partes_html': tuple(html.split('\x00')),
+        'texto': config['texto']
+    }
+    _plantillas_compiladas[clave] = plantilla
+    return plantilla
+
+def componer_email(plantilla, valores):
+    """
+    Componer un mensaje a partir de una plantilla compilada
+    
+    Los valores se escapan para HTML igual que lo haría Jinja con autoescape.
+    
+    Returns:
+        tuple (asunto, html, texto)
+    """
+    partes = plantilla['partes_html']
+    html = ''.join(
+        parte if i % 2 == 0 else escape(valores[parte])
+        for i, parte in enumerate(partes)
+    )
+    return plantilla['asunto'], html, plantilla['texto'].format(**valores)
+
+def _codificar_cabecera(valor):
+    return valor if valor.isascii() else Header(valor, 'utf-8').encode()
+
+def _base64_lineas(texto):
+    # Líneas de 76 caracteres terminadas en CRLF, como exige SMTP
+    return base64.encodebytes(texto.encode('utf-8')).replace(b'\n', b'\r\n')
+
+def compilar_mime(plantilla, remitente):
+    """
+    Preparar el esqueleto MIME (cabeceras fijas y límites) de una plantilla
+    
+    Solo To, Date, Message-ID y los dos cuerpos cambian por destinatario.
+    """
+    limite = f"==============={uuid.uuid4().hex}=="
+    limite_alt = f"==============={uuid.uuid4().hex}=="
+    dominio = remitente.rsplit('@', 1)[-1].rstrip('>') if remitente and '@' in remitente else 'codebase.local'
+    cabecera = (
+        f'Content-Type: multipart/mixed; boundary="{limite}"\r\n'
+        'MIME-Version: 1.0\r\n'
+        f"Subject: {_codificar_cabecera(plantilla['asunto'])}\r\n"
+        f"From: {_codificar_cabecera(remitente or '')}\r\n"
+    )
+    parte = '--{}\r\nContent-Type: text/{}; charset="utf-8"\r\nMIME-Version: 1.0\r\nContent-Transfer-Encoding: base64\r\n\r\n'
+    return {
+        'plantilla': plantilla,
+        'dominio': dominio,
+        'cabecera': cabecera.encode('ascii'),
+        'inicio_cuerpo': (
+            f'\r\n--{limite}\r\n'
+            f'Content-Type: multipart/alternative; boundary="{limite_alt}"\r\n'
+            'MIME-Version: 1.0\r\n\r\n'
+        ).encode('ascii') + parte.format(limite_alt, 'plain').encode('ascii'),
+        'separador_html': parte.format(limite_alt, 'html').encode('ascii'),
+        'cierre': f'--{limite_alt}--\r\n\r\n--{limite}--\r\n'.encode('ascii')
+    }
+
+def componer_mime(mime, destinatario, valores):
+    """
+    Componer el mensaje listo para SMTP a partir de un esqueleto compilado
+    
+    Returns:
+        tuple (asunto, bytes del mensaje)
+    """
+    asunto, html, texto = componer_email(mime['plantilla'], valores)
+    cabeceras_variables = (
+        f"To: {_codificar_cabecera(destinatario)}\r\n"
+        f"Date: {formatdate(localtime=True)}\r\n"
+        f"Message-ID: {make_msgid(domain=mime['dominio'])}\r\n"
+    ).encode('ascii')
+    return asunto, b''.join((
+        mime['cabecera'], cabeceras_variables, mime['inicio_cuerpo'],
+        _base64_lineas(texto), mime['separador_html'], _base64_lineas(html), mime['cierre']
+    ))
+
+def _componer_trozo(mime, trozo):
+    return [componer_mime(mime, destinatario, valores) for destinatario, valores in trozo]
+
+def componer_lote(mime, destinatarios, procesos=None):
+    """
+    Componer muchos mensajes con el mismo esqueleto MIME
+    
+    Por debajo de UMBRAL_POOL, o con una sola CPU, se compone en el propio
+    hilo: arrancar el pool y copiar los resultados cuesta más que componer.
+    
+    Args:
+        mime (dict): Resultado de compilar_mime()
+        destinatarios (list): Tuplas (email, valores)
+        procesos (int): Tamaño del pool (por defecto, uno por CPU)
+    
+    Returns:
+        list de tuplas (asunto, bytes del mensaje) en el mismo orden
+    """
+    procesos = procesos or os.cpu_count() or 1
+    if len(destinatarios) < UMBRAL_POOL or procesos < 2:
+        return _componer_trozo(mime, destinatarios)
+    
+    tamano = -(-len(destinatarios) // (procesos * 4))
+    trozos = [destinatarios[i:i + tamano] for i in range(0, len(destinatarios), tamano)]
+    
+    resultado = []
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        for compuestos in pool.map(_componer_trozo, [mime] * len(trozos), trozos):
+            resultado.extend(compuestos)
+    return resultado
+
+def encolar_email(destinatario, asunto, html, texto):
+    """
+    Guardar un correo en la bandeja de salida para que lo envíe el worker
+    
+    Returns:
+        int: ID del mensaje en email_outbox
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO email_outbox (destinatario, asunto, cuerpo_html, cuerpo_texto)
+        VALUES (?, ?, ?, ?)
+    ''', (destinatario, asunto, html, texto))
+    mensaje_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    _hay_trabajo.set()
+    return mensaje_id
+
+def enviar_email_bienvenida(nombre, email):
+    """
+    Encolar correo de bienvenida a un nuevo usuario
+    
+    Args:
+        nombre (str): Nombre del usuario
+        email (str): Dirección de correo electrónico del usuario
+    
+    Returns:
+        bool: True si el correo quedó en la bandeja de salida, False en caso contrario
+    """
+    try:
+        asunto, html, texto = componer_email(obtener_plantilla('bienvenida'), {'nombre': nombre})
+        encolar_email(email, asunto, html, texto)
         return True
         
     except Exception as e:
         # Registrar el error (en producción, usar un logger apropiado)
-        print(f"❌ ERROR CRÍTICO al enviar email de bienvenida a {email}: {str(e)}")
+        print(f"❌ ERROR CRÍTICO al encolar email de bienvenida a {email}: {str(e)}")
         import traceback
         traceback.print_exc()
         return False
 
+def encolar_bienvenida_masiva(usuarios, procesos=None):
+    """
+    Encolar el correo de bienvenida para una cohorte completa
+    
+    La plantilla (HTML y esqueleto MIME) se compila una sola vez; por cada
+    destinatario solo se sustituyen sus datos. Con muchos destinatarios la
+    composición se reparte en un pool de procesos, y todos los mensajes se
+    insertan ya serializados en una única transacción, así el worker solo
+    tiene que transmitirlos.
+    
+    Args:
+        usuarios (list): Tuplas (nombre, email)
+        procesos (int): Tamaño del pool (por defecto, uno por CPU)
+    
+    Returns:
+        int: Número de mensajes encolados
+    """
+    mime = compilar_mime(obtener_plantilla('bienvenida'), obtener_remitente())
+    destinatarios = [(email, {'nombre': nombre}) for nombre, email in usuarios]
+    compuestos = componer_lote(mime, destinatarios, procesos)
+    
+    conn = get_db_connection()
+    conn.executemany('''
+        INSERT INTO email_outbox (destinatario, asunto, mensaje_mime)
+        VALUES (?, ?, ?)
+    ''', ((email, asunto, mensaje) for (email, _), (asunto, mensaje) in zip(destinatarios, compuestos)))
+    conn.commit()
+    conn.close()
+    _hay_trabajo.set()
+    return len(compuestos)
+
 def debug_email_config():
     """Imprime la configuración actual de email para depuración"""
     print("--- DEPURACIÓN DE CONFIGURACIÓN DE EMAIL ---")
@@ -110,7 +342,7 @@ def debug_email_config():
 
 def enviar_email_recuperacion(nombre, email, password_temporal):
     """
-    Enviar correo de recuperación de contraseña con contraseña temporal
+    Encolar correo de recuperación de contraseña con contraseña temporal
     
     Args:
         nombre (str): Nombre del usuario
@@ -118,49 +350,228 @@ def enviar_email_recuperacion(nombre, email, password_temporal):
         password_temporal (str): Nueva contraseña temporal generada
     
     Returns:
-        bool: True si el correo se envió exitosamente, False en caso contrario
+        bool: True si el correo quedó en la bandeja de salida, False en caso contrario
     """
     try:
-        # Obtener email de envío para asegurar formato "CodeBase <email>"
-        sender_email = os.getenv('MAIL_USERNAME')
-        sender = f"CodeBase <{sender_email}>" if sender_email else None
+        asunto, html, texto = componer_email(obtener_plantilla('recuperacion'), {
+            'nombre': nombre,
+            'password_temporal': password_temporal
+        })
+        encolar_email(email, asunto, html, texto)
+        return True
         
-        # Crear el mensaje
-        msg = Message(
-            subject='Recuperación de Contraseña - CodeBase',
-            sender=sender,
-            recipients=[email]
+    except Exception as e:
+        print(f"❌ ERROR CRÍTICO al encolar email de recuperación a {email}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def reclamar_lote(limite=LOTE_ENVIO):
+    """
+    Reclamar mensajes pendientes cuyo próximo intento ya venció.
+    
+    El reclamo es un único UPDATE con un token propio, así varios workers de
+    gunicorn pueden compartir la misma bandeja sin enviar dos veces un mensaje.
+    Si un worker muere, el reclamo caduca tras TIEMPO_RECLAMO segundos.
+    
+    Returns:
+        tuple (token, lista de filas reclamadas)
+    """
+    token = uuid.uuid4().hex
+    conn = get_db_connection()
+    conn.execute('''
+        UPDATE email_outbox
+        SET reclamado_por = ?, reclamado_hasta = datetime('now', ?)
+        WHERE id IN (
+            SELECT id FROM email_outbox
+            WHERE estado = 'pendiente'
+              AND proximo_intento <= datetime('now')
+              AND (reclamado_hasta IS NULL OR reclamado_hasta < datetime('now'))
+            ORDER BY id
+            LIMIT ?
         )
-        
-        # Renderizar el template HTML
-        # Nota: Asegurar que existe este template
-        msg.html = render_template('emails/recuperacion.html', 
-                                 nombre=nombre, 
-                                 password_temporal=password_temporal)
-        
-        # Versión de texto plano como fallback
-        msg.body = f"""
-¡Hola {nombre}!
+    ''', (token, f'+{TIEMPO_RECLAMO} seconds', limite))
+    conn.commit()
+    mensajes = conn.execute(
+        'SELECT * FROM email_outbox WHERE reclamado_por = ? ORDER BY id', (token,)
+    ).fetchall()
+    conn.close()
+    return token, mensajes
 
-Hemos recibido una solicitud para restablecer tu contraseña en CodeBase.
+def _registrar_resultado(conn, mensaje, token, error=None, permanente=False):
+    """
+    Marcar un mensaje como enviado, reprogramarlo o moverlo a 'fallido'
 
-Tu nueva contraseña temporal es: {password_temporal}
+    Solo si el reclamo sigue siendo de este worker (token): si caducó, otro
+    worker puede haberlo reclamado y su resultado no se pisa. Los mensajes
+    terminados pierden el cuerpo, que puede llevar una contraseña temporal.
+    """
+    if error is None:
+        conn.execute('''
+            UPDATE email_outbox
+            SET estado = 'enviado', intentos = intentos + 1, fecha_envio = CURRENT_TIMESTAMP,
+                ultimo_error = NULL, reclamado_por = NULL, reclamado_hasta = NULL,
+                cuerpo_html = NULL, cuerpo_texto = NULL, mensaje_mime = NULL
+            WHERE id = ? AND reclamado_por = ?
+        ''', (mensaje['id'], token))
+        return
+    
+    intentos = (mensaje['intentos'] or 0) + 1
+    if permanente or intentos >= MAX_INTENTOS:
+        conn.execute('''
+            UPDATE email_outbox
+            SET estado = 'fallido', intentos = ?, ultimo_error = ?,
+                reclamado_por = NULL, reclamado_hasta = NULL,
+                cuerpo_html = NULL, cuerpo_texto = NULL, mensaje_mime = NULL
+            WHERE id = ? AND reclamado_por = ?
+        ''', (intentos, str(error)[:500], mensaje['id'], token))
+        print(f"❌ Email {mensaje['id']} a {mensaje['destinatario']} movido a fallidos: {error}")
+    else:
+        espera = BACKOFF_BASE * 2 ** (intentos - 1)
+        conn.execute('''
+            UPDATE email_outbox
+            SET intentos = ?, ultimo_error = ?, proximo_intento = datetime('now', ?),
+                reclamado_por = NULL, reclamado_hasta = NULL
+            WHERE id = ? AND reclamado_por = ?
+        ''', (intentos, str(error)[:500], f'+{espera} seconds', mensaje['id'], token))
 
-Por favor, inicia sesión con esta contraseña y cámbiala inmediatamente desde tu perfil 
-o contactando al administrador.
+def procesar_outbox(limite=LOTE_ENVIO):
+    """
+    Enviar un lote de la bandeja de salida sobre una sola conexión SMTP.
+    
+    Debe ejecutarse dentro de un app_context con init_mail() ya aplicado.
+    
+    Returns:
+        tuple (enviados, con error)
+    """
+    token, mensajes = reclamar_lote(limite)
+    if not mensajes:
+        return 0, 0
+    
+    enviados = 0
+    errores = 0
+    remitente = obtener_remitente()
+    conn = get_db_connection()
+    
+    try:
+        with mail.connect() as smtp:
+            if smtp.host is None:
+                # Envío desactivado: no marcarlos como enviados (no salieron)
+                conn.execute('''
+                    UPDATE email_outbox
+                    SET estado = 'suprimido', reclamado_por = NULL, reclamado_hasta = NULL
+                    WHERE reclamado_por = ?
+                ''', (token,))
+                conn.commit()
+                print(f"⚠️ Envío de email desactivado (MAIL_SUPPRESS_SEND): {len(mensajes)} emails suprimidos")
+                return 0, 0
+            for mensaje in mensajes:
+                try:
+                    if mensaje['mensaje_mime']:
+                        # Ya serializado al encolar (envíos masivos): solo transmitir
+                        smtp.host.sendmail(remitente, [mensaje['destinatario']], mensaje['mensaje_mime'])
+                    else:
+                        smtp.send(Message(
+                            subject=mensaje['asunto'],
+                            sender=remitente,
+                            recipients=[mensaje['destinatario']],
+                            body=mensaje['cuerpo_texto'],
+                            html=mensaje['cuerpo_html']
+                        ))
+                    _registrar_resultado(conn, mensaje, token)
+                    enviados += 1
+                except smtplib.SMTPRecipientsRefused as e:
+                    # Dirección rechazada por el servidor: reintentar no sirve
+                    _registrar_resultado(conn, mensaje, token, e, permanente=True)
+                    errores += 1
+                except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError):
+                    # Se perdió la conexión: el resto del lote se reintenta en el próximo ciclo
+                    raise
+                except smtplib.SMTPResponseException as e:
+                    # Los códigos 5xx son rechazos permanentes, los 4xx temporales
+                    _registrar_resultado(conn, mensaje, token, e, permanente=e.smtp_code >= 500)
+                    errores += 1
+                except Exception as e:
+                    _registrar_resultado(conn, mensaje, token, e)
+                    errores += 1
+                conn.commit()
+    except Exception as e:
+        # Fallo de conexión/autenticación: reprogramar lo que no se envió
+        pendientes = conn.execute(
+            'SELECT * FROM email_outbox WHERE reclamado_por = ?', (token,)
+        ).fetchall()
+        for mensaje in pendientes:
+            _registrar_resultado(conn, mensaje, token, e)
+            errores += 1
+        conn.commit()
+        print(f"⚠️ Error de conexión SMTP, {len(pendientes)} emails reprogramados: {e}")
+    finally:
+        conn.close()
+    
+    return enviados, errores
 
-Si no solicitaste este cambio, por favor contacta al soporte inmediatamente.
+def purgar_outbox(dias=RETENCION_DIAS):
+    """
+    Vaciar el cuerpo de los mensajes terminados y borrar los de más de `dias` días
 
-Saludos,
-El equipo de CodeBase
-        """
-        
-        # Enviar el correo
-        mail.send(msg)
-        return True
-        
-    except Exception as e:
-        print(f"❌ ERROR CRÍTICO al enviar email de recuperación a {email}: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
+    Returns:
+        int: mensajes borrados
+    """
+    conn = get_db_connection()
+    conn.execute('''
+        UPDATE email_outbox
+        SET cuerpo_html = NULL, cuerpo_texto = NULL, mensaje_mime = NULL
+        WHERE estado IN ('enviado', 'fallido')
+          AND (cuerpo_html IS NOT NULL OR cuerpo_texto IS NOT NULL OR mensaje_mime IS NOT NULL)
+    ''')
+    cursor = conn.execute('''
+        DELETE FROM email_outbox
+        WHERE estado IN ('enviado', 'fallido', 'suprimido') AND fecha_creacion < datetime('now', ?)
+    ''', (f'-{dias} days',))
+    conn.commit()
+    conn.close()
+    return cursor.rowcount
+
+def _bucle_worker(app, intervalo):
+    ultima_purga = 0
+    with app.app_context():
+        while True:
+            try:
+                if time.monotonic() - ultima_purga > PURGAR_CADA:
+                    purgar_outbox()
+                    ultima_purga = time.monotonic()
+                enviados, errores = procesar_outbox()
+            except Exception as e:
+                print(f"❌ Error en el worker de email: {e}")
+                enviados = errores = 0
+            # Si el lote salió lleno puede haber más mensajes esperando
+            if enviados + errores < LOTE_ENVIO:
+                _hay_trabajo.wait(intervalo)
+                _hay_trabajo.clear()
+
+def iniciar_worker_email(app, intervalo=INTERVALO_WORKER):
+    """
+    Iniciar el hilo de fondo que vacía la bandeja de salida.
+    
+    Cada proceso (worker de gunicorn) inicia a lo sumo un hilo.
+    """
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return _worker
+    _worker = threading.Thread(target=_bucle_worker, args=(app, intervalo),
+                               name='email-outbox', daemon=True)
+    _worker.start()
+    return _worker
+
+if __name__ == '__main__':
+    # Ejecutar el envío como proceso independiente: python email_service.py
+    from flask import Flask
+    from database import init_db
+    
+    app = Flask(__name__)
+    init_mail(app)
+    debug_email_config()
+    with app.app_context():
+        init_db()
+    print("📬 Worker de email iniciado")
+    _bucle_worker(app, INTERVALO_WORKER)
@@ -0,0 +1,109 @@
+"""
+Filtro de Bloom con los emails registrados, uno por worker.
+
+Responde "seguro que no existe" sin consultar la base de datos; solo los
+posibles positivos (registrados de verdad o falsos positivos, ~1%) se
+confirman con una consulta. Se construye al arrancar, se actualiza en
+Usuario.crear/actualizar_datos y, para ver lo que registran otros workers,
+cada SINCRONIZACION_SEGUNDOS lee solo los usuarios con id mayor al último
+visto. Los cambios de email hechos en otros workers se recogen en la
+reconstrucción completa periódica.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from database import get_db_connection
+
+TASA_FALSOS_POSITIVOS = 0.01
+CAPACIDAD_MINIMA = 1024
+SINCRONIZACION_SEGUNDOS = 5
+RECONSTRUCCION_SEGUNDOS = 600
+
+
+class FiltroBloom:
+    def __init__(self, capacidad, tasa_falsos=TASA_FALSOS_POSITIVOS):
+        self.capacidad = capacidad
+        self.m = max(64, int(-capacidad * math.log(tasa_falsos) / math.log(2) ** 2))
+        self.k = max(1, round(self.m / capacidad * math.log(2)))
+        self.bits = bytearray((self.m + 7) // 8)
+        self.elementos = 0
+
+    def _posiciones(self, valor):
+        # Doble hashing: k posiciones a partir de un único digest de 128 bits
+        digest = hashlib.blake2b(valor.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def agregar(self, valor):
+        for pos in self._posiciones(valor):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.elementos += 1
+
+    def __contains__(self, valor):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._posiciones(valor))
+
+
+_lock = threading.Lock()
+_filtro = None
+_ultimo_id = 0
+_ultima_sincronizacion = 0
+_ultima_reconstruccion = 0
+
+
+def reconstruir():
+    """Construir el filtro desde cero con todos los emails de usuarios"""
+    global _filtro, _ultimo_id, _ultima_sincronizacion, _ultima_reconstruccion
+    conn = get_db_connection()
+    filas = conn.execute('SELECT id, email FROM usuarios').fetchall()
+    conn.close()
+
+    # El doble de capacidad deja margen para los registros que lleguen
+    filtro = FiltroBloom(max(CAPACIDAD_MINIMA, 2 * len(filas)))
+    for fila in filas:
+        filtro.agregar(fila['email'])
+
+    with _lock:
+        _filtro = filtro
+        _ultimo_id = max((fila['id'] for fila in filas), default=0)
+        _ultima_sincronizacion = _ultima_reconstruccion = time.monotonic()
+
+
+def _sincronizar():
+    global _ultimo_id, _ultima_sincronizacion
+    conn = get_db_connection()
+    nuevos = conn.execute('SELECT id, email FROM usuarios WHERE id > ? ORDER BY id', (_ultimo_id,)).fetchall()
+    conn.close()
+    with _lock:
+        for fila in nuevos:
+            _filtro.agregar(fila['email'])
+            _ultimo_id = max(_ultimo_id, fila['id'])
+        _ultima_sincronizacion = time.monotonic()
+
+
+def agregar(email):
+    """Registrar un email nuevo en el filtro de este worker"""
+    if _filtro is None or not email:
+        return
+    with _lock:
+        _filtro.agregar(email)
+
+
+def puede_existir(email):
+    """
+    False si el email seguro que no está registrado; True si podría estarlo
+    (hay que confirmarlo en la base de datos)
+    """
+    if not email:
+        return False
+
+    ahora = time.monotonic()
+    if _filtro is None or ahora - _ultima_reconstruccion > RECONSTRUCCION_SEGUNDOS \
+            or _filtro.elementos > _filtro.capacidad:
+        reconstruir()
+    elif ahora - _ultima_sincronizacion > SINCRONIZACION_SEGUNDOS:
+        _sincronizar()
+
+    return email in _filtro
@@ -0,0 +1,126 @@
+"""
+Caché de fragmentos de plantillas y de datos del contenido del curso.
+
+En las plantillas:
+    {% cache 'aprender', unidad['id'] %} ... HTML ... {% endcache %}
+
+El bloque se renderiza una vez por (plantilla, argumentos, versión del
+contenido) y se sirve desde memoria en las siguientes peticiones. Solo debe
+envolver HTML que no dependa del usuario: lo personal (barra superior con la
+racha, los puntos o la foto) queda fuera y se sigue renderizando siempre.
+
+La versión del contenido vive en la tabla contenido_version. Los endpoints de
+edición de contenido del administrador llaman a invalidar(), que la incrementa;
+cada worker la vuelve a leer como mucho cada VERIFICAR_CADA segundos y, al
+cambiar, descarta todo lo que tenía.
+"""
+
+import threading
+import time
+from jinja2 import nodes
+from jinja2.ext import Extension
+from database import get_db_connection
+
+VERIFICAR_CADA = 2          # Segundos que un worker confía en la versión leída
+MAX_ENTRADAS = 2000
+
+_cache = {}
+_estadisticas = {}          # {nombre: [aciertos, fallos]}
+_lock = threading.Lock()
+_version = None
+_leida = 0.0
+
+
+def version():
+    """Versión actual del contenido (leída de la base de datos cada VERIFICAR_CADA segundos)"""
+    global _version, _leida
+    ahora = time.monotonic()
+    if _version is None or ahora - _leida > VERIFICAR_CADA:
+        conn = get_db_connection()
+        fila = conn.execute("SELECT version FROM contenido_version WHERE clave = 'contenido'").fetchone()
+        conn.close()
+        nueva = fila['version'] if fila else 0
+        with _lock:
+            if nueva != _version:
+                _cache.clear()
+                _version = nueva
+            _leida = ahora
+    return _version
+
+
+def invalidar():
+    """Marcar el contenido como modificado en todos los workers"""
+    global _version, _leida
+    conn = get_db_connection()
+    fila = conn.execute('''
+        INSERT INTO contenido_version (clave, version) VALUES ('contenido', 1)
+        ON CONFLICT(clave) DO UPDATE SET version = version + 1
+        RETURNING version
+    ''').fetchone()
+    conn.commit()
+    conn.close()
+    with _lock:
+        _cache.clear()
+        _version = fila['version']
+        _leida = time.monotonic()
+
+
+def _obtener(nombre, clave, calcular):
+    clave = (clave, version())
+    valor = _cache.get(clave)
+    contador = _estadisticas.setdefault(nombre, [0, 0])
+    if valor is not None:
+        contador[0] += 1
+        return valor
+    contador[1] += 1
+    valor = calcular()
+    with _lock:
+        if len(_cache) >= MAX_ENTRADAS:
+            _cache.clear()
+        _cache[clave] = valor
+    return valor
+
+
+def memo(nombre, funcion, *args):
+    """
+    Resultado de funcion(*args) reutilizado hasta el próximo cambio de contenido
+
+    Para consultas que solo dependen del contenido del curso (unidades, lecciones, PDFs).
+    """
+    return _obtener(nombre, ('memo', nombre, args), lambda: funcion(*args))
+
+
+def estadisticas():
+    """Aciertos y fallos por fragmento en este worker"""
+    resultado = {}
+    for nombre, (aciertos, fallos) in sorted(_estadisticas.items()):
+        total = aciertos + fallos
+        resultado[nombre] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': round(aciertos / total, 4) if total else None,
+        }
+    return {'version': _version, 'entradas': len(_cache), 'fragmentos': resultado}
+
+
+class ExtensionCache(Extension):
+    """Etiqueta {% cache nombre[, arg, ...] %} ... {% endcache %}"""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        argumentos = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            argumentos.append(parser.parse_expression())
+        cuerpo = parser.parse_statements(['name:endcache'], drop_needle=True)
+        llamada = self.call_method('_renderizar', [nodes.Const(parser.name), nodes.List(argumentos)])
+        return nodes.CallBlock(llamada, [], [], cuerpo).set_lineno(lineno)
+
+    def _renderizar(self, plantilla, argumentos, caller):
+        nombre = f'{plantilla}:{argumentos[0]}'
+        return _obtener(nombre, ('fragmento', plantilla, *argumentos), caller)
+
+
+def init_fragmentos(app):
+    """Registrar la etiqueta {% cache %} en el entorno Jinja de la aplicación"""
+    app.jinja_env.add_extension(ExtensionCache)
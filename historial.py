@@ -0,0 +1,195 @@
+"""
+Historial de intentos: registro de solo inserción con cada respuesta a un
+ejercicio y cada lección terminada.
+
+Las peticiones solo añaden el evento a un buffer en memoria; un hilo de fondo
+lo vuelca cada INTERVALO_VOLCADO segundos (o antes, si se acumulan
+TAMANO_VOLCADO eventos) en una única transacción. Así /verificar_respuesta no
+espera a ningún fsync. Un cierre abrupto del proceso puede perder como mucho
+el último intervalo, aceptable para analítica: la calificación oficial se
+sigue guardando en progreso_usuario de forma síncrona.
+
+Cada INTERVALO_AGREGADO segundos las respuestas nuevas se agregan en
+progreso_usuario (respuestas_totales, respuestas_acertadas,
+tiempo_respuesta_ms) y las ya agregadas con más de RETENCION_DIAS se borran.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from database import get_db_connection
+
+INTERVALO_VOLCADO = 1           # Segundos entre volcados del buffer
+TAMANO_VOLCADO = 500            # Eventos que fuerzan un volcado inmediato
+INTERVALO_AGREGADO = 300        # Segundos entre agregados en progreso_usuario
+RETENCION_DIAS = 180            # Respuestas individuales que se conservan
+MAX_RESPUESTA = 2000            # Caracteres guardados de cada respuesta
+
+_respuestas = deque()
+_intentos = deque()
+_hay_trabajo = threading.Event()
+_hilo = None
+_pid = None
+
+
+def _ahora():
+    # Mismo formato que CURRENT_TIMESTAMP (UTC): el evento conserva su hora aunque se vuelque después
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+
+def _asegurar_hilo():
+    global _hilo, _pid
+    # Tras un fork (workers de gunicorn) el hilo del padre no existe en el hijo
+    if _hilo is not None and _pid == os.getpid() and _hilo.is_alive():
+        return
+    _pid = os.getpid()
+    _hilo = threading.Thread(target=_bucle, name='historial', daemon=True)
+    _hilo.start()
+
+
+def registrar_respuesta(usuario_id, leccion_id, ejercicio_id, respuesta, correcta, latencia_ms=None, intento=None):
+    """Anotar una respuesta a un ejercicio (no bloquea)"""
+    _respuestas.append((usuario_id, leccion_id, ejercicio_id, intento, (respuesta or '')[:MAX_RESPUESTA],
+                        1 if correcta else 0, latencia_ms, _ahora()))
+    _avisar()
+
+
+def registrar_intento(usuario_id, leccion_id, calificacion, respuestas_correctas, total_ejercicios,
+                      duracion_ms=None, intento=None):
+    """Anotar una lección terminada (no bloquea)"""
+    _intentos.append((usuario_id, leccion_id, intento, calificacion, respuestas_correctas,
+                      total_ejercicios, duracion_ms, _ahora()))
+    _avisar()
+
+
+def _avisar():
+    _asegurar_hilo()
+    if len(_respuestas) + len(_intentos) >= TAMANO_VOLCADO:
+        _hay_trabajo.set()
+
+
+def _extraer(buffer):
+    eventos = []
+    while buffer:
+        eventos.append(buffer.popleft())
+    return eventos
+
+
+def volcar():
+    """
+    Escribir en la base de datos los eventos pendientes de este proceso
+
+    Returns:
+        int: Número de eventos escritos
+    """
+    respuestas = _extraer(_respuestas)
+    intentos = _extraer(_intentos)
+    if not respuestas and not intentos:
+        return 0
+
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.executemany('''
+                INSERT INTO respuestas_ejercicio
+                (usuario_id, leccion_id, ejercicio_id, intento, respuesta, correcta, latencia_ms, fecha)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', respuestas)
+            conn.executemany('''
+                INSERT INTO intentos_leccion
+                (usuario_id, leccion_id, intento, calificacion, respuestas_correctas, total_ejercicios, duracion_ms, fecha)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', intentos)
+    except Exception:
+        # Devolver los eventos al buffer para reintentarlo en el siguiente volcado
+        _respuestas.extendleft(reversed(respuestas))
+        _intentos.extendleft(reversed(intentos))
+        raise
+    finally:
+        conn.close()
+    return len(respuestas) + len(intentos)
+
+
+def agregar():
+    """
+    Sumar las respuestas aún no agregadas a progreso_usuario y borrar las antiguas
+
+    El último id agregado se guarda en historial_estado dentro de la misma
+    transacción, así varios workers pueden ejecutarlo sin contar dos veces.
+
+    Returns:
+        int: Respuestas agregadas
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        fila = conn.execute("SELECT valor FROM historial_estado WHERE clave = 'ultima_respuesta_agregada'").fetchone()
+        desde = fila['valor'] if fila else 0
+        hasta = conn.execute('SELECT COALESCE(MAX(id), 0) FROM respuestas_ejercicio').fetchone()[0]
+
+        agregadas = 0
+        if hasta > desde:
+            agregadas = conn.execute('SELECT COUNT(*) FROM respuestas_ejercicio WHERE id > ? AND id <= ?',
+                                     (desde, hasta)).fetchone()[0]
+            # Las filas creadas aquí quedan con completada = 0 hasta que se termine la lección
+            conn.execute('''
+                INSERT INTO progreso_usuario
+                (usuario_id, leccion_id, respuestas_totales, respuestas_acertadas, tiempo_respuesta_ms)
+                SELECT usuario_id, leccion_id, COUNT(*), SUM(correcta), SUM(COALESCE(latencia_ms, 0))
+                FROM respuestas_ejercicio
+                WHERE id > ? AND id <= ?
+                GROUP BY usuario_id, leccion_id
+                ON CONFLICT(usuario_id, leccion_id) DO UPDATE SET
+                    respuestas_totales = COALESCE(respuestas_totales, 0) + excluded.respuestas_totales,
+                    respuestas_acertadas = COALESCE(respuestas_acertadas, 0) + excluded.respuestas_acertadas,
+                    tiempo_respuesta_ms = COALESCE(tiempo_respuesta_ms, 0) + excluded.tiempo_respuesta_ms
+            ''', (desde, hasta))
+            conn.execute('''
+                INSERT INTO historial_estado (clave, valor) VALUES ('ultima_respuesta_agregada', ?)
+                ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor
+            ''', (hasta,))
+
+        # Compactación: solo se borra lo que ya está sumado en progreso_usuario
+        # (y, si se usa la analítica, lo que ya incorporó analitica.py)
+        fila = conn.execute("SELECT valor FROM historial_estado WHERE clave = 'ultima_respuesta_analitica'").fetchone()
+        if fila:
+            hasta = min(hasta, fila['valor'])
+        limite = f'-{RETENCION_DIAS} days'
+        conn.execute("DELETE FROM respuestas_ejercicio WHERE id <= ? AND fecha < datetime('now', ?)", (hasta, limite))
+        conn.execute("DELETE FROM intentos_leccion WHERE fecha < datetime('now', ?)", (limite,))
+        conn.commit()
+        return agregadas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _bucle():
+    ultimo_agregado = time.monotonic()
+    while True:
+        _hay_trabajo.wait(INTERVALO_VOLCADO)
+        _hay_trabajo.clear()
+        try:
+            volcar()
+            if time.monotonic() - ultimo_agregado > INTERVALO_AGREGADO:
+                ultimo_agregado = time.monotonic()
+                agregar()
+        except Exception as e:
+            print(f"❌ Error al guardar el historial de intentos: {e}")
+
+
+@atexit.register
+def _volcar_al_salir():
+    try:
+        volcar()
+    except Exception as e:
+        print(f"❌ Error al guardar el historial de intentos: {e}")
+
+
+if __name__ == '__main__':
+    # Ejecutar el agregado manualmente: python historial.py
+    print(f"✅ {agregar()} respuestas agregadas en progreso_usuario")
@@ -0,0 +1,268 @@
+"""
+Importación masiva de usuarios desde CSV, en segundo plano.
+
+La petición solo lee y valida el archivo (como un flujo, fila a fila, sin
+cargarlo entero en memoria) y anota la importación en la tabla importaciones.
+Un hilo de fondo hashea las contraseñas e inserta los usuarios en
+transacciones de TAMANO_LOTE filas, actualizando el progreso tras cada lote;
+el panel consulta estado_importacion() hasta que termina. Cada fila rechazada
+se informa con su número de línea y el motivo.
+
+Columnas reconocidas (la primera fila es la cabecera):
+    nombre_completo (o nombre), email, password (opcional)
+
+Las contraseñas del CSV las eligió una persona y pueden ser fáciles de
+adivinar: se hashean con el coste normal (HASH_METODO). Las filas sin
+contraseña reciben una temporal generada al azar, que se hashea con el coste
+bajo de contrasenas.HASH_METODO_TEMPORAL y obliga a cambiarla en el primer
+login. Cada hash pide turno al limitador de contrasenas, así una importación
+no deja sin CPU a los logins.
+
+Los emails se guardan tal como vienen en el CSV (el login los compara
+exactamente); los repetidos se detectan sin distinguir mayúsculas.
+
+Las contraseñas generadas se entregan una sola vez: la primera consulta de la
+importación terminada las devuelve y se borran de la tabla.
+"""
+
+import csv
+import io
+import json
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from database import get_db_connection
+from contrasenas import generar_hash, generar_password_temporal, HASH_METODO_TEMPORAL, ServidorOcupado
+import filtro_emails
+
+TAMANO_LOTE = 500
+MAX_FILAS = 50000
+INTERRUMPIDA_TRAS = 300         # Segundos sin progreso tras los que se da por perdida (reinicio del worker)
+RETENCION_HORAS = 24            # Importaciones que se conservan para consultar su resultado
+EMAIL_VALIDO = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Una importación a la vez por proceso; las demás esperan su turno
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='importacion')
+
+
+def _validar(fila, linea, vistos):
+    nombre = (fila.get('nombre_completo') or fila.get('nombre') or '').strip()
+    email = (fila.get('email') or '').strip()
+    password = (fila.get('password') or '').strip()
+
+    if not nombre:
+        return None, 'Falta el nombre'
+    if not EMAIL_VALIDO.match(email):
+        return None, 'Email no válido'
+    if password and len(password) < 6:
+        return None, 'La contraseña debe tener al menos 6 caracteres'
+    if email.lower() in vistos:
+        return None, f'Email repetido (línea {vistos[email.lower()]})'
+    vistos[email.lower()] = linea
+    return {'linea': linea, 'nombre': nombre, 'email': email, 'password': password}, None
+
+
+def _emails_existentes(conn, emails):
+    # Sin distinguir mayúsculas, con el índice idx_usuarios_email_nocase
+    filas = conn.execute('SELECT email FROM usuarios WHERE email COLLATE NOCASE IN (SELECT value FROM json_each(?))',
+                         (json.dumps(list(emails)),)).fetchall()
+    return {fila['email'].lower() for fila in filas}
+
+
+def _hashear(password, metodo=None):
+    # En segundo plano no hay prisa: si el limitador está lleno, esperar otro turno
+    while True:
+        try:
+            return generar_hash(password, metodo)
+        except ServidorOcupado:
+            time.sleep(1)
+
+
+def _insertar_lote(conn, lote, creados, errores):
+    existentes = _emails_existentes(conn, (u['email'] for u in lote))
+    for usuario in lote:
+        if usuario['email'].lower() in existentes:
+            errores.append({'linea': usuario['linea'], 'email': usuario['email'], 'error': 'El email ya está registrado'})
+    lote = [u for u in lote if u['email'].lower() not in existentes]
+    if not lote:
+        return
+
+    for usuario in lote:
+        usuario['temporal'] = not usuario['password']
+        if usuario['temporal']:
+            usuario['password'] = generar_password_temporal()
+            usuario['hash'] = _hashear(usuario['password'], HASH_METODO_TEMPORAL)
+        else:
+            usuario['hash'] = _hashear(usuario['password'])
+
+    filas = [(u['nombre'], u['email'], u['hash'], 1 if u['temporal'] else 0) for u in lote]
+    try:
+        with conn:
+            conn.executemany('''
+                INSERT INTO usuarios (nombre_completo, email, password, es_admin, activo, requiere_cambio_password)
+                VALUES (?, ?, ?, 0, 1, ?)
+            ''', filas)
+        aceptados = lote
+    except sqlite3.IntegrityError:
+        # Alguien registró uno de estos emails entre la comprobación y el INSERT:
+        # repetir fila a fila para saber cuál
+        aceptados = []
+        for usuario, fila in zip(lote, filas):
+            try:
+                with conn:
+                    conn.execute('''
+                        INSERT INTO usuarios (nombre_completo, email, password, es_admin, activo, requiere_cambio_password)
+                        VALUES (?, ?, ?, 0, 1, ?)
+                    ''', fila)
+                aceptados.append(usuario)
+            except sqlite3.IntegrityError:
+                errores.append({'linea': usuario['linea'], 'email': usuario['email'], 'error': 'El email ya está registrado'})
+
+    for usuario in aceptados:
+        filtro_emails.agregar(usuario['email'])
+        creados.append({
+            'linea': usuario['linea'],
+            'nombre': usuario['nombre'],
+            'email': usuario['email'],
+            # Solo se devuelven las contraseñas generadas, para repartirlas
+            'password_temporal': usuario['password'] if usuario['temporal'] else None
+        })
+
+
+def leer_csv(flujo, codificacion='utf-8-sig'):
+    """
+    Leer y validar un CSV de usuarios (sin tocar la base de datos)
+
+    Args:
+        flujo: Archivo binario (por ejemplo, request.files['archivo'].stream)
+        codificacion (str): utf-8-sig acepta también los CSV guardados por Excel
+
+    Returns:
+        tuple (usuarios válidos, errores: lista de {linea, email, error})
+    """
+    texto = io.TextIOWrapper(flujo, encoding=codificacion, errors='replace', newline='')
+    muestra = texto.read(4096)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.DictReader(_encadenar(muestra, texto), dialect=dialecto)
+    if lector.fieldnames:
+        lector.fieldnames = [campo.strip().lower() for campo in lector.fieldnames]
+
+    usuarios, errores, vistos = [], [], {}
+    for numero, fila in enumerate(lector):
+        linea = lector.line_num
+        if numero >= MAX_FILAS:
+            errores.append({'linea': linea, 'email': None, 'error': f'Se superó el máximo de {MAX_FILAS} filas'})
+            break
+        usuario, error = _validar(fila, linea, vistos)
+        if error:
+            errores.append({'linea': linea, 'email': (fila.get('email') or '').strip() or None, 'error': error})
+            continue
+        usuarios.append(usuario)
+    return usuarios, errores
+
+
+def _procesar(importacion_id, usuarios, errores, al_crear):
+    creados = []
+    conn = get_db_connection()
+    try:
+        for inicio in range(0, len(usuarios), TAMANO_LOTE):
+            nuevos = len(creados)
+            _insertar_lote(conn, usuarios[inicio:inicio + TAMANO_LOTE], creados, errores)
+            if al_crear and len(creados) > nuevos:
+                al_crear(creados[nuevos:])
+            with conn:
+                conn.execute('''
+                    UPDATE importaciones SET procesados = ?, creados = ?, actualizada = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (min(inicio + TAMANO_LOTE, len(usuarios)), len(creados), importacion_id))
+        estado = 'terminada'
+    except Exception as e:
+        print(f"❌ Error en la importación {importacion_id}: {e}")
+        errores.append({'linea': None, 'email': None, 'error': f'La importación se interrumpió: {e}'})
+        estado = 'fallida'
+
+    errores.sort(key=lambda e: e['linea'] or 0)
+    credenciales = [{'email': u['email'], 'password': u['password_temporal']}
+                    for u in creados if u['password_temporal']]
+    with conn:
+        conn.execute('''
+            UPDATE importaciones
+            SET estado = ?, creados = ?, errores = ?, credenciales = ?, actualizada = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (estado, len(creados), json.dumps(errores), json.dumps(credenciales), importacion_id))
+    conn.close()
+
+
+def iniciar_importacion(flujo, al_crear=None):
+    """
+    Validar un CSV y crear sus usuarios en segundo plano
+
+    Args:
+        flujo: Archivo binario del CSV
+        al_crear: función opcional llamada (en el hilo de fondo) con cada lote de usuarios creados
+
+    Returns:
+        dict con id, total (filas válidas) y errores de validación
+    """
+    usuarios, errores = leer_csv(flujo)
+
+    conn = get_db_connection()
+    conn.execute("DELETE FROM importaciones WHERE creada < datetime('now', ?)", (f'-{RETENCION_HORAS} hours',))
+    cursor = conn.execute('INSERT INTO importaciones (total, errores) VALUES (?, ?)',
+                          (len(usuarios), json.dumps(errores)))
+    importacion_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+
+    _executor.submit(_procesar, importacion_id, usuarios, errores, al_crear)
+    return {'id': importacion_id, 'total': len(usuarios), 'errores': errores}
+
+
+def estado_importacion(importacion_id):
+    """
+    Progreso de una importación; al terminar, su resultado
+
+    Las contraseñas generadas se devuelven solo en la primera consulta tras terminar.
+
+    Returns:
+        dict con estado, total, procesados, creados, errores y credenciales, o None si no existe
+    """
+    conn = get_db_connection()
+    fila = conn.execute('''
+        SELECT *, (julianday('now') - julianday(actualizada)) * 86400 AS segundos_sin_progreso
+        FROM importaciones WHERE id = ?
+    ''', (importacion_id,)).fetchone()
+    if not fila:
+        conn.close()
+        return None
+
+    estado = fila['estado']
+    if estado == 'procesando' and fila['segundos_sin_progreso'] > INTERRUMPIDA_TRAS:
+        # El proceso que la ejecutaba se reinició: lo ya creado queda, el resto no se importó
+        estado = 'interrumpida'
+
+    credenciales = []
+    if fila['credenciales'] is not None:
+        credenciales = json.loads(fila['credenciales'])
+        conn.execute('UPDATE importaciones SET credenciales = NULL WHERE id = ?', (importacion_id,))
+        conn.commit()
+    conn.close()
+
+    return {
+        'estado': estado,
+        'total': fila['total'],
+        'procesados': fila['procesados'],
+        'creados': fila['creados'],
+        'errores': json.loads(fila['errores'] or '[]'),
+        'credenciales': credenciales,
+    }
+
+
+def _encadenar(muestra, resto):
+    # Volver a juntar la muestra leída para detectar el separador con el resto del flujo
+    yield from io.StringIO(muestra + resto.readline())
+    yield from resto
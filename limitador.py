@@ -0,0 +1,181 @@
+"""
+Limitación de intentos de login con token buckets compartidos entre workers.
+
+Los buckets viven en una base SQLite aparte (instance/limites.db) en modo WAL
+y sin fsync, así todos los workers de gunicorn ven los mismos contadores sin
+competir con la base principal. Cuando una clave queda bloqueada, el worker
+lo recuerda en memoria hasta que vuelva a tener un token: los siguientes
+rechazos no tocan SQLite ni calculan ningún hash.
+
+Solo cuestan tokens los intentos fallidos: antes de verificar la contraseña
+se comprueba (sin gastar) que queden tokens, y login_fallido() los descuenta.
+Así una clase entera detrás de la misma IP (NAT del colegio) puede entrar a
+la vez, y nadie bloquea una cuenta ajena solo por enviar su email.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+LIMITES_DB_PATH = os.path.join('instance', 'limites.db')
+
+# (capacidad, tokens repuestos por segundo)
+LIMITE_IP = (50, 50 / 300)        # 50 intentos fallidos, se reponen en 5 minutos
+LIMITE_CUENTA = (5, 5 / 900)      # 5 intentos fallidos por cuenta, se reponen en 15 minutos
+
+MAX_BLOQUEOS_LOCALES = 10000
+
+_local = threading.local()
+_bloqueos = {}      # clave -> instante en que vuelve a haber un token
+_contador = 0
+
+
+def _conexion():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(LIMITES_DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(LIMITES_DB_PATH, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # Perder unos contadores en un corte de luz es aceptable
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                clave TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                actualizado REAL NOT NULL
+            )
+        ''')
+        _local.conn = conn
+    return conn
+
+
+def _tokens(conn, clave, limite, ahora):
+    capacidad, tasa = limite
+    fila = conn.execute('SELECT tokens, actualizado FROM buckets WHERE clave = ?', (clave,)).fetchone()
+    if fila:
+        return min(capacidad, fila[0] + (ahora - fila[1]) * tasa)
+    return capacidad
+
+
+def _bloquear(clave, limite, tokens, ahora):
+    espera = (1 - tokens) / limite[1]
+    if len(_bloqueos) >= MAX_BLOQUEOS_LOCALES:
+        _bloqueos.clear()
+    _bloqueos[clave] = ahora + espera
+    return espera
+
+
+def _bloqueo_local(clave, ahora):
+    hasta = _bloqueos.get(clave)
+    if hasta is not None:
+        if hasta > ahora:
+            return hasta - ahora
+        _bloqueos.pop(clave, None)
+    return None
+
+
+def disponible(clave, limite):
+    """
+    Comprobar, sin gastarlo, si el bucket de una clave tiene un token
+
+    Returns:
+        tuple (permitido: bool, segundos hasta el próximo token)
+    """
+    ahora = time.time()
+    espera = _bloqueo_local(clave, ahora)
+    if espera is not None:
+        return False, espera
+
+    tokens = _tokens(_conexion(), clave, limite, ahora)
+    if tokens >= 1:
+        return True, 0
+    return False, _bloquear(clave, limite, tokens, ahora)
+
+
+def consumir(clave, limite):
+    """
+    Intentar consumir un token del bucket de una clave
+
+    Args:
+        clave (str): Por ejemplo 'ip:1.2.3.4' o 'cuenta:ana@x.com'
+        limite (tuple): (capacidad, tokens por segundo)
+
+    Returns:
+        tuple (permitido: bool, segundos hasta el próximo token)
+    """
+    global _contador
+    ahora = time.time()
+
+    # Rechazo rápido: bloqueo ya conocido por este worker
+    espera = _bloqueo_local(clave, ahora)
+    if espera is not None:
+        return False, espera
+
+    conn = _conexion()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        tokens = _tokens(conn, clave, limite, ahora)
+        permitido = tokens >= 1
+        if permitido:
+            tokens -= 1
+        conn.execute('INSERT OR REPLACE INTO buckets (clave, tokens, actualizado) VALUES (?, ?, ?)',
+                     (clave, tokens, ahora))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+    _contador += 1
+    if _contador % 1000 == 0:
+        _purgar(ahora)
+
+    if permitido:
+        return True, 0
+    return False, _bloquear(clave, limite, tokens, ahora)
+
+
+def reiniciar(clave):
+    """Vaciar el contador de una clave (por ejemplo, tras un login correcto)"""
+    _bloqueos.pop(clave, None)
+    _conexion().execute('DELETE FROM buckets WHERE clave = ?', (clave,))
+
+
+def _purgar(ahora):
+    # Un bucket que ya se habría llenado de nuevo equivale a no tener fila
+    tiempo_lleno = max(c / t for c, t in (LIMITE_IP, LIMITE_CUENTA))
+    _conexion().execute('DELETE FROM buckets WHERE actualizado < ?', (ahora - tiempo_lleno,))
+
+
+def _clave_cuenta(email):
+    return f'cuenta:{email.strip().lower()}'
+
+
+def permitir_login(ip, email):
+    """
+    Comprobar los límites por IP y por cuenta antes de verificar la contraseña
+
+    No gasta tokens: solo los intentos fallidos cuentan (ver login_fallido).
+
+    Returns:
+        tuple (permitido: bool, segundos de espera)
+    """
+    permitido, espera = disponible(f'ip:{ip}', LIMITE_IP)
+    if not permitido:
+        return False, espera
+    if email:
+        return disponible(_clave_cuenta(email), LIMITE_CUENTA)
+    return True, 0
+
+
+def login_fallido(ip, email):
+    """Descontar el intento fallido de los buckets de la IP y de la cuenta"""
+    consumir(f'ip:{ip}', LIMITE_IP)
+    if email:
+        consumir(_clave_cuenta(email), LIMITE_CUENTA)
+
+
+def login_correcto(email):
+    """No penalizar a la cuenta por los intentos fallidos anteriores"""
+    if email:
+        reiniciar(_clave_cuenta(email))
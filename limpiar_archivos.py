@@ -0,0 +1,27 @@
+"""
+Recolector de archivos huérfanos en static/uploads.
+
+Borra las fotos de perfil y PDFs que ya no están referenciados por
+usuarios.foto_perfil ni por contenido_pdf.ruta_archivo.
+
+Uso:
+    python limpiar_archivos.py            # elimina los huérfanos
+    python limpiar_archivos.py --simular  # solo los lista
+"""
+
+import os
+import sys
+from almacenamiento import recolectar_huerfanos
+
+def limpiar(simular=False):
+    print("🧹 Buscando archivos sin referencias...")
+    huerfanos, bytes_liberados = recolectar_huerfanos(simular=simular)
+
+    for ruta in huerfanos:
+        print(f"   {'(simulado) ' if simular else ''}🗑️  {os.path.basename(ruta)}")
+
+    accion = "se liberarían" if simular else "liberados"
+    print(f"✅ {len(huerfanos)} archivos huérfanos, {bytes_liberados / 1024:.1f} KB {accion}.")
+
+if __name__ == '__main__':
+    limpiar(simular='--simular' in sys.argv)
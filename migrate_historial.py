@@ -0,0 +1,28 @@
+from database import get_db_connection
+
+COLUMNAS = [
+    ('respuestas_totales', 'INTEGER DEFAULT 0'),
+    ('respuestas_acertadas', 'INTEGER DEFAULT 0'),
+    ('tiempo_respuesta_ms', 'INTEGER DEFAULT 0'),
+]
+
+def migrate():
+    print("Iniciando migración para el historial de intentos...")
+    conn = get_db_connection()
+    for columna, tipo in COLUMNAS:
+        try:
+            # Totales agregados desde respuestas_ejercicio (ver historial.py)
+            conn.execute(f'ALTER TABLE progreso_usuario ADD COLUMN {columna} {tipo}')
+            print(f"✅ Columna '{columna}' agregada exitosamente")
+        except Exception as e:
+            if 'duplicate column name' in str(e).lower():
+                print(f"ℹ️ La columna '{columna}' ya existe")
+            else:
+                print(f"❌ Error al agregar columna: {e}")
+            
+    conn.commit()
+    conn.close()
+    print("Migración completada. Las tablas nuevas se crean al iniciar la aplicación.")
+
+if __name__ == '__main__':
+    migrate()
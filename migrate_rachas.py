@@ -0,0 +1,29 @@
+
+from database import get_db_connection
+
+COLUMNAS = [
+    ('zona_horaria', 'TEXT'),
+    ('ultimo_dia_actividad', 'TEXT'),
+]
+
+def migrate():
+    print("Iniciando migración para las rachas de días...")
+    conn = get_db_connection()
+    for columna, tipo in COLUMNAS:
+        try:
+            # Zona horaria del usuario y último día (local) con actividad (ver rachas.py)
+            conn.execute(f'ALTER TABLE usuarios ADD COLUMN {columna} {tipo}')
+            print(f"✅ Columna '{columna}' agregada exitosamente")
+        except Exception as e:
+            if 'duplicate column name' in str(e).lower():
+                print(f"ℹ️ La columna '{columna}' ya existe")
+            else:
+                print(f"❌ Error al agregar columna: {e}")
+    
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_racha ON usuarios (ultimo_dia_actividad) WHERE racha_dias > 0')
+    conn.commit()
+    conn.close()
+    print("Migración completada.")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,22 @@
+from database import get_db_connection
+
+def migrate():
+    print("Iniciando migración para la versión de progreso...")
+    conn = get_db_connection()
+    try:
+        # Se incrementa con cada cambio de progreso o de perfil; forma parte del ETag
+        # de /dashboard, /calificaciones y /certificado
+        conn.execute('ALTER TABLE usuarios ADD COLUMN version_progreso INTEGER DEFAULT 0')
+        print("✅ Columna 'version_progreso' agregada exitosamente")
+    except Exception as e:
+        if 'duplicate column name' in str(e).lower():
+            print("ℹ️ La columna 'version_progreso' ya existe")
+        else:
+            print(f"❌ Error al agregar columna: {e}")
+            
+    conn.commit()
+    conn.close()
+    print("Migración completada.")
+
+if __name__ == '__main__':
+    migrate()
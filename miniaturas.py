@@ -0,0 +1,143 @@
+"""
+Miniaturas de fotos de perfil.
+
+Cada foto se decodifica una sola vez y se re-codifica a unos pocos tamaños
+cuadrados, en WebP y en un formato de respaldo (JPEG, o PNG si la imagen
+tiene transparencia). El trabajo se hace en un hilo de fondo para no
+retrasar la respuesta de /perfil.
+
+Las variantes se guardan como "<nombre>_<tamaño>.<ext>" en
+static/uploads/perfiles/miniaturas.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from almacenamiento import PERFILES_FOLDER, MINIATURAS_FOLDER
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Tamaños en píxeles (lado del cuadrado). 96 cubre los avatares de 35-48px
+# en pantallas de alta densidad; 256 la foto grande de /perfil.
+TAMANOS = (48, 96, 256)
+CALIDAD_WEBP = 80
+CALIDAD_JPEG = 85
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='miniaturas')
+_pendientes = set()
+_lock = threading.Lock()
+
+
+def _base(nombre):
+    return nombre.rsplit('.', 1)[0]
+
+
+def elegir_tamano(solicitado):
+    """Devuelve el tamaño más pequeño que cubre el solicitado"""
+    for tamano in TAMANOS:
+        if solicitado <= tamano:
+            return tamano
+    return TAMANOS[-1]
+
+
+def buscar_variante(nombre, tamano, acepta_webp=False):
+    """
+    Busca una miniatura ya generada.
+
+    Returns:
+        str o None: Nombre del archivo dentro de MINIATURAS_FOLDER
+    """
+    extensiones = ('webp', 'jpg', 'png') if acepta_webp else ('jpg', 'png')
+    for ext in extensiones:
+        variante = f"{_base(nombre)}_{tamano}.{ext}"
+        if os.path.exists(os.path.join(MINIATURAS_FOLDER, variante)):
+            return variante
+    return None
+
+
+def generar_miniaturas(nombre):
+    """
+    Genera todas las variantes de una foto de perfil.
+
+    Returns:
+        list: Nombres de las variantes escritas
+    """
+    if Image is None:
+        return []
+
+    ruta = os.path.join(PERFILES_FOLDER, nombre)
+    if not os.path.exists(ruta):
+        return []
+
+    os.makedirs(MINIATURAS_FOLDER, exist_ok=True)
+    generadas = []
+
+    with Image.open(ruta) as original:
+        # Decodificar una sola vez (primer fotograma en GIFs) y respetar la orientación EXIF
+        imagen = ImageOps.exif_transpose(original)
+        tiene_alfa = imagen.mode in ('RGBA', 'LA') or 'transparency' in imagen.info
+        imagen = imagen.convert('RGBA' if tiene_alfa else 'RGB')
+
+        # Ir reduciendo de mayor a menor reutilizando el resultado anterior
+        for tamano in sorted(TAMANOS, reverse=True):
+            imagen = ImageOps.fit(imagen, (tamano, tamano), Image.LANCZOS)
+            base = os.path.join(MINIATURAS_FOLDER, f"{_base(nombre)}_{tamano}")
+
+            imagen.save(f"{base}.webp", 'WEBP', quality=CALIDAD_WEBP, method=4)
+            generadas.append(f"{_base(nombre)}_{tamano}.webp")
+
+            if tiene_alfa:
+                imagen.save(f"{base}.png", 'PNG', optimize=True)
+                generadas.append(f"{_base(nombre)}_{tamano}.png")
+            else:
+                imagen.save(f"{base}.jpg", 'JPEG', quality=CALIDAD_JPEG, optimize=True, progressive=True)
+                generadas.append(f"{_base(nombre)}_{tamano}.jpg")
+
+    return generadas
+
+
+def _generar_en_fondo(nombre):
+    try:
+        generar_miniaturas(nombre)
+    except Exception as e:
+        print(f"❌ Error al generar miniaturas de {nombre}: {e}")
+    finally:
+        with _lock:
+            _pendientes.discard(nombre)
+
+
+def programar_miniaturas(nombre):
+    """Encola la generación de miniaturas sin bloquear la petición actual"""
+    if Image is None or not nombre:
+        return
+    with _lock:
+        if nombre in _pendientes:
+            return
+        _pendientes.add(nombre)
+    _executor.submit(_generar_en_fondo, nombre)
+
+
+def eliminar_miniaturas(nombre):
+    """Elimina las variantes de una foto que ya se borró del disco"""
+    if not nombre or not os.path.isdir(MINIATURAS_FOLDER):
+        return
+    prefijo = f"{_base(nombre)}_"
+    for variante in os.listdir(MINIATURAS_FOLDER):
+        if variante.startswith(prefijo) and variante[len(prefijo):].split('.', 1)[0].isdigit():
+            os.remove(os.path.join(MINIATURAS_FOLDER, variante))
+
+
+if __name__ == '__main__':
+    # Generar miniaturas de las fotos existentes que aún no las tienen
+    from almacenamiento import obtener_referenciados
+
+    if Image is None:
+        print("❌ Pillow no está instalado: pip install Pillow")
+    else:
+        for nombre in sorted(obtener_referenciados()):
+            if os.path.exists(os.path.join(PERFILES_FOLDER, nombre)) and not buscar_variante(nombre, TAMANOS[0]):
+                print(f"🖼️  {nombre}: {len(generar_miniaturas(nombre))} variantes")
+        print("✅ Miniaturas actualizadas.")
@@ -1,12 +1,27 @@
-from werkzeug.security import generate_password_hash, check_password_hash
+import json
+import sqlite3
+import time
 from database import get_db_connection
+from contrasenas import generar_hash, verificar_hash, necesita_rehash, ServidorOcupado
+import filtro_emails
+import clasificacion
 
 class Usuario:
+    # Caché por worker de usuarios autenticados: {usuario_id: (expira, fila)}
+    # Se invalida en las escrituras de este worker; en los demás caduca tras CACHE_TTL.
+    CACHE_TTL = 15
+    CACHE_MAX = 10000
+    _cache = {}
+
+    # Columnas de los listados de administración (sin el hash de la contraseña)
+    COLUMNAS_LISTADO = 'id, nombre_completo, email, fecha_registro, racha_dias, puntos_totales, es_admin, activo, foto_perfil'
+    POR_PAGINA = 50
+
     @staticmethod
     def crear(nombre_completo, email, password, es_admin=0, activo=1):
         conn = get_db_connection()
         cursor = conn.cursor()
-        password_hash = generate_password_hash(password)
+        password_hash = generar_hash(password)
         
         try:
             cursor.execute('INSERT INTO usuarios (nombre_completo, email, password, es_admin, activo, requiere_cambio_password) VALUES (?, ?, ?, ?, ?, ?)', 
@@ -14,6 +29,7 @@ class Usuario:
             usuario_id = cursor.lastrowid
             conn.commit()
             conn.close()
+            filtro_emails.agregar(email)
             return usuario_id
         except Exception as e:
             print(f"Error al crear usuario: {e}")
@@ -27,6 +43,13 @@ class Usuario:
         conn.close()
         return usuario
     
+    @staticmethod
+    def existe_email(email):
+        """Comprueba si un email está registrado; solo consulta la BD si el filtro de Bloom no lo descarta"""
+        if not filtro_emails.puede_existir(email):
+            return False
+        return Usuario.obtener_por_email(email) is not None
+    
     @staticmethod
     def obtener_por_id(usuario_id):
         conn = get_db_connection()
@@ -34,44 +57,241 @@ class Usuario:
         conn.close()
         return usuario
     
+    @staticmethod
+    def obtener_en_cache(usuario_id):
+        """Obtiene un usuario por ID reutilizando la lectura de los últimos segundos"""
+        ahora = time.monotonic()
+        entrada = Usuario._cache.get(usuario_id)
+        if entrada and entrada[0] > ahora:
+            return entrada[1]
+        
+        usuario = Usuario.obtener_por_id(usuario_id)
+        if usuario:
+            if len(Usuario._cache) >= Usuario.CACHE_MAX:
+                Usuario._cache.clear()
+            Usuario._cache[usuario_id] = (ahora + Usuario.CACHE_TTL, usuario)
+        return usuario
+    
+    @staticmethod
+    def invalidar_cache(usuario_id):
+        Usuario._cache.pop(usuario_id, None)
+    
     @staticmethod
     def verificar_password(email, password):
         usuario = Usuario.obtener_por_email(email)
-        if usuario and check_password_hash(usuario['password'], password):
+        if usuario and verificar_hash(usuario['password'], password):
+            # Actualizar hashes guardados con parámetros antiguos ahora que conocemos la contraseña
+            if necesita_rehash(usuario['password']):
+                try:
+                    nuevo_hash = generar_hash(password)
+                except ServidorOcupado:
+                    # La contraseña ya es correcta: el re-hash puede esperar al próximo login
+                    return usuario
+                conn = get_db_connection()
+                conn.execute('UPDATE usuarios SET password = ? WHERE id = ?', (nuevo_hash, usuario['id']))
+                conn.commit()
+                conn.close()
+                Usuario.invalidar_cache(usuario['id'])
             return usuario
         return None
 
     @staticmethod
     def obtener_todos():
         conn = get_db_connection()
-        usuarios = conn.execute('SELECT * FROM usuarios ORDER BY fecha_registro DESC').fetchall()
+        usuarios = conn.execute(f'SELECT {Usuario.COLUMNAS_LISTADO} FROM usuarios ORDER BY fecha_registro DESC, id DESC').fetchall()
         conn.close()
         return usuarios
 
+    @staticmethod
+    def _filtro_busqueda(busqueda):
+        """Condición de búsqueda por prefijo de nombre o email, resuelta con índices NOCASE"""
+        busqueda = (busqueda or '').strip()
+        if not busqueda:
+            return '', []
+        # Rango [prefijo, prefijo + U+10FFFF): equivale a LIKE 'prefijo%' pero usa el índice
+        fin = busqueda + '\U0010ffff'
+        condicion = ('((nombre_completo >= ? COLLATE NOCASE AND nombre_completo < ? COLLATE NOCASE)'
+                     ' OR (email >= ? COLLATE NOCASE AND email < ? COLLATE NOCASE))')
+        return condicion, [busqueda, fin, busqueda, fin]
+
+    @staticmethod
+    def listar_pagina(cursor=None, busqueda=None, limite=None):
+        """
+        Página de usuarios ordenada por fecha de registro (más recientes primero)
+
+        Paginación por clave: en lugar de OFFSET se continúa después del último
+        (fecha_registro, id) visto, así cada página cuesta lo mismo sin importar
+        lo lejos que esté.
+
+        Args:
+            cursor (str): Valor 'siguiente' devuelto por la página anterior
+            busqueda (str): Prefijo del nombre o del email
+            limite (int): Usuarios por página (máximo 200)
+
+        Returns:
+            tuple (lista de usuarios, cursor de la página siguiente o None)
+        """
+        limite = max(1, min(limite or Usuario.POR_PAGINA, 200))
+        condiciones, parametros = [], []
+
+        condicion, valores = Usuario._filtro_busqueda(busqueda)
+        if condicion:
+            condiciones.append(condicion)
+            parametros.extend(valores)
+
+        if cursor:
+            try:
+                fecha, ultimo_id = cursor.rsplit('|', 1)
+                ultimo_id = int(ultimo_id)
+            except ValueError:
+                fecha = None
+            if fecha is not None:
+                condiciones.append('(fecha_registro, id) < (?, ?)')
+                parametros.extend([fecha, ultimo_id])
+
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        conn = get_db_connection()
+        usuarios = conn.execute(f'''
+            SELECT {Usuario.COLUMNAS_LISTADO} FROM usuarios
+            {where}
+            ORDER BY fecha_registro DESC, id DESC
+            LIMIT ?
+        ''', parametros + [limite + 1]).fetchall()
+        conn.close()
+
+        siguiente = None
+        if len(usuarios) > limite:
+            usuarios = usuarios[:limite]
+            siguiente = f"{usuarios[-1]['fecha_registro']}|{usuarios[-1]['id']}"
+        return usuarios, siguiente
+
+    @staticmethod
+    def contar(busqueda=None):
+        """Número de usuarios (que coinciden con la búsqueda, si se indica)"""
+        condicion, parametros = Usuario._filtro_busqueda(busqueda)
+        where = f'WHERE {condicion}' if condicion else ''
+        conn = get_db_connection()
+        total = conn.execute(f'SELECT COUNT(*) FROM usuarios {where}', parametros).fetchone()[0]
+        conn.close()
+        return total
+
     @staticmethod
     def actualizar_estado(usuario_id, activo):
         conn = get_db_connection()
         conn.execute('UPDATE usuarios SET activo = ? WHERE id = ?', (1 if activo else 0, usuario_id))
         conn.commit()
         conn.close()
+        Usuario.invalidar_cache(usuario_id)
+        # Las cuentas desactivadas no aparecen en la clasificación
+        if activo:
+            clasificacion.actualizar_usuario(usuario_id)
+        else:
+            clasificacion.retirar_usuarios([usuario_id])
+
+    @staticmethod
+    def actualizar_estado_varios(usuario_ids, activo, excluir=None):
+        """
+        Activar o desactivar un conjunto de usuarios con una sola sentencia
+
+        Args:
+            usuario_ids (list): IDs de los usuarios
+            activo (bool): Nuevo estado
+            excluir (int): ID que no se debe tocar (el del propio administrador)
+
+        Returns:
+            list: IDs realmente modificados
+        """
+        conn = get_db_connection()
+        filas = conn.execute('''
+            UPDATE usuarios SET activo = ?
+            WHERE id IN (SELECT value FROM json_each(?)) AND id IS NOT ? AND activo != ?
+            RETURNING id
+        ''', (1 if activo else 0, json.dumps(list(usuario_ids)), excluir, 1 if activo else 0)).fetchall()
+        conn.commit()
+        conn.close()
+        modificados = [fila['id'] for fila in filas]
+        for usuario_id in modificados:
+            Usuario.invalidar_cache(usuario_id)
+        if activo:
+            for usuario_id in modificados:
+                clasificacion.actualizar_usuario(usuario_id)
+        else:
+            clasificacion.retirar_usuarios(modificados)
+        return modificados
+
+    @staticmethod
+    def restablecer_password_varios(usuario_ids, password):
+        """
+        Asignar la misma contraseña a varios usuarios y obligarles a cambiarla
+
+        Se calcula un único hash y se aplica con una sola sentencia.
+
+        Returns:
+            list: IDs modificados
+        """
+        password_hash = generar_hash(password)
+        conn = get_db_connection()
+        filas = conn.execute('''
+            UPDATE usuarios SET password = ?, requiere_cambio_password = 1
+            WHERE id IN (SELECT value FROM json_each(?))
+            RETURNING id
+        ''', (password_hash, json.dumps(list(usuario_ids)))).fetchall()
+        conn.commit()
+        conn.close()
+        modificados = [fila['id'] for fila in filas]
+        for usuario_id in modificados:
+            Usuario.invalidar_cache(usuario_id)
+        return modificados
 
     @staticmethod
     def admin_cambiar_password(usuario_id, password):
+        password_hash = generar_hash(password)
         conn = get_db_connection()
-        password_hash = generate_password_hash(password)
         conn.execute('UPDATE usuarios SET password = ? WHERE id = ?', (password_hash, usuario_id))
         conn.commit()
         conn.close()
+        Usuario.invalidar_cache(usuario_id)
 
     @staticmethod
     def actualizar_datos(usuario_id, email, foto_perfil=None):
+        """
+        Actualiza email y foto de perfil
+
+        Returns:
+            bool: False si el email ya lo usa otra cuenta (no se cambia nada)
+        """
         conn = get_db_connection()
-        if foto_perfil:
-            conn.execute('UPDATE usuarios SET email = ?, foto_perfil = ? WHERE id = ?', (email, foto_perfil, usuario_id))
-        else:
-            conn.execute('UPDATE usuarios SET email = ? WHERE id = ?', (email, usuario_id))
+        try:
+            if foto_perfil:
+                conn.execute('UPDATE usuarios SET email = ?, foto_perfil = ? WHERE id = ?', (email, foto_perfil, usuario_id))
+            else:
+                conn.execute('UPDATE usuarios SET email = ? WHERE id = ?', (email, usuario_id))
+        except sqlite3.IntegrityError:
+            conn.close()
+            return False
+        Usuario.incrementar_version_progreso(usuario_id, conn)
         conn.commit()
         conn.close()
+        filtro_emails.agregar(email)
+        Usuario.invalidar_cache(usuario_id)
+        return True
+
+    @staticmethod
+    def incrementar_version_progreso(usuario_id, conn):
+        """Invalida los ETag de sus páginas de progreso (dentro de la transacción de quien llama)"""
+        conn.execute('UPDATE usuarios SET version_progreso = COALESCE(version_progreso, 0) + 1 WHERE id = ?',
+                     (usuario_id,))
+
+    @staticmethod
+    def obtener_validador(usuario_id):
+        """Lo mínimo para calcular el ETag de sus páginas de progreso (sin pasar por la caché)"""
+        conn = get_db_connection()
+        usuario = conn.execute('''
+            SELECT id, version_progreso, racha_dias, ultimo_dia_actividad, zona_horaria
+            FROM usuarios WHERE id = ?
+        ''', (usuario_id,)).fetchone()
+        conn.close()
+        return usuario
 
     @staticmethod
     def marcar_cambio_password(usuario_id, requiere=True):
@@ -79,6 +299,15 @@ class Usuario:
         conn.execute('UPDATE usuarios SET requiere_cambio_password = ? WHERE id = ?', (1 if requiere else 0, usuario_id))
         conn.commit()
         conn.close()
+        Usuario.invalidar_cache(usuario_id)
+
+    @staticmethod
+    def actualizar_zona_horaria(usuario_id, zona):
+        conn = get_db_connection()
+        conn.execute('UPDATE usuarios SET zona_horaria = ? WHERE id = ?', (zona, usuario_id))
+        conn.commit()
+        conn.close()
+        Usuario.invalidar_cache(usuario_id)
 
 class Unidad:
     @staticmethod
@@ -118,6 +347,22 @@ class Leccion:
         conn.close()
         return leccion
 
+    @staticmethod
+    def obtener_siguiente(leccion_id):
+        """Obtiene la lección que sigue en el curso: la siguiente de la unidad o la primera de la siguiente unidad"""
+        conn = get_db_connection()
+        leccion = conn.execute('''
+            SELECT l.* FROM lecciones l
+            JOIN unidades u ON u.id = l.unidad_id
+            JOIN lecciones actual ON actual.id = ?
+            JOIN unidades ua ON ua.id = actual.unidad_id
+            WHERE (u.orden, l.orden) > (ua.orden, actual.orden)
+            ORDER BY u.orden, l.orden
+            LIMIT 1
+        ''', (leccion_id,)).fetchone()
+        conn.close()
+        return leccion
+
 class Ejercicio:
     @staticmethod
     def obtener_por_leccion(leccion_id):
@@ -156,6 +401,120 @@ class Progreso:
         conn.close()
         return progreso
     
+    @staticmethod
+    def iterar_progreso_estudiantes(tamano_lote=200):
+        """
+        Progreso de todos los estudiantes, de lote en lote (para páginas en streaming)
+
+        Genera lo mismo que obtener_progreso_usuario, obtener_progreso_unidades,
+        obtener_estadisticas y calcular_promedio_final para cada estudiante, pero
+        con dos consultas por lote en lugar de cuatro por estudiante. Solo hay un
+        lote en memoria a la vez.
+
+        Yields:
+            dict con usuario, progreso, progreso_unidades, promedio_final y stats
+        """
+        conn = get_db_connection()
+        try:
+            lecciones = conn.execute('''
+                SELECT l.*, u.numero as unidad_numero
+                FROM lecciones l
+                LEFT JOIN unidades u ON l.unidad_id = u.id
+                ORDER BY u.orden, l.orden
+            ''').fetchall()
+            unidades = conn.execute('SELECT id, numero, titulo, orden FROM unidades ORDER BY orden').fetchall()
+
+            # Mismo orden que Usuario.obtener_todos, por clave (fecha_registro, id)
+            condicion, parametros = '', []
+            while True:
+                usuarios = conn.execute(f'''
+                    SELECT {Usuario.COLUMNAS_LISTADO} FROM usuarios
+                    WHERE es_admin = 0 {condicion}
+                    ORDER BY fecha_registro DESC, id DESC
+                    LIMIT ?
+                ''', parametros + [tamano_lote]).fetchall()
+                if not usuarios:
+                    return
+                ultimo = usuarios[-1]
+                condicion, parametros = 'AND (fecha_registro, id) < (?, ?)', [ultimo['fecha_registro'], ultimo['id']]
+
+                por_usuario = {}
+                for fila in conn.execute('''
+                    SELECT usuario_id, leccion_id, completada, calificacion, aprobada, intentos
+                    FROM progreso_usuario
+                    WHERE usuario_id IN (SELECT value FROM json_each(?))
+                ''', (json.dumps([u['id'] for u in usuarios]),)):
+                    por_usuario.setdefault(fila['usuario_id'], {})[fila['leccion_id']] = fila
+
+                for usuario in usuarios:
+                    yield Progreso._resumen_estudiante(usuario, lecciones, unidades, por_usuario.get(usuario['id'], {}))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _resumen_estudiante(usuario, lecciones, unidades, progreso_lecciones):
+        progreso = []
+        por_unidad = {unidad['id']: {'total': 0, 'aprobadas': 0, 'notas': []} for unidad in unidades}
+        aprobadas = completadas = 0
+        notas = []
+        for leccion in lecciones:
+            fila = progreso_lecciones.get(leccion['id'])
+            item = dict(leccion)
+            item.update({
+                'completada': fila['completada'] if fila else None,
+                'calificacion': fila['calificacion'] if fila else None,
+                'aprobada': fila['aprobada'] if fila else None,
+                'intentos': fila['intentos'] if fila else None,
+            })
+            progreso.append(item)
+
+            unidad = por_unidad.get(leccion['unidad_id'])
+            if unidad is not None:
+                unidad['total'] += 1
+            if not fila:
+                continue
+            if fila['aprobada'] == 1:
+                aprobadas += 1
+                if unidad is not None:
+                    unidad['aprobadas'] += 1
+            if fila['completada'] == 1:
+                completadas += 1
+            if fila['calificacion'] and fila['calificacion'] > 0:
+                notas.append(fila['calificacion'])
+                if unidad is not None:
+                    unidad['notas'].append(fila['calificacion'])
+
+        progreso_unidades = []
+        for unidad in unidades:
+            datos = por_unidad[unidad['id']]
+            progreso_unidades.append({
+                'unidad_id': unidad['id'],
+                'numero': unidad['numero'],
+                'titulo': unidad['titulo'],
+                'orden': unidad['orden'],
+                'total_lecciones': datos['total'],
+                'lecciones_aprobadas': datos['aprobadas'],
+                'promedio_unidad': sum(datos['notas']) / len(datos['notas']) if datos['notas'] else 0,
+                'unidad_completada': 1 if datos['total'] > 0 and datos['aprobadas'] == datos['total'] else 0,
+            })
+
+        promedio_final = 0.0
+        if progreso_unidades:
+            promedio_final = round(sum(pu['promedio_unidad'] for pu in progreso_unidades) / len(progreso_unidades), 2)
+
+        return {
+            'usuario': usuario,
+            'progreso': progreso,
+            'progreso_unidades': progreso_unidades,
+            'promedio_final': promedio_final,
+            'stats': {
+                'lecciones_aprobadas': aprobadas,
+                'lecciones_completadas': completadas,
+                'total_lecciones': len(lecciones),
+                'promedio_general': sum(notas) / len(notas) if notas else 0,
+            }
+        }
+
     @staticmethod
     def obtener_leccion_usuario(usuario_id, leccion_id):
         """Obtiene el progreso de una lección específica para un usuario"""
@@ -185,6 +544,8 @@ class Progreso:
         """
         conn = get_db_connection()
         cursor = conn.cursor()
+        # Nota, intentos y clasificación se confirman juntos
+        conn.execute('BEGIN IMMEDIATE')
         
         # Verificar si ya existe un registro
         existe = cursor.execute('''
@@ -212,9 +573,11 @@ class Progreso:
                 es_mejor = True
             else:
                 # Mantener calificación anterior, solo actualizar intentos
+                # La fila puede venir del agregado del historial (completada = 0)
                 cursor.execute('''
                     UPDATE progreso_usuario 
-                    SET intentos = ?
+                    SET intentos = ?, completada = 1,
+                        fecha_completado = COALESCE(fecha_completado, CURRENT_TIMESTAMP)
                     WHERE usuario_id = ? AND leccion_id = ?
                 ''', (nuevos_intentos, usuario_id, leccion_id))
                 calificacion_guardada = calificacion_anterior
@@ -230,16 +593,25 @@ class Progreso:
             calificacion_guardada = calificacion_redondeada
             es_mejor = True
         
+        Usuario.incrementar_version_progreso(usuario_id, conn)
+        puntos = None
+        if es_mejor:
+            # Solo cambia la clasificación de este estudiante
+            puntos = clasificacion.actualizar_usuario(usuario_id, conn)
         conn.commit()
         conn.close()
         
+        if es_mejor:
+            Usuario.invalidar_cache(usuario_id)
+        
         return {
             'calificacion': calificacion_redondeada,
             'calificacion_guardada': calificacion_guardada,
             'aprobada': aprobada == 1,
             'es_mejor': es_mejor,
             'respuestas_correctas': respuestas_correctas,
-            'total_ejercicios': total_ejercicios
+            'total_ejercicios': total_ejercicios,
+            'puntos': puntos
         }
     
     @staticmethod
@@ -0,0 +1,80 @@
+"""
+Caché de bytecode de las plantillas Jinja.
+
+Sin ella cada worker de gunicorn analiza y compila base.html, dashboard.html,
+leccion.html, aprender.html y las del panel de administración la primera vez
+que se piden, y esa petición se lleva el coste tras cada despliegue o
+reciclado de workers.
+
+El bytecode se guarda en DIRECTORIO_CACHE (compartido por todos los workers de
+la máquina) y se regenera solo si cambia el fuente de la plantilla. Al
+arrancar, cada worker carga todas las plantillas desde ese bytecode antes de
+atender peticiones.
+
+Paso de build que deja todo compilado antes de arrancar:
+    python plantillas.py
+"""
+
+import hashlib
+import os
+import time
+from jinja2 import FileSystemBytecodeCache
+
+DIRECTORIO_CACHE = os.getenv('JINJA_CACHE_DIR', os.path.join('instance', 'jinja_cache'))
+PRECARGAR = os.getenv('PRECARGAR_PLANTILLAS', 'True') == 'True'
+
+_version = None
+
+
+def init_plantillas(app):
+    """Activar la caché de bytecode y precargar las plantillas en este worker"""
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(DIRECTORIO_CACHE)
+    if PRECARGAR:
+        precompilar(app)
+
+
+def version(app):
+    """
+    Huella de las plantillas desplegadas (nombre, tamaño y fecha de cada archivo)
+
+    Se calcula una vez por worker; forma parte de los ETag para que un
+    despliegue con plantillas nuevas no reutilice páginas cacheadas.
+    """
+    global _version
+    if _version is None:
+        huella = hashlib.sha1()
+        for carpeta, _, archivos in sorted(os.walk(app.jinja_loader.searchpath[0])):
+            for archivo in sorted(archivos):
+                info = os.stat(os.path.join(carpeta, archivo))
+                huella.update(f'{carpeta}/{archivo}:{info.st_size}:{info.st_mtime_ns};'.encode())
+        _version = huella.hexdigest()[:12]
+    return _version
+
+
+def precompilar(app):
+    """
+    Compilar (o cargar desde el bytecode) todas las plantillas de templates/
+
+    Returns:
+        dict {plantilla: milisegundos}
+    """
+    tiempos = {}
+    for nombre in app.jinja_env.list_templates(extensions=['html']):
+        inicio = time.perf_counter()
+        try:
+            app.jinja_env.get_template(nombre)
+        except Exception as e:
+            print(f"❌ Error al compilar {nombre}: {e}")
+            continue
+        tiempos[nombre] = (time.perf_counter() - inicio) * 1000
+    return tiempos
+
+
+if __name__ == '__main__':
+    # Se importa la aplicación para compilar con su mismo entorno Jinja
+    # (extensiones y autoescape forman parte del bytecode)
+    os.environ['PRECARGAR_PLANTILLAS'] = 'False'
+    from app import app
+    tiempos = precompilar(app)
+    print(f"✅ {len(tiempos)} plantillas compiladas en {DIRECTORIO_CACHE} ({sum(tiempos.values()):.0f} ms)")
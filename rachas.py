@@ -0,0 +1,161 @@
+"""
+Racha de días de estudio (usuarios.racha_dias).
+
+Cada respuesta a un ejercicio y cada lección terminada es un evento de
+actividad. Solo el primero de cada día natural, en la zona horaria del
+usuario, escribe en la base de datos: si el día anterior también hubo
+actividad la racha sube en uno; si no, vuelve a empezar en 1. El resto de
+eventos del día se descartan en memoria sin consultar nada.
+
+Las rachas rotas (un día completo sin actividad) se ponen a 0 con una única
+sentencia UPDATE para todos los usuarios. Como la medianoche llega a cada zona
+horaria en un momento distinto, el hilo de fondo la ejecuta cada
+INTERVALO_REINICIO segundos; también puede lanzarse desde un cron:
+    python rachas.py
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from database import get_db_connection
+
+ZONA_POR_DEFECTO = os.getenv('ZONA_HORARIA', 'UTC')
+INTERVALO_REINICIO = 3600       # Segundos entre pasadas del reinicio de rachas rotas
+MAX_EN_MEMORIA = 100000
+
+# Último día con actividad ya anotada, por usuario, en este worker: {usuario_id: 'YYYY-MM-DD'}
+_dia_anotado = {}
+_hilo = None
+
+
+def zona_valida(zona):
+    """Devuelve la zona horaria IANA si existe (p. ej. 'Europe/Madrid'), o None"""
+    if not zona or len(zona) > 64:
+        return None
+    try:
+        ZoneInfo(zona)
+        return zona
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def _zona_de(usuario):
+    # Bases de datos anteriores a migrate_rachas.py no tienen la columna
+    if usuario is not None and 'zona_horaria' in usuario.keys():
+        return usuario['zona_horaria'] or ZONA_POR_DEFECTO
+    return ZONA_POR_DEFECTO
+
+
+def hoy(zona=None):
+    """Fecha local ('YYYY-MM-DD') en la zona indicada"""
+    try:
+        tz = ZoneInfo(zona or ZONA_POR_DEFECTO)
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = ZoneInfo('UTC')
+    return datetime.now(tz).date().isoformat()
+
+
+def registrar_actividad(usuario):
+    """
+    Anotar un evento de actividad de un usuario
+
+    Args:
+        usuario: Fila del usuario (usa id y zona_horaria)
+
+    Returns:
+        int: Nueva racha si este es el primer evento del día, None en otro caso
+    """
+    usuario_id = usuario['id']
+    fecha = hoy(_zona_de(usuario))
+    if _dia_anotado.get(usuario_id) == fecha:
+        return None
+
+    conn = get_db_connection()
+    fila = conn.execute('''
+        UPDATE usuarios SET
+            racha_dias = CASE WHEN ultimo_dia_actividad = date(?, '-1 day') THEN COALESCE(racha_dias, 0) + 1 ELSE 1 END,
+            ultimo_dia_actividad = ?
+        WHERE id = ? AND (ultimo_dia_actividad IS NULL OR ultimo_dia_actividad < ?)
+        RETURNING racha_dias
+    ''', (fecha, fecha, usuario_id, fecha)).fetchone()
+    conn.commit()
+    conn.close()
+
+    if len(_dia_anotado) >= MAX_EN_MEMORIA:
+        _dia_anotado.clear()
+    _dia_anotado[usuario_id] = fecha
+    return fila['racha_dias'] if fila else None
+
+
+def racha_vigente(usuario):
+    """
+    Racha a mostrar: 0 si ayer no hubo actividad aunque el reinicio aún no haya pasado
+
+    Args:
+        usuario: Fila del usuario
+    """
+    racha = usuario['racha_dias'] or 0
+    if not racha or 'ultimo_dia_actividad' not in usuario.keys():
+        return racha
+    fecha = hoy(_zona_de(usuario))
+    ayer = (datetime.fromisoformat(fecha) - timedelta(days=1)).date().isoformat()
+    ultimo = usuario['ultimo_dia_actividad']
+    return racha if ultimo and ultimo >= ayer else 0
+
+
+def reiniciar_rachas_rotas():
+    """
+    Poner a 0 las rachas de quienes no tuvieron actividad ayer (en su zona horaria)
+
+    Se calcula "ayer" una vez por zona horaria en uso y se aplica con un único
+    UPDATE ... FROM sobre todos los usuarios.
+
+    Returns:
+        int: Rachas reiniciadas
+    """
+    conn = get_db_connection()
+    try:
+        zonas = [fila[0] for fila in conn.execute(
+            'SELECT DISTINCT COALESCE(zona_horaria, ?) FROM usuarios WHERE racha_dias > 0', (ZONA_POR_DEFECTO,))]
+        if not zonas:
+            return 0
+        ayer = {zona: (datetime.fromisoformat(hoy(zona)) - timedelta(days=1)).date().isoformat() for zona in zonas}
+        cursor = conn.execute('''
+            UPDATE usuarios SET racha_dias = 0
+            FROM (SELECT key AS zona, value AS ayer FROM json_each(?)) AS z
+            WHERE usuarios.racha_dias > 0
+              AND z.zona = COALESCE(usuarios.zona_horaria, ?)
+              AND (usuarios.ultimo_dia_actividad IS NULL OR usuarios.ultimo_dia_actividad < z.ayer)
+        ''', (json.dumps(ayer), ZONA_POR_DEFECTO))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def _bucle(intervalo):
+    while True:
+        try:
+            reiniciadas = reiniciar_rachas_rotas()
+            if reiniciadas:
+                print(f"ℹ️ {reiniciadas} rachas reiniciadas")
+        except Exception as e:
+            print(f"❌ Error al reiniciar rachas: {e}")
+        time.sleep(intervalo)
+
+
+def iniciar_reinicio_rachas(intervalo=INTERVALO_REINICIO):
+    """Iniciar el hilo de fondo que reinicia las rachas rotas (uno por proceso)"""
+    global _hilo
+    if _hilo is not None and _hilo.is_alive():
+        return _hilo
+    _hilo = threading.Thread(target=_bucle, args=(intervalo,), name='rachas', daemon=True)
+    _hilo.start()
+    return _hilo
+
+
+if __name__ == '__main__':
+    print(f"✅ {reiniciar_rachas_rotas()} rachas reiniciadas")
@@ -0,0 +1,276 @@
+"""
+Sesiones guardadas en el servidor.
+
+La cookie solo lleva un identificador opaco y aleatorio; los datos de la
+sesión viven en un almacén intercambiable:
+  - 'sqlite' (por defecto): instance/sesiones.db, compartido por todos los
+    workers de gunicorn.
+  - 'memoria': diccionario del propio proceso, para desarrollo y pruebas
+    con un solo worker.
+
+Los datos se cargan de forma perezosa, solo si la petición usa la sesión.
+Cada usuario tiene un número de generación: revocar todas sus sesiones es
+incrementarlo (O(1)); las sesiones con una generación anterior dejan de
+cargarse y el barrido de fondo las elimina junto con las expiradas.
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+
+SESIONES_DB_PATH = os.path.join('instance', 'sesiones.db')
+INTERVALO_BARRIDO = 600  # Segundos entre barridos de sesiones expiradas
+
+almacen = None
+
+
+class AlmacenSesionesSQLite:
+    def __init__(self, ruta=SESIONES_DB_PATH):
+        self.ruta = ruta
+        self._local = threading.local()
+
+    def _conexion(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            conn = sqlite3.connect(self.ruta, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sesiones (
+                    id TEXT PRIMARY KEY,
+                    usuario_id INTEGER,
+                    generacion INTEGER NOT NULL DEFAULT 0,
+                    datos TEXT NOT NULL,
+                    expira REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS generaciones (
+                    usuario_id INTEGER PRIMARY KEY,
+                    generacion INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sesiones_expira ON sesiones (expira)')
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def generacion(self, usuario_id):
+        fila = self._conexion().execute(
+            'SELECT generacion FROM generaciones WHERE usuario_id = ?', (usuario_id,)
+        ).fetchone()
+        return fila[0] if fila else 0
+
+    def cargar(self, sid):
+        fila = self._conexion().execute('''
+            SELECT s.datos, s.generacion FROM sesiones s
+            LEFT JOIN generaciones g ON g.usuario_id = s.usuario_id
+            WHERE s.id = ? AND s.expira > ? AND s.generacion = COALESCE(g.generacion, 0)
+        ''', (sid, time.time())).fetchone()
+        return (session_json_serializer.loads(fila[0]), fila[1]) if fila else None
+
+    def guardar(self, sid, usuario_id, generacion, datos, expira):
+        conn = self._conexion()
+        conn.execute('INSERT OR REPLACE INTO sesiones (id, usuario_id, generacion, datos, expira) VALUES (?, ?, ?, ?, ?)',
+                     (sid, usuario_id, generacion, session_json_serializer.dumps(datos), expira))
+        conn.commit()
+
+    def eliminar(self, sid):
+        conn = self._conexion()
+        conn.execute('DELETE FROM sesiones WHERE id = ?', (sid,))
+        conn.commit()
+
+    def revocar_usuarios(self, usuario_ids):
+        conn = self._conexion()
+        conn.executemany('''
+            INSERT INTO generaciones (usuario_id, generacion) VALUES (?, 1)
+            ON CONFLICT(usuario_id) DO UPDATE SET generacion = generacion + 1
+        ''', ((usuario_id,) for usuario_id in usuario_ids))
+        conn.commit()
+
+    def purgar(self):
+        conn = self._conexion()
+        cursor = conn.execute('''
+            DELETE FROM sesiones
+            WHERE expira <= ?
+               OR generacion < (SELECT g.generacion FROM generaciones g WHERE g.usuario_id = sesiones.usuario_id)
+        ''', (time.time(),))
+        conn.commit()
+        return cursor.rowcount
+
+
+class AlmacenSesionesMemoria:
+    def __init__(self):
+        self._sesiones = {}       # sid -> (usuario_id, generacion, datos, expira)
+        self._generaciones = {}
+        self._lock = threading.Lock()
+
+    def generacion(self, usuario_id):
+        return self._generaciones.get(usuario_id, 0)
+
+    def cargar(self, sid):
+        entrada = self._sesiones.get(sid)
+        if not entrada:
+            return None
+        usuario_id, generacion, datos, expira = entrada
+        if expira <= time.time() or generacion != self.generacion(usuario_id):
+            return None
+        return session_json_serializer.loads(datos), generacion
+
+    def guardar(self, sid, usuario_id, generacion, datos, expira):
+        self._sesiones[sid] = (usuario_id, generacion, session_json_serializer.dumps(datos), expira)
+
+    def eliminar(self, sid):
+        self._sesiones.pop(sid, None)
+
+    def revocar_usuarios(self, usuario_ids):
+        with self._lock:
+            for usuario_id in usuario_ids:
+                self._generaciones[usuario_id] = self.generacion(usuario_id) + 1
+
+    def purgar(self):
+        ahora = time.time()
+        with self._lock:
+            invalidas = [sid for sid, (usuario_id, generacion, _, expira) in self._sesiones.items()
+                         if expira <= ahora or generacion != self.generacion(usuario_id)]
+            for sid in invalidas:
+                del self._sesiones[sid]
+        return len(invalidas)
+
+
+def _carga_perezosa(metodo, modifica=False):
+    def envoltura(self, *args, **kwargs):
+        self._asegurar_cargada()
+        if modifica:
+            self.modified = True
+        return metodo(self, *args, **kwargs)
+    envoltura.__name__ = metodo.__name__
+    return envoltura
+
+
+class SesionServidor(dict, SessionMixin):
+    """Sesión que solo consulta el almacén cuando se lee o escribe por primera vez"""
+
+    def __init__(self, sid=None, cargar=None):
+        super().__init__()
+        self.sid = sid
+        self.tenia_cookie = sid is not None
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.usuario_cargado = None
+        self.generacion = 0
+        self._cargar = cargar
+
+    def _asegurar_cargada(self):
+        self.accessed = True
+        if self._cargar is not None:
+            cargar, self._cargar = self._cargar, None
+            cargada = cargar()
+            if cargada is None:
+                # Expirada, revocada o inexistente: empezar una sesión nueva
+                self.sid = None
+                self.new = True
+            else:
+                datos, self.generacion = cargada
+                dict.update(self, datos)
+                self.usuario_cargado = datos.get('usuario_id')
+
+
+for _nombre in ('__getitem__', '__contains__', '__iter__', '__len__', 'get', 'keys', 'values', 'items', 'copy'):
+    setattr(SesionServidor, _nombre, _carga_perezosa(getattr(dict, _nombre)))
+for _nombre in ('__setitem__', '__delitem__', 'pop', 'popitem', 'setdefault', 'update', 'clear'):
+    setattr(SesionServidor, _nombre, _carga_perezosa(getattr(dict, _nombre), modifica=True))
+
+
+class InterfazSesionesServidor(SessionInterface):
+    def __init__(self, almacen_sesiones):
+        self.almacen = almacen_sesiones
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and len(sid) <= 64:
+            return SesionServidor(sid, cargar=lambda: self.almacen.cargar(sid))
+        return SesionServidor()
+
+    def save_session(self, app, session, response):
+        # Una petición que no tocó la sesión (por ejemplo, un estático) no cuesta nada
+        if not session.accessed:
+            return
+        response.vary.add('Cookie')
+        if not session.modified:
+            return
+
+        nombre = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        ruta = self.get_cookie_path(app)
+
+        if not session:
+            if session.sid:
+                self.almacen.eliminar(session.sid)
+            if not session.tenia_cookie:
+                return
+            response.delete_cookie(nombre, domain=dominio, path=ruta,
+                                   secure=self.get_cookie_secure(app),
+                                   samesite=self.get_cookie_samesite(app),
+                                   httponly=self.get_cookie_httponly(app))
+            return
+
+        usuario_id = session.get('usuario_id')
+        if session.sid is None or usuario_id != session.usuario_cargado:
+            # Nuevo identificador al iniciar sesión o cambiar de usuario (evita fijación de sesión)
+            if session.sid:
+                self.almacen.eliminar(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.generacion = self.almacen.generacion(usuario_id) if usuario_id else 0
+
+        # Se guarda con la generación leída al cargar: si el usuario fue revocado
+        # durante esta petición, la sesión sigue revocada
+        generacion = session.generacion
+        expira = time.time() + app.permanent_session_lifetime.total_seconds()
+        self.almacen.guardar(session.sid, usuario_id, generacion, dict(session), expira)
+
+        response.set_cookie(nombre, session.sid,
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app),
+                            domain=dominio, path=ruta,
+                            secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
+
+def _barrer(intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            almacen.purgar()
+        except Exception as e:
+            print(f"❌ Error al purgar sesiones: {e}")
+
+
+def init_sesiones(app):
+    """
+    Instalar las sesiones del servidor en la aplicación
+
+    El almacén se elige con la variable de entorno SESIONES_BACKEND.
+    """
+    global almacen
+    backend = os.getenv('SESIONES_BACKEND', 'sqlite')
+    almacen = AlmacenSesionesMemoria() if backend == 'memoria' else AlmacenSesionesSQLite()
+    app.session_interface = InterfazSesionesServidor(almacen)
+    threading.Thread(target=_barrer, args=(INTERVALO_BARRIDO,), name='sesiones-barrido', daemon=True).start()
+    return almacen
+
+
+def revocar_sesiones_usuario(usuario_id):
+    """Cerrar todas las sesiones abiertas de un usuario"""
+    revocar_sesiones_usuarios([usuario_id])
+
+
+def revocar_sesiones_usuarios(usuario_ids):
+    """Cerrar todas las sesiones abiertas de varios usuarios en una transacción"""
+    if almacen is not None and usuario_ids:
+        almacen.revocar_usuarios(usuario_ids)
@@ -0,0 +1,90 @@
+"""
+Lecciones sin conexión: paquetes para el service worker y resultados en lote.
+
+El service worker (static/js/sw.js, servido en /sw.js) guarda por unidad las
+páginas de las lecciones desbloqueadas, su JSON de ejercicios y los estáticos
+que usan (ver urls_paquete). Si durante una lección se cae la conexión, el
+reproductor deja las respuestas sin corregir y al terminar envía el intento
+completo a /api/v1/resultados; sin red, el service worker lo guarda en
+IndexedDB y reenvía la cola en un único lote cuando vuelve la conexión.
+
+Cada intento lleva el identificador que genera la página de la lección. La
+tabla intentos_recibidos lo anota una sola vez por usuario, así que reenviar
+un lote (porque se perdió la respuesta del servidor) no duplica la
+calificación ni el historial: el intento repetido responde 'duplicado'.
+"""
+
+from database import get_db_connection
+
+MAX_LOTE = 50               # Intentos por petición; el resto se queda en la cola del navegador
+RETENCION_DIAS = 30         # Más que lo que un intento puede esperar en la cola
+
+# Estáticos que necesitan las páginas guardadas (nombres originales, sin huella)
+ESTATICOS = (
+    'terceros/bootstrap.min.css',
+    'terceros/bootstrap.min.js',
+    'css/style.css',
+    'css/leccion.css',
+    'js/main.js',
+    'js/leccion.js',
+    'images/rencorosa.png',
+)
+
+
+def marcar_intento(usuario_id, intento, leccion_id):
+    """
+    Anotar un intento como recibido
+
+    Returns:
+        True si es la primera vez que llega, False si ya se había procesado
+    """
+    conn = get_db_connection()
+    cursor = conn.execute('''
+        INSERT OR IGNORE INTO intentos_recibidos (usuario_id, intento, leccion_id)
+        VALUES (?, ?, ?)
+    ''', (usuario_id, intento, leccion_id))
+    nuevo = cursor.rowcount == 1
+    conn.commit()
+    conn.close()
+    return nuevo
+
+
+def desmarcar_intento(usuario_id, intento):
+    """Olvidar un intento que no se pudo guardar, para que el reintento del cliente se procese"""
+    conn = get_db_connection()
+    conn.execute('DELETE FROM intentos_recibidos WHERE usuario_id = ? AND intento = ?', (usuario_id, intento))
+    conn.commit()
+    conn.close()
+
+
+def purgar():
+    """Borrar las marcas de intentos más antiguas que RETENCION_DIAS"""
+    conn = get_db_connection()
+    cursor = conn.execute("DELETE FROM intentos_recibidos WHERE recibido_en < datetime('now', ?)",
+                          (f'-{RETENCION_DIAS} days',))
+    conn.commit()
+    conn.close()
+    return cursor.rowcount
+
+
+def urls_paquete(url_for, unidad_id, lecciones, version, desbloqueada):
+    """
+    URLs que el service worker guarda para hacer sin conexión una unidad
+
+    Args:
+        url_for: flask.url_for (las URLs de estáticos salen con huella)
+        unidad_id: unidad del paquete
+        lecciones: lecciones de la unidad
+        version: versión del contenido (la misma ?v= que pide la página de la lección)
+        desbloqueada: función leccion_id -> bool para el usuario actual
+
+    Returns:
+        list de URLs relativas al sitio
+    """
+    urls = [url_for('static', filename=archivo) for archivo in ESTATICOS]
+    urls += [url_for('dashboard'), url_for('aprender', unidad_id=unidad_id)]
+    for leccion in lecciones:
+        if desbloqueada(leccion['id']):
+            urls.append(url_for('leccion', leccion_id=leccion['id']))
+            urls.append(url_for('api_leccion', leccion_id=leccion['id'], v=version))
+    return urls
@@ -0,0 +1,70 @@
+"""
+Servidor SMTP mínimo para probar el envío de correos en local.
+
+Acepta cualquier mensaje y solo muestra remitente, destinatarios y asunto.
+Las direcciones que contienen "rebote" se rechazan con 550 para probar la
+bandeja de fallidos.
+
+Uso:
+    python smtp_stub.py [puerto]
+    EMAIL_HABILITADO=True MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=False python app.py
+"""
+
+import socketserver
+import sys
+from email import message_from_bytes
+from email.header import decode_header, make_header
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+    def responder(self, linea):
+        self.wfile.write(f"{linea}\r\n".encode())
+
+    def handle(self):
+        self.responder("220 localhost SMTP stub")
+        remitente, destinatarios = None, []
+
+        for raw in self.rfile:
+            linea = raw.decode(errors='replace').rstrip('\r\n')
+            comando = linea[:4].upper()
+
+            if comando in ('EHLO', 'HELO'):
+                self.responder("250 localhost")
+            elif comando == 'MAIL':
+                remitente, destinatarios = linea[10:], []
+                self.responder("250 OK")
+            elif comando == 'RCPT':
+                if 'rebote' in linea.lower():
+                    self.responder("550 Mailbox unavailable")
+                else:
+                    destinatarios.append(linea[8:])
+                    self.responder("250 OK")
+            elif comando == 'DATA':
+                self.responder("354 End data with <CR><LF>.<CR><LF>")
+                datos = []
+                for raw_data in self.rfile:
+                    if raw_data in (b'.\r\n', b'.\n'):
+                        break
+                    datos.append(raw_data[1:] if raw_data.startswith(b'..') else raw_data)
+                mensaje = message_from_bytes(b''.join(datos))
+                asunto = str(make_header(decode_header(mensaje.get('Subject', ''))))
+                self.server.recibidos += 1
+                print(f"📨 #{self.server.recibidos} {remitente} -> {', '.join(destinatarios)}: {asunto}")
+                self.responder("250 OK")
+            elif comando in ('RSET', 'NOOP'):
+                self.responder("250 OK")
+            elif comando == 'QUIT':
+                self.responder("221 Bye")
+                break
+            else:
+                self.responder("502 Command not implemented")
+
+class SMTPStubServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    recibidos = 0
+
+if __name__ == '__main__':
+    puerto = int(sys.argv[1]) if len(sys.argv) > 1 else 1025
+    with SMTPStubServer(('localhost', puerto), SMTPStubHandler) as servidor:
+        print(f"📬 SMTP stub escuchando en localhost:{puerto}")
+        servidor.serve_forever()
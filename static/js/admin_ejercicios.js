@@ -0,0 +1,734 @@
+function cargarLecciones(unidadId) {
+    const leccionSelect = document.getElementById('ejercicioLeccion');
+    leccionSelect.innerHTML = '<option value="">Cargando...</option>';
+    document.getElementById('ejerciciosExistentes').style.display = 'none';
+
+    if (!unidadId) {
+        leccionSelect.innerHTML = '<option value="">Primero selecciona una unidad</option>';
+        return;
+    }
+
+    const unidadIdStr = String(unidadId);
+    const unidadIdNum = parseInt(unidadId);
+    const leccionesUnidad = leccionesPorUnidad[unidadIdStr] || leccionesPorUnidad[unidadIdNum] || [];
+
+    leccionSelect.innerHTML = '<option value="">Selecciona una lección</option>';
+    leccionesUnidad.forEach(leccion => {
+        const option = document.createElement('option');
+        option.value = leccion.id;
+        option.textContent = `${leccion.orden}. ${leccion.titulo}`;
+        leccionSelect.appendChild(option);
+    });
+}
+
+let opcionesAgregadas = [];
+let opcionesAgregadasEdit = [];
+let letrasOpciones = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h'];
+let ejercicioEditandoId = null;
+
+async function cargarEjercicios(leccionId) {
+    if (!leccionId) {
+        document.getElementById('ejerciciosExistentes').style.display = 'none';
+        return;
+    }
+
+    try {
+        const response = await fetch(`/admin/contenido/ejercicios/${leccionId}`);
+        const result = await response.json();
+
+        if (result.success && result.ejercicios.length > 0) {
+            const container = document.getElementById('listaEjercicios');
+            container.innerHTML = '';
+
+            result.ejercicios.forEach((ejercicio, index) => {
+                const ejercicioDiv = document.createElement('div');
+                ejercicioDiv.className = 'ejercicio-item';
+                ejercicioDiv.id = `ejercicio-${ejercicio.id}`;
+
+                let opcionesHTML = '';
+                if (ejercicio.tipo === 'opcion_multiple' && ejercicio.opciones) {
+                    const opciones = ejercicio.opciones.split('|');
+                    opcionesHTML = '<div class="ejercicio-opciones-list">';
+                    opciones.forEach(op => {
+                        const opcionLimpia = op.trim();
+                        const letra = opcionLimpia.charAt(0);
+                        const texto = opcionLimpia.length > 2 ? opcionLimpia.substring(2).trim() : opcionLimpia;
+                        opcionesHTML += `<div class="opcion-item"><strong>${letra})</strong> ${texto}</div>`;
+                    });
+                    opcionesHTML += '</div>';
+                } else if (ejercicio.tipo === 'fill_in_blank') {
+                    const respuestas = ejercicio.respuesta_correcta ? ejercicio.respuesta_correcta.split('|') : [];
+                    opcionesHTML = '<div class="ejercicio-fill-preview">';
+                    opcionesHTML += '<strong>Espacios en blanco:</strong> ';
+                    opcionesHTML += respuestas.map((r, i) => `"${r.trim()}"`).join(', ') || 'Ninguno';
+                    opcionesHTML += '</div>';
+                } else if (ejercicio.tipo === 'verdadero_falso') {
+                    opcionesHTML = '<div class="ejercicio-vf-preview">';
+                    opcionesHTML += `<strong>Tipo:</strong> ${ejercicio.respuesta_correcta === 'verdadero' ? 'Verdadero' : 'Falso'}`;
+                    opcionesHTML += '</div>';
+                }
+
+                ejercicioDiv.innerHTML = `
+                    <div class="ejercicio-header">
+                        <span class="ejercicio-numero">Ejercicio ${index + 1}</span>
+                        <span class="ejercicio-tipo-badge">${ejercicio.tipo.replace('_', ' ')}</span>
+                    </div>
+                    <div class="ejercicio-pregunta-texto">${ejercicio.pregunta}</div>
+                    ${opcionesHTML}
+                    <div class="ejercicio-respuesta-info">
+                        <strong>Respuesta correcta:</strong> ${ejercicio.respuesta_correcta}
+                    </div>
+                    <div class="ejercicio-acciones">
+                        <button type="button" class="btn-edit-ejercicio" onclick="editarEjercicio(${ejercicio.id}, ${ejercicio.leccion_id})">✏️ Editar</button>
+                        <button type="button" class="btn-delete-ejercicio" onclick="eliminarEjercicio(${ejercicio.id})">🗑️ Eliminar</button>
+                    </div>
+                `;
+                container.appendChild(ejercicioDiv);
+            });
+
+            document.getElementById('ejerciciosExistentes').style.display = 'block';
+        } else {
+            document.getElementById('ejerciciosExistentes').style.display = 'none';
+        }
+    } catch (error) {
+        console.error('Error al cargar ejercicios:', error);
+    }
+}
+
+async function eliminarEjercicio(ejercicioId) {
+    if (!confirm('¿Estás seguro de que deseas eliminar este ejercicio?')) return;
+
+    try {
+        const response = await fetch(`/admin/contenido/ejercicio/${ejercicioId}`, {
+            method: 'DELETE'
+        });
+        const result = await response.json();
+
+        if (result.success) {
+            alert('Ejercicio eliminado exitosamente');
+            const leccionId = document.getElementById('ejercicioLeccion').value;
+            cargarEjercicios(leccionId);
+        } else {
+            alert('Error: ' + (result.message || 'No se pudo eliminar el ejercicio'));
+        }
+    } catch (error) {
+        alert('Error de conexión: ' + error.message);
+    }
+}
+
+async function editarEjercicio(ejercicioId, leccionId) {
+    ejercicioEditandoId = ejercicioId;
+    document.getElementById('editEjercicioId').value = ejercicioId;
+    document.getElementById('editLeccionId').value = leccionId;
+
+    try {
+        const response = await fetch(`/admin/contenido/ejercicios/${leccionId}`);
+        const result = await response.json();
+
+        if (result.success) {
+            const ejercicio = result.ejercicios.find(e => e.id == ejercicioId);
+            if (ejercicio) {
+                cargarDatosEjercicioEnModal(ejercicio);
+                document.getElementById('modalEditarEjercicio').style.display = 'flex';
+                document.body.style.overflow = 'hidden';
+            }
+        }
+    } catch (error) {
+        alert('Error al cargar ejercicio: ' + error.message);
+    }
+}
+
+function cargarDatosEjercicioEnModal(ejercicio) {
+    document.getElementById('editEjercicioTipo').value = ejercicio.tipo;
+    document.getElementById('editEjercicioPregunta').value = ejercicio.pregunta;
+    document.getElementById('editEjercicioExplicacion').value = ejercicio.explicacion || '';
+    document.getElementById('editEjercicioPuntos').value = ejercicio.puntos || 10;
+
+    toggleTipoEjercicioEdit();
+
+    if (ejercicio.tipo === 'opcion_multiple') {
+        if (ejercicio.opciones) {
+            const opciones = ejercicio.opciones.split('|');
+            opcionesAgregadasEdit = [];
+            const container = document.querySelector('#editOpcionMultipleContainer .opciones-input-container');
+            container.innerHTML = '';
+            const select = document.getElementById('editRespuestaCorrectaMultiple');
+            select.innerHTML = '<option value="">Selecciona la respuesta correcta</option>';
+            const lista = document.getElementById('editOpcionesLista');
+            lista.innerHTML = '';
+
+            opciones.forEach((op, index) => {
+                const letra = letrasOpciones[index];
+                const texto = op.trim().substring(2);
+                opcionesAgregadasEdit.push({ letra: letra, texto: texto });
+
+                const option = document.createElement('option');
+                option.value = letra;
+                option.textContent = `${letra}) ${texto}`;
+                select.appendChild(option);
+
+                const opcionDiv = document.createElement('div');
+                opcionDiv.className = 'opcion-agregada';
+                opcionDiv.innerHTML = `
+                    <span class="opcion-letra-lista">${letra})</span>
+                    <span class="opcion-texto-lista">${texto}</span>
+                    <button type="button" class="btn-remove-opcion" onclick="eliminarOpcionEdit('${letra}')">✕</button>
+                `;
+                lista.appendChild(opcionDiv);
+            });
+
+            reconstruirInputsOpcionesEdit();
+            select.value = ejercicio.respuesta_correcta.toLowerCase();
+        }
+    } else if (ejercicio.tipo === 'fill_in_blank') {
+        document.getElementById('editTextoEditable').innerText = ejercicio.pregunta;
+        document.getElementById('editTextoCompleto').value = ejercicio.pregunta;
+        document.getElementById('editRespuestaCorrectaFill').value = ejercicio.respuesta_correcta;
+    } else if (ejercicio.tipo === 'verdadero_falso') {
+        document.getElementById('editConceptoVF').value = ejercicio.pregunta;
+        if (ejercicio.respuesta_correcta.toLowerCase() === 'verdadero') {
+            document.getElementById('editVfVerdadero').checked = true;
+        } else {
+            document.getElementById('editVfFalso').checked = true;
+        }
+    }
+}
+
+function cerrarModalEdicion() {
+    document.getElementById('modalEditarEjercicio').style.display = 'none';
+    document.body.style.overflow = '';
+    ejercicioEditandoId = null;
+    document.getElementById('formEditarEjercicio').reset();
+    document.getElementById('editEjercicioTipo').value = '';
+    toggleTipoEjercicioEdit();
+    opcionesAgregadasEdit = [];
+}
+
+document.getElementById('modalEditarEjercicio').addEventListener('click', function(e) {
+    if (e.target === this) {
+        cerrarModalEdicion();
+    }
+});
+
+document.addEventListener('keydown', function(e) {
+    if (e.key === 'Escape' && document.getElementById('modalEditarEjercicio').style.display === 'flex') {
+        cerrarModalEdicion();
+    }
+});
+
+function toggleTipoEjercicio() {
+    const tipo = document.getElementById('ejercicioTipo').value;
+    document.getElementById('opcionMultipleContainer').style.display = 'none';
+    document.getElementById('fillBlankContainer').style.display = 'none';
+    document.getElementById('verdaderoFalsoContainer').style.display = 'none';
+
+    if (tipo === 'opcion_multiple') {
+        document.getElementById('opcionMultipleContainer').style.display = 'block';
+        inicializarOpcionesMultiples();
+    } else if (tipo === 'fill_in_blank') {
+        document.getElementById('fillBlankContainer').style.display = 'block';
+    } else if (tipo === 'verdadero_falso') {
+        document.getElementById('verdaderoFalsoContainer').style.display = 'block';
+    }
+}
+
+function toggleTipoEjercicioEdit() {
+    const tipo = document.getElementById('editEjercicioTipo').value;
+    document.getElementById('editOpcionMultipleContainer').style.display = 'none';
+    document.getElementById('editFillBlankContainer').style.display = 'none';
+    document.getElementById('editVerdaderoFalsoContainer').style.display = 'none';
+
+    if (tipo === 'opcion_multiple') {
+        document.getElementById('editOpcionMultipleContainer').style.display = 'block';
+        inicializarOpcionesMultiplesEdit();
+    } else if (tipo === 'fill_in_blank') {
+        document.getElementById('editFillBlankContainer').style.display = 'block';
+    } else if (tipo === 'verdadero_falso') {
+        document.getElementById('editVerdaderoFalsoContainer').style.display = 'block';
+    }
+}
+
+function inicializarOpcionesMultiples() {
+    opcionesAgregadas = [];
+    const container = document.querySelector('.opciones-input-container');
+    container.innerHTML = `
+        <div class="opcion-input-wrapper">
+            <span class="opcion-letra">a)</span>
+            <input type="text" class="opcion-input" placeholder="Escribe la opción y presiona Enter..." data-letra="a" onkeypress="agregarOpcion(event, 'a')">
+        </div>
+    `;
+    document.getElementById('opcionesLista').innerHTML = '';
+    document.getElementById('respuestaCorrectaMultiple').innerHTML = '<option value="">Selecciona la respuesta correcta</option>';
+}
+
+function inicializarOpcionesMultiplesEdit() {
+    if (opcionesAgregadasEdit.length === 0) {
+        const container = document.querySelector('#editOpcionMultipleContainer .opciones-input-container');
+        container.innerHTML = `
+            <div class="opcion-input-wrapper">
+                <span class="opcion-letra">a)</span>
+                <input type="text" class="opcion-input" placeholder="Escribe la opción y presiona Enter..." data-letra="a" onkeypress="agregarOpcionEdit(event, 'a')">
+            </div>
+        `;
+        document.getElementById('editOpcionesLista').innerHTML = '';
+        document.getElementById('editRespuestaCorrectaMultiple').innerHTML = '<option value="">Selecciona la respuesta correcta</option>';
+    }
+}
+
+function agregarOpcion(event, letraActual) {
+    if (event.key === 'Enter') {
+        event.preventDefault();
+        const input = event.target;
+        const texto = input.value.trim();
+        if (texto === '') return;
+
+        opcionesAgregadas.push({ letra: letraActual, texto: texto });
+        const select = document.getElementById('respuestaCorrectaMultiple');
+        const option = document.createElement('option');
+        option.value = letraActual;
+        option.textContent = `${letraActual}) ${texto}`;
+        select.appendChild(option);
+
+        const lista = document.getElementById('opcionesLista');
+        const opcionDiv = document.createElement('div');
+        opcionDiv.className = 'opcion-agregada';
+        opcionDiv.innerHTML = `
+            <span class="opcion-letra-lista">${letraActual})</span>
+            <span class="opcion-texto-lista">${texto}</span>
+            <button type="button" class="btn-remove-opcion" onclick="eliminarOpcion('${letraActual}')">✕</button>
+        `;
+        lista.appendChild(opcionDiv);
+
+        input.value = '';
+        if (opcionesAgregadas.length < letrasOpciones.length) {
+            const siguienteLetra = letrasOpciones[opcionesAgregadas.length];
+            const container = document.querySelector('.opciones-input-container');
+            const nuevoInput = document.createElement('div');
+            nuevoInput.className = 'opcion-input-wrapper';
+            nuevoInput.innerHTML = `
+                <span class="opcion-letra">${siguienteLetra})</span>
+                <input type="text" class="opcion-input" placeholder="Escribe la opción y presiona Enter..." data-letra="${siguienteLetra}" onkeypress="agregarOpcion(event, '${siguienteLetra}')">
+            `;
+            container.appendChild(nuevoInput);
+            nuevoInput.querySelector('input').focus();
+        }
+    }
+}
+
+function agregarOpcionEdit(event, letraActual) {
+    if (event.key === 'Enter') {
+        event.preventDefault();
+        const input = event.target;
+        const texto = input.value.trim();
+        if (texto === '') return;
+
+        opcionesAgregadasEdit.push({ letra: letraActual, texto: texto });
+        const select = document.getElementById('editRespuestaCorrectaMultiple');
+        const option = document.createElement('option');
+        option.value = letraActual;
+        option.textContent = `${letraActual}) ${texto}`;
+        select.appendChild(option);
+
+        const lista = document.getElementById('editOpcionesLista');
+        const opcionDiv = document.createElement('div');
+        opcionDiv.className = 'opcion-agregada';
+        opcionDiv.innerHTML = `
+            <span class="opcion-letra-lista">${letraActual})</span>
+            <span class="opcion-texto-lista">${texto}</span>
+            <button type="button" class="btn-remove-opcion" onclick="eliminarOpcionEdit('${letraActual}')">✕</button>
+        `;
+        lista.appendChild(opcionDiv);
+
+        input.value = '';
+        if (opcionesAgregadasEdit.length < letrasOpciones.length) {
+            const siguienteLetra = letrasOpciones[opcionesAgregadasEdit.length];
+            const container = document.querySelector('#editOpcionMultipleContainer .opciones-input-container');
+            const nuevoInput = document.createElement('div');
+            nuevoInput.className = 'opcion-input-wrapper';
+            nuevoInput.innerHTML = `
+                <span class="opcion-letra">${siguienteLetra})</span>
+                <input type="text" class="opcion-input" placeholder="Escribe la opción y presiona Enter..." data-letra="${siguienteLetra}" onkeypress="agregarOpcionEdit(event, '${siguienteLetra}')">
+            `;
+            container.appendChild(nuevoInput);
+            nuevoInput.querySelector('input').focus();
+        }
+    }
+}
+
+function eliminarOpcion(letra) {
+    opcionesAgregadas = opcionesAgregadas.filter(op => op.letra !== letra);
+    const select = document.getElementById('respuestaCorrectaMultiple');
+    const option = Array.from(select.options).find(opt => opt.value === letra);
+    if (option) option.remove();
+    const lista = document.getElementById('opcionesLista');
+    const opcionDiv = Array.from(lista.children).find(div => div.querySelector('.opcion-letra-lista').textContent.startsWith(letra));
+    if (opcionDiv) opcionDiv.remove();
+    reconstruirInputsOpciones();
+}
+
+function eliminarOpcionEdit(letra) {
+    opcionesAgregadasEdit = opcionesAgregadasEdit.filter(op => op.letra !== letra);
+    const select = document.getElementById('editRespuestaCorrectaMultiple');
+    const option = Array.from(select.options).find(opt => opt.value === letra);
+    if (option) option.remove();
+    const lista = document.getElementById('editOpcionesLista');
+    const opcionDiv = Array.from(lista.children).find(div => div.querySelector('.opcion-letra-lista').textContent.startsWith(letra));
+    if (opcionDiv) opcionDiv.remove();
+    reconstruirInputsOpcionesEdit();
+}
+
+function reconstruirInputsOpciones() {
+    const container = document.querySelector('.opciones-input-container');
+    container.innerHTML = '';
+    opcionesAgregadas.forEach((op) => {
+        const wrapper = document.createElement('div');
+        wrapper.className = 'opcion-input-wrapper';
+        wrapper.innerHTML = `
+            <span class="opcion-letra">${op.letra})</span>
+            <input type="text" class="opcion-input" value="${op.texto}" data-letra="${op.letra}" readonly>
+        `;
+        container.appendChild(wrapper);
+    });
+    if (opcionesAgregadas.length < letrasOpciones.length) {
+        const siguienteLetra = letrasOpciones[opcionesAgregadas.length];
+        const wrapper = document.createElement('div');
+        wrapper.className = 'opcion-input-wrapper';
+        wrapper.innerHTML = `
+            <span class="opcion-letra">${siguienteLetra})</span>
+            <input type="text" class="opcion-input" placeholder="Escribe la opción y presiona Enter..." data-letra="${siguienteLetra}" onkeypress="agregarOpcion(event, '${siguienteLetra}')">
+        `;
+        container.appendChild(wrapper);
+    }
+}
+
+function reconstruirInputsOpcionesEdit() {
+    const container = document.querySelector('#editOpcionMultipleContainer .opciones-input-container');
+    container.innerHTML = '';
+
+    // Crear inputs editables para cada opción existente
+    opcionesAgregadasEdit.forEach((op) => {
+        const wrapper = document.createElement('div');
+        wrapper.className = 'opcion-input-wrapper';
+        wrapper.innerHTML = `
+            <span class="opcion-letra">${op.letra})</span>
+            <input type="text" class="opcion-input" value="${op.texto}" data-letra="${op.letra}" oninput="actualizarOpcionEdit('${op.letra}', this.value)" onkeypress="manejarEnterOpcionEdit(event, '${op.letra}')">
+            <button type="button" class="btn-remove-opcion-small" onclick="eliminarOpcionEdit('${op.letra}')" title="Eliminar opción">✕</button>
+        `;
+        container.appendChild(wrapper);
+    });
+
+    // Agregar input para nueva opción si hay espacio
+    if (opcionesAgregadasEdit.length < letrasOpciones.length) {
+        const siguienteLetra = letrasOpciones[opcionesAgregadasEdit.length];
+        const wrapper = document.createElement('div');
+        wrapper.className = 'opcion-input-wrapper';
+        wrapper.innerHTML = `
+            <span class="opcion-letra">${siguienteLetra})</span>
+            <input type="text" class="opcion-input" placeholder="Escribe la opción y presiona Enter para agregar..." data-letra="${siguienteLetra}" onkeypress="agregarOpcionEdit(event, '${siguienteLetra}')">
+        `;
+        container.appendChild(wrapper);
+    }
+}
+
+function actualizarOpcionEdit(letra, nuevoTexto) {
+    // Actualizar el texto en el array
+    const opcion = opcionesAgregadasEdit.find(op => op.letra === letra);
+    if (opcion) {
+        opcion.texto = nuevoTexto;
+
+        // Actualizar en el select de respuesta correcta
+        const select = document.getElementById('editRespuestaCorrectaMultiple');
+        const option = Array.from(select.options).find(opt => opt.value === letra);
+        if (option) {
+            option.textContent = `${letra}) ${nuevoTexto}`;
+        }
+
+        // Actualizar en la lista visual
+        const lista = document.getElementById('editOpcionesLista');
+        const opcionDiv = Array.from(lista.children).find(div => {
+            const letraSpan = div.querySelector('.opcion-letra-lista');
+            return letraSpan && letraSpan.textContent.startsWith(letra);
+        });
+        if (opcionDiv) {
+            const textoSpan = opcionDiv.querySelector('.opcion-texto-lista');
+            if (textoSpan) {
+                textoSpan.textContent = nuevoTexto;
+            }
+        }
+    }
+}
+
+function manejarEnterOpcionEdit(event, letraActual) {
+    if (event.key === 'Enter') {
+        event.preventDefault();
+        // Si hay una siguiente letra disponible, crear nuevo input
+        if (opcionesAgregadasEdit.length < letrasOpciones.length) {
+            const siguienteLetra = letrasOpciones[opcionesAgregadasEdit.length];
+            const container = document.querySelector('#editOpcionMultipleContainer .opciones-input-container');
+            const nuevoInput = document.createElement('div');
+            nuevoInput.className = 'opcion-input-wrapper';
+            nuevoInput.innerHTML = `
+                <span class="opcion-letra">${siguienteLetra})</span>
+                <input type="text" class="opcion-input" placeholder="Escribe la opción y presiona Enter..." data-letra="${siguienteLetra}" onkeypress="agregarOpcionEdit(event, '${siguienteLetra}')">
+            `;
+            container.appendChild(nuevoInput);
+            nuevoInput.querySelector('input').focus();
+        }
+    }
+}
+
+function marcarComoEspacio() {
+    const textoEditable = document.getElementById('textoEditable');
+    const selection = window.getSelection();
+    if (selection.rangeCount > 0 && !selection.isCollapsed) {
+        const range = selection.getRangeAt(0);
+        const textoSeleccionado = range.toString().trim();
+        if (textoSeleccionado) {
+            const span = document.createElement('span');
+            span.className = 'espacio-blanco';
+            span.setAttribute('data-texto', textoSeleccionado);
+            span.textContent = '____';
+            span.contentEditable = 'false';
+            span.onclick = function() {
+                if (confirm('¿Quieres eliminar este espacio en blanco?')) {
+                    const textoOriginal = this.getAttribute('data-texto');
+                    const textoNode = document.createTextNode(textoOriginal);
+                    this.parentNode.replaceChild(textoNode, this);
+                    actualizarPreviewFillBlank();
+                }
+            };
+            range.deleteContents();
+            range.insertNode(span);
+            const nuevoRange = document.createRange();
+            nuevoRange.setStartAfter(span);
+            nuevoRange.collapse(true);
+            selection.removeAllRanges();
+            selection.addRange(nuevoRange);
+            actualizarPreviewFillBlank();
+        }
+    }
+}
+
+function marcarComoEspacioEdit() {
+    const textoEditable = document.getElementById('editTextoEditable');
+    const selection = window.getSelection();
+    if (selection.rangeCount > 0 && !selection.isCollapsed) {
+        const range = selection.getRangeAt(0);
+        const textoSeleccionado = range.toString().trim();
+        if (textoSeleccionado) {
+            const span = document.createElement('span');
+            span.className = 'espacio-blanco';
+            span.setAttribute('data-texto', textoSeleccionado);
+            span.textContent = '____';
+            span.contentEditable = 'false';
+            span.onclick = function() {
+                if (confirm('¿Quieres eliminar este espacio en blanco?')) {
+                    const textoOriginal = this.getAttribute('data-texto');
+                    const textoNode = document.createTextNode(textoOriginal);
+                    this.parentNode.replaceChild(textoNode, this);
+                    actualizarPreviewFillBlankEdit();
+                }
+            };
+            range.deleteContents();
+            range.insertNode(span);
+            const nuevoRange = document.createRange();
+            nuevoRange.setStartAfter(span);
+            nuevoRange.collapse(true);
+            selection.removeAllRanges();
+            selection.addRange(nuevoRange);
+            actualizarPreviewFillBlankEdit();
+        }
+    }
+}
+
+function actualizarPreviewFillBlank() {
+    const textoEditable = document.getElementById('textoEditable');
+    const preview = document.getElementById('textoPreview');
+    if (!textoEditable || !preview) return;
+    const textoCompleto = textoEditable.innerText;
+    const espacios = [];
+    textoEditable.querySelectorAll('.espacio-blanco').forEach((span) => {
+        espacios.push(span.getAttribute('data-texto'));
+    });
+    document.getElementById('textoCompleto').value = textoCompleto;
+    document.getElementById('respuestaCorrectaFill').value = espacios.join('|');
+    if (textoCompleto.trim() || espacios.length > 0) {
+        let previewHTML = textoEditable.innerHTML;
+        previewHTML = previewHTML.replace(/<span class="espacio-blanco"[^>]*>____<\/span>/g, '<span class="preview-espacio">____</span>');
+        preview.innerHTML = '<strong>Vista previa:</strong><br>' + previewHTML;
+    } else {
+        preview.innerHTML = '';
+    }
+}
+
+function actualizarPreviewFillBlankEdit() {
+    const textoEditable = document.getElementById('editTextoEditable');
+    const preview = document.getElementById('editTextoPreview');
+    if (!textoEditable || !preview) return;
+    const textoCompleto = textoEditable.innerText;
+    const espacios = [];
+    textoEditable.querySelectorAll('.espacio-blanco').forEach((span) => {
+        espacios.push(span.getAttribute('data-texto'));
+    });
+    document.getElementById('editTextoCompleto').value = textoCompleto;
+    document.getElementById('editRespuestaCorrectaFill').value = espacios.join('|');
+    if (textoCompleto.trim() || espacios.length > 0) {
+        let previewHTML = textoEditable.innerHTML;
+        previewHTML = previewHTML.replace(/<span class="espacio-blanco"[^>]*>____<\/span>/g, '<span class="preview-espacio">____</span>');
+        preview.innerHTML = '<strong>Vista previa:</strong><br>' + previewHTML;
+    } else {
+        preview.innerHTML = '';
+    }
+}
+
+function limpiarTextoEditable() {
+    if (confirm('¿Estás seguro de que quieres limpiar todo el texto?')) {
+        document.getElementById('textoEditable').innerHTML = '';
+        document.getElementById('textoPreview').innerHTML = '';
+        document.getElementById('textoCompleto').value = '';
+        document.getElementById('respuestaCorrectaFill').value = '';
+    }
+}
+
+function limpiarTextoEditableEdit() {
+    if (confirm('¿Estás seguro de que quieres limpiar todo el texto?')) {
+        document.getElementById('editTextoEditable').innerHTML = '';
+        document.getElementById('editTextoPreview').innerHTML = '';
+        document.getElementById('editTextoCompleto').value = '';
+        document.getElementById('editRespuestaCorrectaFill').value = '';
+    }
+}
+
+document.getElementById('formEjercicio').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const data = {
+        leccion_id: document.getElementById('ejercicioLeccion').value,
+        tipo: document.getElementById('ejercicioTipo').value,
+        pregunta: document.getElementById('ejercicioPregunta').value,
+        opciones: '',
+        respuesta_correcta: '',
+        explicacion: document.getElementById('ejercicioExplicacion').value,
+        puntos: parseInt(document.getElementById('ejercicioPuntos').value) || 10
+    };
+
+    const tipo = data.tipo;
+    let datosFinales = { ...data };
+
+    if (tipo === 'opcion_multiple') {
+        const opcionesTexto = opcionesAgregadas.map(op => `${op.letra}) ${op.texto}`).join('|');
+        datosFinales.opciones = opcionesTexto;
+        datosFinales.respuesta_correcta = document.getElementById('respuestaCorrectaMultiple').value;
+        if (opcionesAgregadas.length < 2) {
+            alert('Debes agregar al menos 2 opciones');
+            return;
+        }
+    } else if (tipo === 'fill_in_blank') {
+        datosFinales.pregunta = document.getElementById('textoCompleto').value;
+        datosFinales.respuesta_correcta = document.getElementById('respuestaCorrectaFill').value;
+        datosFinales.opciones = '';
+        if (!datosFinales.pregunta || !datosFinales.respuesta_correcta) {
+            alert('Debes escribir el texto y marcar al menos un espacio en blanco');
+            return;
+        }
+    } else if (tipo === 'verdadero_falso') {
+        datosFinales.pregunta = document.getElementById('conceptoVF').value;
+        const respuestaVF = document.querySelector('input[name="respuestaVF"]:checked');
+        if (!respuestaVF) {
+            alert('Debes seleccionar si es Verdadero o Falso');
+            return;
+        }
+        datosFinales.respuesta_correcta = respuestaVF.value;
+        datosFinales.opciones = '';
+    }
+
+    try {
+        const response = await fetch('/admin/contenido/ejercicio', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(datosFinales)
+        });
+        const result = await response.json();
+        if (result.success) {
+            alert('Ejercicio agregado exitosamente');
+            document.getElementById('formEjercicio').reset();
+            document.getElementById('ejercicioTipo').value = '';
+            toggleTipoEjercicio();
+            opcionesAgregadas = [];
+            const leccionId = document.getElementById('ejercicioLeccion').value;
+            if (leccionId) {
+                cargarEjercicios(leccionId);
+            }
+        } else {
+            alert('Error: ' + (result.message || 'No se pudo guardar el ejercicio'));
+        }
+    } catch (error) {
+        alert('Error de conexión: ' + error.message);
+    }
+});
+
+document.getElementById('formEditarEjercicio').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const ejercicioId = document.getElementById('editEjercicioId').value;
+    const leccionId = document.getElementById('editLeccionId').value;
+
+    const data = {
+        leccion_id: leccionId,
+        tipo: document.getElementById('editEjercicioTipo').value,
+        pregunta: document.getElementById('editEjercicioPregunta').value,
+        opciones: '',
+        respuesta_correcta: '',
+        explicacion: document.getElementById('editEjercicioExplicacion').value,
+        puntos: parseInt(document.getElementById('editEjercicioPuntos').value) || 10
+    };
+
+    const tipo = data.tipo;
+    let datosFinales = { ...data };
+
+    if (tipo === 'opcion_multiple') {
+        const opcionesTexto = opcionesAgregadasEdit.map(op => `${op.letra}) ${op.texto}`).join('|');
+        datosFinales.opciones = opcionesTexto;
+        datosFinales.respuesta_correcta = document.getElementById('editRespuestaCorrectaMultiple').value;
+        if (opcionesAgregadasEdit.length < 2) {
+            alert('Debes agregar al menos 2 opciones');
+            return;
+        }
+    } else if (tipo === 'fill_in_blank') {
+        datosFinales.pregunta = document.getElementById('editTextoCompleto').value;
+        datosFinales.respuesta_correcta = document.getElementById('editRespuestaCorrectaFill').value;
+        datosFinales.opciones = '';
+        if (!datosFinales.pregunta || !datosFinales.respuesta_correcta) {
+            alert('Debes escribir el texto y marcar al menos un espacio en blanco');
+            return;
+        }
+    } else if (tipo === 'verdadero_falso') {
+        datosFinales.pregunta = document.getElementById('editConceptoVF').value;
+        const respuestaVF = document.querySelector('input[name="editRespuestaVF"]:checked');
+        if (!respuestaVF) {
+            alert('Debes seleccionar si es Verdadero o Falso');
+            return;
+        }
+        datosFinales.respuesta_correcta = respuestaVF.value;
+        datosFinales.opciones = '';
+    }
+
+    try {
+        const response = await fetch(`/admin/contenido/ejercicio/${ejercicioId}`, {
+            method: 'PUT',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(datosFinales)
+        });
+        const result = await response.json();
+        if (result.success) {
+            alert('Ejercicio actualizado exitosamente');
+            cerrarModalEdicion();
+            const leccionSelect = document.getElementById('ejercicioLeccion');
+            if (leccionSelect.value) {
+                cargarEjercicios(leccionSelect.value);
+            }
+        } else {
+            alert('Error: ' + (result.message || 'No se pudo actualizar el ejercicio'));
+        }
+    } catch (error) {
+        alert('Error de conexión: ' + error.message);
+    }
+});
@@ -0,0 +1,788 @@
+let ejercicioActual = 1;
+let leccionContainer = null;
+let totalEjercicios = 0;
+let respuestasCorrectas = 0;
+let leccionId = 0;
+// Historial: identificador de este intento y tiempos de respuesta
+const intentoId = Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+const inicioLeccion = performance.now();
+let inicioEjercicio = performance.now();
+// Respuestas de este intento; sin conexión se envían al terminar para que las corrija el servidor
+const respuestasIntento = [];
+
+// Cuando el DOM esté listo: pedir los ejercicios a la API y dibujarlos
+document.addEventListener('DOMContentLoaded', function () {
+    leccionContainer = document.querySelector('.leccion-container');
+    if (!leccionContainer) return;
+    leccionId = parseInt(leccionContainer.getAttribute('data-leccion-id') || '0');
+
+    // Deshabilitar botón continuar al inicio
+    const btnContinuarHeader = document.getElementById('btn-continuar-header');
+    if (btnContinuarHeader) {
+        btnContinuarHeader.disabled = true;
+    }
+
+    // La URL lleva la versión del contenido: en los reintentos el navegador usa su copia
+    fetch(leccionContainer.getAttribute('data-api'), { credentials: 'same-origin' })
+        .then(response => {
+            if (response.redirected) {
+                window.location.href = response.url;
+                return null;
+            }
+            if (!response.ok) {
+                throw new Error('Error del servidor (' + response.status + ')');
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (!data) return;
+            renderizarEjercicios(data.ejercicios);
+            console.log('Inicializado: leccionId=' + leccionId + ', totalEjercicios=' + totalEjercicios);
+
+            inicializarEjercicios();
+            inicializarEditores();
+            actualizarProgreso();
+            inicioEjercicio = performance.now();
+        })
+        .catch(error => {
+            console.error('Error al cargar la lección:', error);
+            alert('No se pudieron cargar los ejercicios. Por favor, recarga la página.');
+        });
+});
+
+function crearElemento(etiqueta, clase, texto) {
+    const elemento = document.createElement(etiqueta);
+    if (clase) elemento.className = clase;
+    if (texto !== undefined) elemento.textContent = texto;
+    return elemento;
+}
+
+// Letras a, b, c... (a1, b1... si hay más de 26 opciones)
+function letrasOpciones(cantidad) {
+    const letras = [];
+    for (let i = 0; i < cantidad; i++) {
+        const letra = String.fromCharCode(97 + (i % 26));
+        letras.push(i < 26 ? letra : letra + Math.floor(i / 26));
+    }
+    return letras;
+}
+
+// Mezclar las opciones en cada intento y asignarles las letras que se muestran
+function mezclarOpciones(opciones) {
+    const mezcladas = opciones.slice();
+    for (let i = mezcladas.length - 1; i > 0; i--) {
+        const j = Math.floor(Math.random() * (i + 1));
+        [mezcladas[i], mezcladas[j]] = [mezcladas[j], mezcladas[i]];
+    }
+    const letras = letrasOpciones(mezcladas.length);
+    return mezcladas.map((opcion, i) => ({ letra: opcion.letra, html: opcion.html, letraMostrada: letras[i] }));
+}
+
+function renderizarEjercicios(ejercicios) {
+    const wrapper = document.getElementById('ejercicios-wrapper');
+    totalEjercicios = ejercicios.length;
+    document.getElementById('total-ejercicios').textContent = totalEjercicios;
+
+    if (!totalEjercicios) {
+        wrapper.appendChild(document.getElementById('plantilla-sin-ejercicios').content.cloneNode(true));
+        return;
+    }
+    ejercicios.forEach((ejercicio, i) => wrapper.appendChild(crearEjercicio(ejercicio, i + 1)));
+}
+
+function crearEjercicio(ejercicio, numero) {
+    const card = crearElemento('div', 'ejercicio-contenido');
+    card.id = 'ejercicio-' + numero;
+    card.setAttribute('data-ejercicio-id', ejercicio.id);
+    if (numero > 1) card.style.display = 'none';
+
+    if (ejercicio.tipo !== 'fill_in_blank') {
+        card.appendChild(crearElemento('h2', 'ejercicio-pregunta', ejercicio.pregunta));
+    }
+
+    if (ejercicio.tipo === 'opcion_multiple') {
+        const contenedor = crearElemento('div', 'opciones-container');
+        mezclarOpciones(ejercicio.opciones).forEach(opcion => {
+            // data-opcion guarda la letra original: es la que comprueba el servidor
+            const boton = crearElemento('button', 'opcion-btn opcion-codigo');
+            boton.setAttribute('data-opcion', opcion.letra);
+            boton.appendChild(crearElemento('span', 'opcion-letra', opcion.letraMostrada));
+            const texto = crearElemento('span', 'opcion-texto codigo-texto');
+            texto.innerHTML = opcion.html;
+            boton.appendChild(texto);
+            contenedor.appendChild(boton);
+        });
+        card.appendChild(contenedor);
+    } else if (ejercicio.tipo === 'verdadero_falso') {
+        const contenedor = crearElemento('div', 'opciones-container');
+        [['verdadero', '✓', 'Verdadero'], ['falso', '✕', 'Falso']].forEach(([valor, icono, texto]) => {
+            const boton = crearElemento('button', 'opcion-btn');
+            boton.setAttribute('data-opcion', valor);
+            boton.appendChild(crearElemento('span', 'opcion-icono', icono));
+            boton.appendChild(crearElemento('span', 'opcion-texto', texto));
+            contenedor.appendChild(boton);
+        });
+        card.appendChild(contenedor);
+    } else if (ejercicio.tipo === 'fill_in_blank') {
+        const contenedor = crearElemento('div', 'fill-blank-container');
+        if (ejercicio.pregunta) {
+            contenedor.appendChild(crearElemento('h2', 'ejercicio-pregunta', ejercicio.pregunta));
+        }
+        const editorWrapper = crearElemento('div', 'codigo-editor-wrapper');
+        const cabecera = crearElemento('div', 'codigo-editor-header');
+        cabecera.appendChild(crearElemento('span', 'editor-label', 'Escribe tu código aquí:'));
+        editorWrapper.appendChild(cabecera);
+
+        const editorContainer = crearElemento('div', 'codigo-editor-container');
+        const numeros = crearElemento('div', 'line-numbers', '1');
+        numeros.id = 'line-numbers-' + ejercicio.id;
+        const editor = crearElemento('textarea', 'codigo-editor');
+        editor.setAttribute('data-ejercicio-id', ejercicio.id);
+        editor.placeholder = 'Escribe el código completo...';
+        editor.value = ejercicio.codigo || '';
+        editorContainer.appendChild(numeros);
+        editorContainer.appendChild(editor);
+        editorWrapper.appendChild(editorContainer);
+        contenedor.appendChild(editorWrapper);
+
+        const boton = crearElemento('button', 'btn-verificar-blank', 'Verificar');
+        boton.setAttribute('data-ejercicio-id', ejercicio.id);
+        contenedor.appendChild(boton);
+        card.appendChild(contenedor);
+    } else if (ejercicio.tipo === 'teoria') {
+        const contenedor = crearElemento('div', 'teoria-container');
+        contenedor.appendChild(crearElemento('div', 'teoria-icono', '💡'));
+        const contenido = crearElemento('div', 'teoria-contenido');
+        contenido.innerHTML = ejercicio.pregunta;
+        contenedor.appendChild(contenido);
+        const boton = crearElemento('button', 'btn-continuar-teoria', 'Entendido, continuar');
+        boton.setAttribute('data-ejercicio-id', ejercicio.id);
+        contenedor.appendChild(boton);
+        card.appendChild(contenedor);
+    } else if (ejercicio.tipo === 'texto') {
+        const contenedor = crearElemento('div', 'texto-container');
+        const input = crearElemento('input', 'respuesta-texto');
+        input.type = 'text';
+        input.placeholder = 'Escribe tu respuesta aquí...';
+        contenedor.appendChild(input);
+        contenedor.appendChild(crearElemento('button', 'btn-verificar', 'Verificar'));
+        card.appendChild(contenedor);
+    }
+    return card;
+}
+
+function inicializarEjercicios() {
+    // Eventos para botones de opción múltiple y verdadero/falso
+    document.querySelectorAll('.opcion-btn').forEach(btn => {
+        btn.addEventListener('click', function () {
+            const feedbackContainer = document.getElementById('feedback-container');
+            if (!feedbackContainer || feedbackContainer.style.display === 'none') {
+                seleccionarOpcion(this);
+            }
+        });
+    });
+
+    // Eventos para ejercicios de texto
+    document.querySelectorAll('.btn-verificar').forEach(btn => {
+        btn.addEventListener('click', function () {
+            const ejercicioContenido = this.closest('.ejercicio-contenido');
+            const inputTexto = ejercicioContenido.querySelector('.respuesta-texto');
+            if (inputTexto && inputTexto.value.trim()) {
+                const btnContinuarHeader = document.getElementById('btn-continuar-header');
+                if (btnContinuarHeader) {
+                    btnContinuarHeader.disabled = false;
+                }
+                verificarRespuesta(ejercicioContenido, inputTexto.value.trim());
+            }
+        });
+    });
+
+    // Eventos para ejercicios fill in the blank
+    document.querySelectorAll('.btn-verificar-blank').forEach(btn => {
+        btn.addEventListener('click', function () {
+            const ejercicioContenido = this.closest('.ejercicio-contenido');
+            const ejercicioId = ejercicioContenido.getAttribute('data-ejercicio-id');
+            const codigoEditor = ejercicioContenido.querySelector('.codigo-editor');
+
+            if (codigoEditor) {
+                const codigoCompleto = codigoEditor.value.trim();
+
+                if (codigoCompleto) {
+                    const btnContinuarHeader = document.getElementById('btn-continuar-header');
+                    if (btnContinuarHeader) {
+                        btnContinuarHeader.disabled = false;
+                    }
+
+                    verificarRespuesta(ejercicioContenido, codigoCompleto);
+                } else {
+                    alert('Por favor escribe el código');
+                }
+            }
+        });
+    });
+
+    // Eventos para botones de "Continuar" en teoría
+    document.querySelectorAll('.btn-continuar-teoria').forEach(btn => {
+        btn.addEventListener('click', function () {
+            const btnContinuarHeader = document.getElementById('btn-continuar-header');
+            if (btnContinuarHeader) {
+                btnContinuarHeader.disabled = false;
+            }
+            siguienteEjercicio();
+        });
+    });
+
+    // Evento para botón continuar del header
+    const btnContinuarHeader = document.getElementById('btn-continuar-header');
+    if (btnContinuarHeader) {
+        btnContinuarHeader.addEventListener('click', function () {
+            if (!this.disabled) {
+                siguienteEjercicio();
+            }
+        });
+    }
+}
+
+function seleccionarOpcion(boton) {
+    const ejercicioContenido = boton.closest('.ejercicio-contenido');
+    const opciones = ejercicioContenido.querySelectorAll('.opcion-btn');
+
+    // Remover selección previa
+    opciones.forEach(opt => {
+        opt.classList.remove('seleccionada');
+    });
+
+    // Marcar como seleccionada
+    boton.classList.add('seleccionada');
+
+    // Habilitar botón continuar cuando se selecciona una respuesta
+    const btnContinuarHeader = document.getElementById('btn-continuar-header');
+    if (btnContinuarHeader) {
+        btnContinuarHeader.disabled = false;
+    }
+
+    // Obtener la opción seleccionada
+    const opcionSeleccionada = boton.getAttribute('data-opcion');
+
+    // Verificar respuesta después de un pequeño delay para mejor UX
+    setTimeout(() => {
+        verificarRespuesta(ejercicioContenido, opcionSeleccionada);
+    }, 300);
+}
+
+function verificarRespuesta(ejercicioContenido, respuestaUsuario) {
+    const ejercicioId = ejercicioContenido.getAttribute('data-ejercicio-id');
+
+    // Deshabilitar botones y inputs
+    ejercicioContenido.querySelectorAll('.opcion-btn, .btn-verificar, .btn-verificar-blank').forEach(btn => {
+        btn.disabled = true;
+    });
+
+    const respuesta = {
+        ejercicio_id: parseInt(ejercicioId),
+        respuesta: respuestaUsuario,
+        latencia_ms: Math.round(performance.now() - inicioEjercicio),
+        verificada: false
+    };
+
+    // Realizar petición al servidor
+    fetch('/verificar_respuesta', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            ejercicio_id: ejercicioId,
+            respuesta: respuestaUsuario,
+            intento: intentoId,
+            latencia_ms: respuesta.latencia_ms
+        })
+    })
+        .then(response => {
+            if (!response.ok || response.redirected) {
+                throw new Error('Error del servidor (' + response.status + ')');
+            }
+            return response.json();
+        })
+        .then(data => {
+            respuesta.verificada = true;
+            respuestasIntento.push(respuesta);
+            mostrarFeedback(ejercicioContenido, data);
+        })
+        .catch(error => {
+            // Sin conexión: la respuesta se corrige en el servidor al enviar el resultado
+            console.warn('Respuesta sin corregir:', error);
+            respuestasIntento.push(respuesta);
+            mostrarSinConexion(ejercicioContenido);
+        });
+}
+
+function mostrarSinConexion(ejercicioContenido) {
+    mostrarAvisoFeedback('feedback-pendiente');
+
+    const codigoEditor = ejercicioContenido.querySelector('.codigo-editor');
+    if (codigoEditor) codigoEditor.disabled = true;
+
+    actualizarProgreso();
+}
+
+// Mostrar uno de los avisos de feedback (correcto, incorrecto, pendiente) y ocultarlo a los 4 segundos
+function mostrarAvisoFeedback(id) {
+    const feedbackContainer = document.getElementById('feedback-container');
+    ['feedback-correcto', 'feedback-incorrecto', 'feedback-pendiente'].forEach(aviso => {
+        const elemento = document.getElementById(aviso);
+        if (elemento) elemento.style.display = aviso === id ? 'flex' : 'none';
+    });
+
+    // Limpiar clases de animación previas y mostrar con animación
+    if (feedbackContainer) {
+        feedbackContainer.classList.remove('hide');
+        feedbackContainer.style.display = 'block';
+        void feedbackContainer.offsetWidth;
+        feedbackContainer.classList.add('show');
+    }
+
+    const btnContinuarHeader = document.getElementById('btn-continuar-header');
+    if (btnContinuarHeader) {
+        btnContinuarHeader.disabled = false;
+    }
+
+    // Ocultar automáticamente después de 4 segundos con fade-out
+    setTimeout(() => {
+        if (feedbackContainer) {
+            feedbackContainer.classList.remove('show');
+            feedbackContainer.classList.add('hide');
+            setTimeout(() => {
+                if (feedbackContainer.classList.contains('hide')) {
+                    feedbackContainer.style.display = 'none';
+                    feedbackContainer.classList.remove('hide');
+                }
+            }, 300);
+        }
+    }, 4000);
+}
+
+function mostrarFeedback(ejercicioContenido, data) {
+    const feedbackCorrecto = document.getElementById('feedback-correcto');
+    const feedbackIncorrecto = document.getElementById('feedback-incorrecto');
+
+    mostrarAvisoFeedback(data.correcta ? 'feedback-correcto' : 'feedback-incorrecto');
+
+    if (data.correcta) {
+        // Respuesta correcta
+
+        const explicacionCorrecto = feedbackCorrecto ? feedbackCorrecto.querySelector('.feedback-explicacion') : null;
+        if (explicacionCorrecto) explicacionCorrecto.textContent = data.explicacion || '¡Excelente trabajo!';
+
+        const botonSeleccionado = ejercicioContenido.querySelector('.opcion-btn.seleccionada');
+        if (botonSeleccionado) {
+            botonSeleccionado.classList.remove('seleccionada');
+            botonSeleccionado.classList.add('correcta');
+        }
+
+        const codigoEditorWrapper = ejercicioContenido.querySelector('.codigo-editor-wrapper');
+        const codigoEditor = ejercicioContenido.querySelector('.codigo-editor');
+        if (codigoEditorWrapper && codigoEditor) {
+            codigoEditorWrapper.classList.add('correcto');
+            codigoEditorWrapper.classList.remove('incorrecto');
+            codigoEditor.disabled = true;
+        }
+
+        respuestasCorrectas++;
+    } else {
+        // Respuesta incorrecta
+        // En opción múltiple el servidor responde con la letra original; se muestra la de pantalla
+        const respuestaCorrecta = feedbackIncorrecto ? feedbackIncorrecto.querySelector('.feedback-respuesta strong') : null;
+        let letraMostrada = null;
+        ejercicioContenido.querySelectorAll('.opcion-btn').forEach(btn => {
+            const letra = btn.querySelector('.opcion-letra');
+            const opcion = btn.getAttribute('data-opcion');
+            if (letra && data.respuesta_correcta && opcion.toLowerCase() === data.respuesta_correcta.trim().toLowerCase()) {
+                letraMostrada = letra.textContent;
+            }
+        });
+        if (respuestaCorrecta) respuestaCorrecta.textContent = letraMostrada || data.respuesta_correcta || '';
+
+        const botonSeleccionado = ejercicioContenido.querySelector('.opcion-btn.seleccionada');
+        if (botonSeleccionado) {
+            botonSeleccionado.classList.remove('seleccionada');
+            botonSeleccionado.classList.add('incorrecta');
+        }
+
+        const codigoEditorWrapper = ejercicioContenido.querySelector('.codigo-editor-wrapper');
+        const codigoEditor = ejercicioContenido.querySelector('.codigo-editor');
+        if (codigoEditorWrapper && codigoEditor) {
+            codigoEditorWrapper.classList.add('incorrecto');
+            codigoEditorWrapper.classList.remove('correcto');
+            codigoEditor.disabled = true;
+        }
+
+        // Marcar la respuesta correcta (solo para opción múltiple)
+        ejercicioContenido.querySelectorAll('.opcion-btn').forEach(btn => {
+            const opcion = btn.getAttribute('data-opcion');
+            if (opcion && data.respuesta_correcta && opcion.trim().toLowerCase() === data.respuesta_correcta.trim().toLowerCase()) {
+                btn.classList.add('correcta');
+            }
+        });
+    }
+
+    actualizarProgreso();
+}
+
+function siguienteEjercicio() {
+    // Ocultar feedback independiente con fade-out
+    const feedbackContainer = document.getElementById('feedback-container');
+    if (feedbackContainer) {
+        feedbackContainer.classList.remove('show');
+        feedbackContainer.classList.add('hide');
+        setTimeout(() => {
+            if (feedbackContainer.classList.contains('hide')) {
+                feedbackContainer.style.display = 'none';
+                feedbackContainer.classList.remove('hide');
+            }
+        }, 300);
+    }
+
+    // Deshabilitar botón continuar del header para el siguiente ejercicio
+    const btnContinuarHeader = document.getElementById('btn-continuar-header');
+    if (btnContinuarHeader) {
+        btnContinuarHeader.disabled = true;
+    }
+
+    // Ocultar ejercicio actual
+    const ejercicioActualCard = document.getElementById(`ejercicio-${ejercicioActual}`);
+    if (ejercicioActualCard) {
+        ejercicioActualCard.style.display = 'none';
+    }
+
+    ejercicioActual++;
+
+    if (ejercicioActual > totalEjercicios) {
+        // Completar lección
+        completarLeccion();
+    } else {
+        // Mostrar siguiente ejercicio
+        const siguienteEjercicioCard = document.getElementById(`ejercicio-${ejercicioActual}`);
+        if (siguienteEjercicioCard) {
+            siguienteEjercicioCard.style.display = 'block';
+            inicioEjercicio = performance.now();
+            const btnContinuarHeader = document.getElementById('btn-continuar-header');
+            if (btnContinuarHeader) {
+                btnContinuarHeader.disabled = true;
+            }
+            actualizarProgreso();
+
+            // Inicializar numeración y resaltado para el nuevo ejercicio
+            const nuevoEditor = siguienteEjercicioCard.querySelector('.codigo-editor');
+            if (nuevoEditor) {
+                setTimeout(() => {
+                    actualizarNumeros(nuevoEditor);
+                    aplicarResaltado(nuevoEditor);
+                }, 100);
+            }
+        }
+    }
+}
+
+function completarLeccion() {
+    const btnContinuarHeader = document.getElementById('btn-continuar-header');
+    if (btnContinuarHeader) {
+        btnContinuarHeader.disabled = true;
+    }
+
+    // Con respuestas sin corregir, el resultado lo calcula el servidor a partir de ellas
+    if (respuestasIntento.some(r => !r.verificada)) {
+        enviarResultado();
+        return;
+    }
+
+    console.log('Enviando calificación:', {
+        leccion_id: leccionId,
+        respuestas_correctas: respuestasCorrectas,
+        total_ejercicios: totalEjercicios
+    });
+
+    // Enviar petición para guardar calificación
+    fetch('/completar_leccion', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            leccion_id: leccionId,
+            respuestas_correctas: respuestasCorrectas,
+            total_ejercicios: totalEjercicios,
+            intento: intentoId,
+            duracion_ms: Math.round(performance.now() - inicioLeccion)
+        })
+    })
+        .then(function (response) {
+            console.log('Fetch response status:', response.status);
+
+            // Si la respuesta es una redirección (probablemente al login)
+            if (response.redirected) {
+                console.error('El servidor redirigió a:', response.url);
+                window.location.href = response.url;
+                return;
+            }
+
+            if (!response.ok) {
+                return response.text().then(function (text) {
+                    console.error('Error del servidor (HTTP ' + response.status + '):', text);
+                    try {
+                        const errorData = JSON.parse(text);
+                        throw new Error(errorData.error || 'Error del servidor (' + response.status + ')');
+                    } catch (e) {
+                        throw new Error('Error del servidor (' + response.status + '). Consulta la consola.');
+                    }
+                });
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (!data) return; // Manejar caso de redirección
+
+            console.log('Respuesta del servidor:', data);
+
+            if (data.success) {
+                mostrarResultado(data);
+            } else {
+                console.error('Error lógico del servidor:', data.error);
+                alert('Error: ' + (data.error || 'Ocurrió un error al procesar la calificación.'));
+                if (btnContinuarHeader) btnContinuarHeader.disabled = false;
+            }
+        })
+        .catch(function (error) {
+            if (error instanceof TypeError) {
+                // Sin conexión: el service worker guarda el resultado y lo envía al volver la red
+                console.warn('Sin conexión al completar la lección:', error);
+                enviarResultado();
+                return;
+            }
+            console.error('Error en fetch completion:', error);
+            alert('Hubo un contratiempo: ' + error.message);
+            if (btnContinuarHeader) btnContinuarHeader.disabled = false;
+        });
+}
+
+// Intento completo para /api/v1/resultados: si no hay red, el service worker lo encola (202)
+function enviarResultado() {
+    const btnContinuarHeader = document.getElementById('btn-continuar-header');
+
+    fetch('/api/v1/resultados', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            resultados: [{
+                intento: intentoId,
+                usuario_id: usuarioLeccion,
+                leccion_id: leccionId,
+                total_ejercicios: totalEjercicios,
+                duracion_ms: Math.round(performance.now() - inicioLeccion),
+                respuestas: respuestasIntento
+            }]
+        })
+    })
+        .then(response => {
+            if (!response.ok || response.redirected) {
+                throw new Error('Error del servidor (' + response.status + ')');
+            }
+            return response.json();
+        })
+        .then(data => {
+            const resultado = data.resultados && data.resultados[0];
+            if (resultado && resultado.estado === 'guardado') {
+                respuestasCorrectas = resultado.respuestas_correctas;
+                mostrarResultado(resultado);
+            } else if (data.encolado) {
+                mostrarResultadoPendiente('<strong>Sin conexión.</strong> Tu resultado se guardó en este dispositivo y se enviará automáticamente cuando vuelva la conexión.');
+            } else {
+                mostrarResultadoPendiente('Tu resultado ya estaba guardado. Consulta tu calificación en el Dashboard.');
+            }
+        })
+        .catch(error => {
+            // Sin service worker no hay cola: se puede reintentar con Continuar
+            console.error('Error al enviar el resultado:', error);
+            alert('No hay conexión con el servidor. Comprueba tu conexión y pulsa Continuar para reintentar.');
+            if (btnContinuarHeader) btnContinuarHeader.disabled = false;
+        });
+}
+
+function mostrarResultado(data) {
+    // Ocultar ejercicios y header
+    document.querySelector('.ejercicios-wrapper').style.display = 'none';
+    document.querySelector('.leccion-header').style.display = 'none';
+
+    // Actualizar UI de finalización
+    const calificacionCirculo = document.getElementById('calificacion-circulo');
+    const calificacionNumero = document.getElementById('calificacion-numero');
+    const calificacionEstado = document.getElementById('calificacion-estado');
+    const finalizacionMensaje = document.getElementById('finalizacion-mensaje');
+    const btnReintentar = document.getElementById('btn-reintentar');
+
+    if (calificacionNumero) calificacionNumero.textContent = data.calificacion.toFixed(1);
+
+    if (data.aprobada) {
+        if (calificacionCirculo) calificacionCirculo.className = 'calificacion-circulo aprobada';
+        if (calificacionEstado) {
+            calificacionEstado.className = 'calificacion-estado aprobada';
+            calificacionEstado.textContent = '✓ APROBADA';
+        }
+        if (finalizacionMensaje) {
+            finalizacionMensaje.className = 'finalizacion-mensaje aprobada';
+            if (data.es_mejor) {
+                finalizacionMensaje.innerHTML = '<strong>¡Excelente!</strong> Has aprobado la lección. Siguiente lección desbloqueada.';
+            } else {
+                finalizacionMensaje.innerHTML = 'Obtuviste ' + data.calificacion.toFixed(1) + '/10. Tu mejor calificación (' + data.calificacion_guardada + '/10) se mantiene.';
+                finalizacionMensaje.className = 'finalizacion-mensaje mejor';
+            }
+        }
+    } else {
+        if (calificacionCirculo) calificacionCirculo.className = 'calificacion-circulo no-aprobada';
+        if (calificacionEstado) {
+            calificacionEstado.className = 'calificacion-estado no-aprobada';
+            calificacionEstado.textContent = '⚠ NO APROBADA';
+        }
+        if (finalizacionMensaje) {
+            finalizacionMensaje.className = 'finalizacion-mensaje no-aprobada';
+            finalizacionMensaje.innerHTML = '<strong>Necesitas mínimo 7/10</strong> para desbloquear la siguiente lección. ¡Puedes intentarlo de nuevo cuantas veces quieras!';
+        }
+        if (btnReintentar) btnReintentar.classList.add('visible');
+    }
+
+    if (data.siguiente_leccion) {
+        precargarLeccion(data.siguiente_leccion);
+        const btnSiguiente = document.getElementById('btn-siguiente');
+        if (btnSiguiente) {
+            btnSiguiente.href = data.siguiente_leccion.url;
+            btnSiguiente.classList.add('visible');
+        }
+    }
+
+    // Mostrar respuestas correctas
+    const elRespCorrectas = document.getElementById('respuestas-correctas');
+    const elTotalEjerFin = document.getElementById('total-ejercicios-fin');
+    const elPorcentaje = document.getElementById('porcentaje-correctas');
+    const elOverlay = document.getElementById('finalizacion-overlay');
+
+    if (elRespCorrectas) elRespCorrectas.textContent = respuestasCorrectas;
+    if (elTotalEjerFin) elTotalEjerFin.textContent = totalEjercicios;
+
+    const porcentajePrecision = totalEjercicios > 0
+        ? Math.round((respuestasCorrectas / totalEjercicios) * 100)
+        : 0;
+    if (elPorcentaje) elPorcentaje.textContent = porcentajePrecision + '%';
+
+    if (elOverlay) elOverlay.style.display = 'flex';
+
+    if (data.unidad_completada) {
+        sessionStorage.setItem('unidad_completada', 'true');
+        var unidadIdValue = unidadIdLeccion;
+        if (unidadIdValue) {
+            sessionStorage.setItem('unidad_id_completada', unidadIdValue);
+        }
+    }
+
+    if (data.todas_unidades_completadas) {
+        sessionStorage.setItem('todas_unidades_completadas', 'true');
+    }
+}
+
+// Pedir por adelantado la página y los ejercicios de la siguiente lección: al abrirla
+// salen de la caché del navegador (los estáticos son los mismos que los de esta)
+function precargarLeccion(leccion) {
+    [[leccion.url, 'document'], [leccion.datos, 'fetch']].forEach(([href, tipo]) => {
+        const enlace = document.createElement('link');
+        enlace.rel = 'prefetch';
+        enlace.as = tipo;
+        enlace.href = href;
+        document.head.appendChild(enlace);
+    });
+}
+
+// Resultado aún sin calificar: se verá en el Dashboard cuando se sincronice
+function mostrarResultadoPendiente(mensaje) {
+    document.querySelector('.ejercicios-wrapper').style.display = 'none';
+    document.querySelector('.leccion-header').style.display = 'none';
+
+    document.getElementById('calificacion-numero').textContent = '–';
+    document.getElementById('calificacion-circulo').className = 'calificacion-circulo pendiente';
+    const calificacionEstado = document.getElementById('calificacion-estado');
+    calificacionEstado.className = 'calificacion-estado pendiente';
+    calificacionEstado.textContent = '⟳ PENDIENTE';
+    const finalizacionMensaje = document.getElementById('finalizacion-mensaje');
+    finalizacionMensaje.className = 'finalizacion-mensaje pendiente';
+    finalizacionMensaje.innerHTML = mensaje;
+
+    document.getElementById('respuestas-correctas').textContent = '–';
+    document.getElementById('total-ejercicios-fin').textContent = totalEjercicios;
+    document.getElementById('porcentaje-correctas').textContent = '–';
+    document.getElementById('finalizacion-overlay').style.display = 'flex';
+}
+
+function actualizarProgreso() {
+    const porcentaje = (ejercicioActual / totalEjercicios) * 100;
+    document.getElementById('progreso-fill').style.width = porcentaje + '%';
+    document.getElementById('ejercicio-actual').textContent = ejercicioActual;
+}
+
+// Funciones para numeración de líneas
+function actualizarNumeros(textarea) {
+    const ejercicioId = textarea.getAttribute('data-ejercicio-id');
+    const lineNumbers = document.getElementById(`line-numbers-${ejercicioId}`);
+    if (!lineNumbers) return;
+
+    const lineas = textarea.value.split('\n');
+    const numLineas = lineas.length || 1;
+
+    let numerosHTML = '';
+    for (let i = 1; i <= numLineas; i++) {
+        numerosHTML += i + '\n';
+    }
+
+    lineNumbers.textContent = numerosHTML;
+}
+
+function sincronizarScroll(textarea) {
+    const ejercicioId = textarea.getAttribute('data-ejercicio-id');
+    const lineNumbers = document.getElementById(`line-numbers-${ejercicioId}`);
+    if (lineNumbers) {
+        lineNumbers.scrollTop = textarea.scrollTop;
+    }
+}
+
+// Inicializar numeración de los editores una vez dibujados los ejercicios
+function inicializarEditores() {
+    document.querySelectorAll('.codigo-editor').forEach(textarea => {
+        actualizarNumeros(textarea);
+
+        textarea.addEventListener('input', function () {
+            actualizarNumeros(this);
+        });
+
+        textarea.addEventListener('scroll', function () {
+            sincronizarScroll(this);
+        });
+    });
+
+    // También inicializar cuando se muestra un nuevo ejercicio
+    const observer = new MutationObserver(function (mutations) {
+        mutations.forEach(function (mutation) {
+            mutation.addedNodes.forEach(function (node) {
+                if (node.nodeType === 1) {
+                    const textareas = node.querySelectorAll ? node.querySelectorAll('.codigo-editor') : [];
+                    textareas.forEach(textarea => {
+                        actualizarNumeros(textarea);
+                    });
+                }
+            });
+        });
+    });
+
+    const ejerciciosWrapper = document.querySelector('.ejercicios-wrapper');
+    if (ejerciciosWrapper) {
+        observer.observe(ejerciciosWrapper, { childList: true, subtree: true });
+    }
+}
@@ -48,4 +48,24 @@ if (userButton) {
         const dropdown = document.querySelector('.user-dropdown');
         if (dropdown) dropdown.style.display = 'none';
     });
-}
\ No newline at end of file
+}
+// Lecciones sin conexión (static/js/sw.js): guardar la unidad que se está viendo
+// y enviar los resultados que quedaron en cola
+if ('serviceWorker' in navigator) {
+    const avisarServiceWorker = function(mensaje) {
+        navigator.serviceWorker.ready.then(registro => {
+            if (registro.active) registro.active.postMessage(mensaje);
+        });
+    };
+
+    navigator.serviceWorker.register('/sw.js').catch(error => {
+        console.warn('Service worker no disponible:', error);
+    });
+
+    const paquete = document.querySelector('[data-paquete]');
+    if (paquete) {
+        avisarServiceWorker({ tipo: 'precargar', url: paquete.getAttribute('data-paquete') });
+    }
+    avisarServiceWorker({ tipo: 'sincronizar' });
+    window.addEventListener('online', () => avisarServiceWorker({ tipo: 'sincronizar' }));
+}
@@ -0,0 +1,225 @@
+// Service worker: lecciones sin conexión (ver sincronizacion.py)
+//  - precarga las páginas y el JSON de las lecciones desbloqueadas de una unidad
+//    cuando una página se lo pide con el mensaje 'precargar',
+//  - sirve páginas y API de red primero y, si la red falla o tarda, de la caché,
+//  - guarda en IndexedDB los resultados que no llegan a /api/v1/resultados y los
+//    reenvía en lote al volver la conexión (el servidor descarta los repetidos).
+// Se sirve en /sw.js para que su alcance sea todo el sitio.
+
+const CACHE_PAGINAS = 'codebase-paginas-v1';
+const CACHE_ESTATICOS = 'codebase-estaticos-v1';
+const CACHES = [CACHE_PAGINAS, CACHE_ESTATICOS];
+const URL_RESULTADOS = '/api/v1/resultados';
+const BD_COLA = 'codebase-sin-conexion';
+const ALMACEN_COLA = 'resultados';
+const MAX_LOTE = 50;
+const RETENCION_MS = 30 * 24 * 3600 * 1000;
+const ESPERA_RED_MS = 4000;
+// Estados con los que el servidor da por terminado un intento (no se reenvía)
+const ESTADOS_TERMINADOS = ['guardado', 'duplicado', 'bloqueada', 'invalido'];
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', evento => {
+    evento.waitUntil(
+        caches.keys()
+            .then(nombres => Promise.all(nombres.filter(n => !CACHES.includes(n)).map(n => caches.delete(n))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', evento => {
+    const peticion = evento.request;
+    const url = new URL(peticion.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (peticion.method === 'POST' && url.pathname === URL_RESULTADOS) {
+        evento.respondWith(enviarOEncolar(peticion));
+        return;
+    }
+    if (peticion.method !== 'GET') return;
+
+    if (url.pathname === '/logout') {
+        // Las páginas guardadas son de este estudiante; la cola se conserva (lleva el usuario de cada intento)
+        evento.waitUntil(caches.delete(CACHE_PAGINAS));
+        return;
+    }
+    if (url.pathname.startsWith('/static/dist/')) {
+        evento.respondWith(cachePrimero(peticion));
+    } else if (peticion.mode === 'navigate' || url.pathname.startsWith('/api/v1/lecciones/')) {
+        evento.respondWith(redPrimero(peticion));
+    }
+});
+
+self.addEventListener('message', evento => {
+    const datos = evento.data || {};
+    if (datos.tipo === 'precargar' && datos.url) {
+        evento.waitUntil(precargar(datos.url));
+    } else if (datos.tipo === 'sincronizar') {
+        evento.waitUntil(sincronizar());
+    }
+});
+
+self.addEventListener('sync', evento => {
+    if (evento.tag === 'resultados') {
+        evento.waitUntil(sincronizar());
+    }
+});
+
+// Estáticos con huella: su URL cambia con el contenido, la copia guardada nunca caduca
+async function cachePrimero(peticion) {
+    const guardada = await caches.match(peticion);
+    if (guardada) return guardada;
+    const respuesta = await fetch(peticion);
+    if (respuesta.ok) {
+        const cache = await caches.open(CACHE_ESTATICOS);
+        await cache.put(peticion, respuesta.clone());
+    }
+    return respuesta;
+}
+
+// Páginas y JSON de lecciones: la red manda; la caché cubre los cortes y las conexiones lentas
+async function redPrimero(peticion) {
+    const cache = await caches.open(CACHE_PAGINAS);
+    const guardada = await cache.match(peticion);
+    const red = fetch(peticion).then(respuesta => {
+        // Solo se actualiza lo que ya forma parte de un paquete (no se guarda todo lo que se visita)
+        if (guardada && respuesta.ok && !respuesta.redirected) {
+            cache.put(peticion, respuesta.clone());
+        }
+        return respuesta;
+    });
+
+    if (!guardada) return red;
+    const espera = new Promise(resolver => setTimeout(() => resolver(guardada), ESPERA_RED_MS));
+    return Promise.race([red.catch(() => guardada), espera]);
+}
+
+async function precargar(urlPaquete) {
+    const respuesta = await fetch(urlPaquete, { credentials: 'same-origin' });
+    if (!respuesta.ok || respuesta.redirected) return;
+    const paquete = await respuesta.json();
+
+    // La versión cambia con el contenido, los estáticos y las lecciones desbloqueadas
+    const cachePaginas = await caches.open(CACHE_PAGINAS);
+    const marca = new URL(urlPaquete, self.location.origin).href;
+    const anterior = await cachePaginas.match(marca);
+    if (anterior && (await anterior.text()) === paquete.version) return;
+
+    const cacheEstaticos = await caches.open(CACHE_ESTATICOS);
+    await Promise.all(paquete.urls.map(async url => {
+        const estatico = url.startsWith('/static/dist/');
+        const cache = estatico ? cacheEstaticos : cachePaginas;
+        if (estatico && await cache.match(url)) return;
+        try {
+            const copia = await fetch(url, { credentials: 'same-origin' });
+            if (copia.ok && !copia.redirected) await cache.put(url, copia);
+        } catch (error) {
+            // Sin red a mitad de la precarga: lo que falte se intenta en la próxima visita
+        }
+    }));
+    await cachePaginas.put(marca, new Response(paquete.version));
+}
+
+// Resultado de una lección: al servidor si hay red; si no, a la cola
+async function enviarOEncolar(peticion) {
+    const cuerpo = await peticion.clone().json().catch(() => null);
+    try {
+        const respuesta = await fetch(peticion);
+        // Sin sesión (redirige al login) o servidor caído: también se guarda para más tarde
+        if (!respuesta.redirected && respuesta.status < 500) return respuesta;
+    } catch (error) {
+        // Sin conexión
+    }
+    if (!cuerpo || !Array.isArray(cuerpo.resultados)) return Response.error();
+
+    await encolar(cuerpo.resultados);
+    if (self.registration.sync) {
+        await self.registration.sync.register('resultados').catch(() => null);
+    }
+    return new Response(JSON.stringify({
+        success: true,
+        encolado: true,
+        resultados: cuerpo.resultados.map(r => ({ intento: r.intento, estado: 'encolado' }))
+    }), { status: 202, headers: { 'Content-Type': 'application/json' } });
+}
+
+let sincronizando = null;
+
+function sincronizar() {
+    // Un solo envío a la vez aunque lleguen varios 'sync' y mensajes seguidos
+    if (!sincronizando) {
+        sincronizando = enviarCola().finally(() => { sincronizando = null; });
+    }
+    return sincronizando;
+}
+
+async function enviarCola() {
+    const pendientes = await leerCola();
+    for (let i = 0; i < pendientes.length; i += MAX_LOTE) {
+        const lote = pendientes.slice(i, i + MAX_LOTE);
+        let respuesta;
+        try {
+            respuesta = await fetch(URL_RESULTADOS, {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ resultados: lote })
+            });
+        } catch (error) {
+            return;
+        }
+        if (!respuesta.ok || respuesta.redirected) return;
+        const datos = await respuesta.json();
+        await quitarDeCola(datos.resultados
+            .filter(r => ESTADOS_TERMINADOS.includes(r.estado))
+            .map(r => r.intento));
+    }
+}
+
+// Cola en IndexedDB: un registro por intento (clave: el identificador del intento)
+function abrirCola() {
+    return new Promise((resolver, rechazar) => {
+        const apertura = indexedDB.open(BD_COLA, 1);
+        apertura.onupgradeneeded = () => apertura.result.createObjectStore(ALMACEN_COLA, { keyPath: 'intento' });
+        apertura.onsuccess = () => resolver(apertura.result);
+        apertura.onerror = () => rechazar(apertura.error);
+    });
+}
+
+async function operarCola(modo, operacion) {
+    const bd = await abrirCola();
+    return new Promise((resolver, rechazar) => {
+        const transaccion = bd.transaction(ALMACEN_COLA, modo);
+        const peticion = operacion(transaccion.objectStore(ALMACEN_COLA));
+        transaccion.oncomplete = () => {
+            bd.close();
+            resolver(peticion ? peticion.result : undefined);
+        };
+        transaccion.onerror = () => {
+            bd.close();
+            rechazar(transaccion.error);
+        };
+    });
+}
+
+function encolar(resultados) {
+    const ahora = Date.now();
+    return operarCola('readwrite', almacen => {
+        resultados.filter(r => r && r.intento).forEach(r => almacen.put(Object.assign({}, r, { encolado_en: ahora })));
+    });
+}
+
+async function leerCola() {
+    const todos = await operarCola('readonly', almacen => almacen.getAll());
+    const limite = Date.now() - RETENCION_MS;
+    const caducados = todos.filter(r => r.encolado_en < limite).map(r => r.intento);
+    if (caducados.length) await quitarDeCola(caducados);
+    return todos.filter(r => r.encolado_en >= limite);
+}
+
+function quitarDeCola(intentos) {
+    return operarCola('readwrite', almacen => {
+        intentos.filter(Boolean).forEach(intento => almacen.delete(intento));
+    });
+}
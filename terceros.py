@@ -0,0 +1,191 @@
+"""
+Recursos de terceros servidos desde static/terceros/ en lugar de CDNs.
+
+Fuentes originales en terceros/ (Bootstrap 5.3.0 y las fuentes TTF con su
+licencia OFL). Este script genera a partir de ellas lo que se despliega:
+  - bootstrap.min.css recortado: solo las reglas cuyas clases aparecen en las
+    plantillas o en static/js, más las que añade el JS de collapse y offcanvas
+    (show, collapsing, offcanvas-backdrop...). Lo que no tiene clases (reset,
+    variables de :root, tipografía base) se conserva siempre.
+  - bootstrap.min.js: el paquete sin Popper; la aplicación solo usa collapse
+    y offcanvas, que no lo necesitan.
+  - fuentes/*.woff2: subconjunto latino (el mismo rango que sirve Google
+    Fonts) y, en las variables, solo el rango de pesos que se usa.
+
+El resultado se versiona, así que el despliegue no depende de este script;
+activos.py lo incluye en static/dist/ con huella y caché inmutable como al
+resto de estáticos.
+
+Regenerar tras usar clases nuevas de Bootstrap en una plantilla (requiere fonttools):
+    python terceros.py
+"""
+
+import glob
+import os
+import re
+import shutil
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+    from fontTools.varLib import instancer
+except ImportError:
+    subset = None
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+ORIGEN = os.path.join(RAIZ, 'terceros')
+DESTINO = os.path.join(RAIZ, 'static', 'terceros')
+BOOTSTRAP = os.path.join(ORIGEN, 'bootstrap-5.3.0')
+
+# Clases que añade el JS de Bootstrap en los componentes usados (collapse y offcanvas)
+CLASES_JS = {'show', 'showing', 'hiding', 'fade', 'collapse', 'collapsing', 'collapsed',
+             'collapse-horizontal', 'offcanvas-backdrop'}
+
+# Clases que se forman en tiempo de ejecución y no aparecen literalmente (alert-{{ category }})
+PREFIJOS_SIEMPRE = ('alert-',)
+
+# Rango latino de Google Fonts (incluye á é í ó ú ñ ü ¿ ¡ y la puntuación tipográfica)
+UNICODES_LATIN = ('U+0000-00FF,U+0131,U+0152-0153,U+02BB-02BC,U+02C6,U+02DA,U+02DC,'
+                  'U+0304,U+0308,U+0329,U+2000-206F,U+2074,U+20AC,U+2122,U+2191,U+2193,'
+                  'U+2212,U+2215,U+FEFF,U+FFFD')
+
+# (archivo origen, archivo destino, rango de pesos del eje wght o None si no es variable)
+FUENTES = [
+    ('Outfit.ttf', 'outfit-latin.woff2', (300, 700)),
+    ('GreatVibes-Regular.ttf', 'great-vibes-latin.woff2', None),
+]
+
+
+def clases_usadas():
+    """Identificadores que aparecen en las plantillas y en el JS de la aplicación"""
+    archivos = (glob.glob(os.path.join(RAIZ, 'templates', '**', '*.html'), recursive=True)
+                + glob.glob(os.path.join(RAIZ, 'static', 'js', '*.js')))
+    usadas = set(CLASES_JS)
+    for ruta in archivos:
+        with open(ruta, encoding='utf-8') as f:
+            usadas.update(re.findall(r'[\w-]+', f.read()))
+    return usadas
+
+
+def _bloques(css):
+    """Dividir CSS en bloques de primer nivel: (preludio, cuerpo) o (sentencia, None)"""
+    bloques = []
+    inicio = nivel = 0
+    fin_preludio = None
+    comilla = None
+    for i, c in enumerate(css):
+        if comilla:
+            if c == comilla and css[i - 1] != '\\':
+                comilla = None
+        elif c in '"\'':
+            comilla = c
+        elif c == '{':
+            if nivel == 0:
+                fin_preludio = i
+            nivel += 1
+        elif c == '}':
+            nivel -= 1
+            if nivel == 0:
+                bloques.append((css[inicio:fin_preludio].strip(), css[fin_preludio + 1:i]))
+                inicio = i + 1
+        elif c == ';' and nivel == 0:
+            bloques.append((css[inicio:i + 1].strip(), None))
+            inicio = i + 1
+    return bloques
+
+
+def _selectores(preludio):
+    """Separar una lista de selectores por comas de primer nivel (no las de :not(a, b))"""
+    selectores, actual, parentesis = [], '', 0
+    for c in preludio:
+        if c == ',' and parentesis == 0:
+            selectores.append(actual)
+            actual = ''
+            continue
+        parentesis += (c == '(') - (c == ')')
+        actual += c
+    return selectores + [actual]
+
+
+def _se_usa(selector, usadas):
+    for clase in re.findall(r'\.((?:\\.|[\w-])+)', selector):
+        clase = clase.replace('\\', '')
+        if clase not in usadas and not clase.startswith(PREFIJOS_SIEMPRE):
+            return False
+    return True
+
+
+def recortar_css(css, usadas):
+    """
+    Quitar de una hoja de estilos las reglas de clases que no se usan
+
+    Args:
+        css: hoja de estilos (minificada o no, sin comentarios)
+        usadas: conjunto de nombres de clase a conservar
+
+    Returns:
+        str con el CSS recortado
+    """
+    salida = []
+    for preludio, cuerpo in _bloques(css):
+        if cuerpo is None:
+            salida.append(preludio)
+        elif preludio.startswith(('@media', '@supports', '@container', '@layer')):
+            interior = recortar_css(cuerpo, usadas)
+            if interior:
+                salida.append(f'{preludio}{{{interior}}}')
+        elif preludio.startswith('@'):
+            salida.append(f'{preludio}{{{cuerpo}}}')
+        else:
+            selectores = [s for s in _selectores(preludio) if _se_usa(s, usadas)]
+            if selectores:
+                salida.append(f"{','.join(selectores)}{{{cuerpo}}}")
+    return ''.join(salida)
+
+
+def generar_bootstrap():
+    with open(os.path.join(BOOTSTRAP, 'bootstrap.min.css'), encoding='utf-8') as f:
+        css = f.read()
+    licencia = re.match(r'(?:@charset "UTF-8";)?(/\*!.*?\*/)', css, re.S).group(1)
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S).replace('@charset "UTF-8";', '', 1)
+    recortado = recortar_css(css, clases_usadas())
+    with open(os.path.join(DESTINO, 'bootstrap.min.css'), 'w', encoding='utf-8') as f:
+        f.write(f'@charset "UTF-8";{licencia}\n{recortado}\n')
+
+    with open(os.path.join(BOOTSTRAP, 'bootstrap.min.js'), encoding='utf-8') as f:
+        js = f.read()
+    with open(os.path.join(DESTINO, 'bootstrap.min.js'), 'w', encoding='utf-8') as f:
+        f.write(re.sub(r'\n//# sourceMappingURL=.*$', '', js).rstrip() + '\n')
+    return len(css), len(recortado)
+
+
+def generar_fuentes():
+    os.makedirs(os.path.join(DESTINO, 'fuentes'), exist_ok=True)
+    opciones = subset.Options()
+    opciones.name_IDs = ['*']
+    tamanos = {}
+    for origen, destino, pesos in FUENTES:
+        fuente = TTFont(os.path.join(ORIGEN, 'fuentes', origen))
+        subconjunto = subset.Subsetter(opciones)
+        subconjunto.populate(unicodes=subset.parse_unicodes(UNICODES_LATIN))
+        subconjunto.subset(fuente)
+        if pesos:
+            fuente = instancer.instantiateVariableFont(fuente, {'wght': pesos})
+        ruta = os.path.join(DESTINO, 'fuentes', destino)
+        fuente.flavor = 'woff2'
+        fuente.save(ruta)
+        tamanos[destino] = os.path.getsize(ruta)
+    for licencia in glob.glob(os.path.join(ORIGEN, 'fuentes', 'OFL-*.txt')):
+        shutil.copy(licencia, os.path.join(DESTINO, 'fuentes'))
+    return tamanos
+
+
+if __name__ == '__main__':
+    os.makedirs(DESTINO, exist_ok=True)
+    original, recortado = generar_bootstrap()
+    print(f"✅ bootstrap.min.css recortado: {original / 1024:.0f} KB -> {recortado / 1024:.0f} KB")
+    if subset is None:
+        print("⚠️ fonttools no instalado: no se regeneran las fuentes (pip install fonttools brotli)")
+    else:
+        for nombre, tamano in generar_fuentes().items():
+            print(f"✅ fuentes/{nombre}: {tamano / 1024:.0f} KB")